@@ -13,8 +13,17 @@ from chatbot.config import config
 from chatbot.core import notifications
 from chatbot.core.ai_agent.completions import Agent
 from chatbot.core.ai_agent.enumerations import MessageType
-from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+from chatbot.core.ai_agent.prompt import user_data_prompt
+from chatbot.core.ai_agent.router import ModelRouter
+from chatbot.core.ai_agent.shortcuts import ShortcutEngine, selection_text
+from chatbot.core.ai_agent.tool_selection import ToolSelector
+from chatbot.core.ai_agent.tools import prefetch, shaping
 from chatbot.core.database import db
+from chatbot.core.dedup import create_deduplicator
+from chatbot.core.expiry import ExpiryScheduler
+from chatbot.core.inbox import UserInbox
+from chatbot.core.state import UserBusyError, create_state_backend
+from chatbot.core.turn_queue import RetryLater, TurnQueue
 from chatbot.logging_conf import logger
 from chatbot.utils import check_time, create_dirs, format_phone_number
 
@@ -22,25 +31,19 @@ from chatbot.utils import check_time, create_dirs, format_phone_number
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.connect()
+    await turn_queue.start()
     sentry_sdk.init(
         dsn=config.SENTRY_DSN,
         send_default_pii=True,
         traces_sample_rate=1.0,
         profiles_sample_rate=1.0,
     )
-    # Start background cleanup task
-    global _cleanup_task
-    _cleanup_task = asyncio.create_task(_cleanup_inactive())
+    await expiry.start()
 
     yield
 
-    # Stop background cleanup task
-    if _cleanup_task:
-        _cleanup_task.cancel()
-        try:
-            await asyncio.gather(_cleanup_task, return_exceptions=True)
-        except Exception:
-            pass
+    await expiry.stop()
+    await turn_queue.stop()
     await db.disconnect()
 
 
@@ -49,26 +52,41 @@ app.add_middleware(CorrelationIdMiddleware)
 create_dirs()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-bot = Agent("Akivoy Agent")
+bot = Agent(
+    "Akivoy Agent",
+    repository=db,
+    router=ModelRouter(
+        small_model=config.ROUTER_SMALL_MODEL,
+        default_model=config.ROUTER_DEFAULT_MODEL,
+        large_model=config.ROUTER_LARGE_MODEL,
+        escalate_tools=config.ROUTER_ESCALATE_TOOLS,
+        escalate_keywords=config.ROUTER_ESCALATE_KEYWORDS,
+        small_talk_max_chars=config.ROUTER_SMALL_TALK_MAX_CHARS,
+    )
+    if config.ROUTER_ENABLED
+    else None,
+    tool_selector=ToolSelector() if config.TOOL_SELECTION_ENABLED else None,
+    shortcuts=ShortcutEngine() if config.SHORTCUTS_ENABLED else None,
+)
 WORDS_LIMIT = config.WORDS_LIMIT or 1500
-users_in_process: dict[str, bool] = {}
-wait_msg_index: dict[str, int] = {}
 
-# Inactivity cleanup configuration and state
+# Inactivity expiry configuration
 INACTIVITY_TTL_SECONDS: int = getattr(
     config, "INACTIVITY_TTL_SECONDS", 24 * 60 * 60
 )  # 24 horas
-CLEANUP_INTERVAL_SECONDS: int = getattr(
-    config, "CLEANUP_INTERVAL_SECONDS", 60 * 60
-)  # 1 hora
-last_activity: dict[str, float] = {}
-_cleanup_task: asyncio.Task | None = None
 
+# Locks por usuario, última actividad e historial compartidos entre workers
+state = create_state_backend(
+    config.STATE_BACKEND, db, lock_ttl=config.STATE_LOCK_TTL_SECONDS
+)
 
-def end_interaction(format_number, last_time):
-    users_in_process[format_number] = False
-    check_time(last_time)
-    return {"status": "ok"}
+# Meta reintenta los webhooks: cada message_id se procesa una sola vez
+dedup = create_deduplicator(
+    config.DEDUP_BACKEND,
+    db,
+    ttl=config.DEDUP_TTL_SECONDS,
+    max_size=config.DEDUP_MAX_IDS,
+)
 
 
 class HealthCheckResponse(BaseModel):
@@ -130,52 +148,73 @@ async def parse_webhook_data(request: Request) -> dict | None:
         return None
 
 
-def extract_message_content(webhook_data: dict) -> tuple[str, str, str] | None:
-    """Extract user number and message content from webhook data.
+def extract_messages(webhook_data: dict) -> list[tuple[str, str, str]]:
+    """Extract every message of a webhook delivery.
+
+    Meta batches several entries, changes and messages in a single POST under
+    load, so all of them are walked instead of only the first one.
 
     Args:
         webhook_data: Raw webhook data from Meta WhatsApp API
 
     Returns:
-        tuple: (user_number, message_content, message_id) or None if extraction fails
+        list: (user_number, message_content, message_id) tuples in delivery order
     """
-    try:
-        entry = webhook_data.get("entry", [])[0]
-        changes = entry.get("changes", [])[0]
-        value = changes.get("value", {})
+    extracted: list[tuple[str, str, str]] = []
 
-        metadata = value.get("metadata", {})
-        phone_number_id = metadata.get("phone_number_id", "")
+    for entry in webhook_data.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
 
-        if phone_number_id != config.WHATSAPP_PHONE_NUMBER_ID:
-            logger.warning(
-                f"Mensaje enviado hacia el numero con id: {phone_number_id}, "
-                f"el id del bot es: {config.WHATSAPP_PHONE_NUMBER_ID}"
-            )
-            return None
+            metadata = value.get("metadata", {})
+            phone_number_id = metadata.get("phone_number_id", "")
 
-        # Check if this is a message event
-        messages = value.get("messages")
-        if not messages:
-            logger.debug("No messages in webhook data")
-            return None
+            if phone_number_id != config.WHATSAPP_PHONE_NUMBER_ID:
+                logger.warning(
+                    f"Mensaje enviado hacia el numero con id: {phone_number_id}, "
+                    f"el id del bot es: {config.WHATSAPP_PHONE_NUMBER_ID}"
+                )
+                continue
 
-        message = messages[0]
-        user_number = message.get("from", "")
-        message_id = message.get("id", "")
+            # Check if this is a message event
+            messages = value.get("messages")
+            if not messages:
+                logger.debug("No messages in webhook change")
+                continue
 
-        # Extract message text based on message type
-        incoming_msg = _extract_text_from_message(message)
+            for message in messages:
+                user_number = message.get("from", "")
+                message_id = message.get("id", "")
 
-        if not incoming_msg:
-            logger.warning("No text message found or unsupported message type")
-            return None
+                # Extract message text based on message type
+                incoming_msg = _extract_text_from_message(message)
 
-        return user_number, incoming_msg, message_id
+                if not user_number or not incoming_msg:
+                    logger.warning("No text message found or unsupported message type")
+                    continue
 
-    except (IndexError, KeyError) as e:
-        logger.error(f"Error extracting message data: {e}")
-        return None
+                extracted.append((user_number, incoming_msg, message_id))
+
+    return extracted
+
+
+def group_messages_by_sender(
+    messages: list[tuple[str, str, str]],
+) -> dict[str, list[dict]]:
+    """Group extracted messages by sender, keeping their relative order.
+
+    Args:
+        messages: Tuples returned by extract_messages
+
+    Returns:
+        dict: user_number -> list of {"message", "message_id"} dicts
+    """
+    groups: dict[str, list[dict]] = {}
+    for user_number, incoming_msg, message_id in messages:
+        groups.setdefault(user_number, []).append(
+            {"message": incoming_msg, "message_id": message_id}
+        )
+    return groups
 
 
 def _extract_text_from_message(message: dict) -> str:
@@ -196,73 +235,38 @@ def _extract_text_from_message(message: dict) -> str:
         interactive = message.get("interactive", {})
         interactive_type = interactive.get("type")
 
-        if interactive_type == "button_reply":
-            return interactive.get("button_reply", {}).get("title", "")
-        elif interactive_type == "list_reply":
-            return interactive.get("list_reply", {}).get("title", "")
+        # el id de la opción viaja con el título para los atajos
+        if interactive_type in ("button_reply", "list_reply"):
+            reply = interactive.get(interactive_type, {})
+            return selection_text(reply.get("id", ""), reply.get("title", ""))
 
     return ""
 
 
-async def check_user_availability(format_number: str, user_number: str) -> bool:
-    """Check if user is available for new conversation.
-
-    Args:
-        format_number: Formatted phone number
-        user_number: Original user number
+async def _expire_session(phone: str) -> bool:
+    """Drop the chat of a user that has been inactive for INACTIVITY_TTL_SECONDS.
 
     Returns:
-        bool: True if user is available, False if busy
+        bool: False to postpone the expiry (turn in progress here or in
+        another worker, or recent activity in another worker)
     """
-    if users_in_process.get(format_number):
-        logger.warning(f"Usuario {format_number} en proceso")
-
-        # Mensajes alternativos
-        wait_messages = [
-            "Porfa dame un segundo para terminar de elaborar la respuesta 🕒",
-            "Un momento, estoy procesando tu pedido — te respondo enseguida ⏳",
-            "Disculpa la demora, estoy trabajando para darte la mejor respuesta 🤏",
-            "Estoy revisando la información; te escribo en breve 📡",
-            "Gracias por la paciencia — preparando tu respuesta ahora mismo 🔄",
-        ]
-
-        # Obtener índice actual para el usuario, por defecto 0
-        idx = wait_msg_index.get(format_number, 0)
-        msg = wait_messages[idx % len(wait_messages)]
-
-        # Enviar mensaje y actualizar índice (siguiente vez se usará el siguiente)
-        asyncio.create_task(
-            notifications.send_whatsapp_message(body=msg, to=user_number)
-        )
-        wait_msg_index[format_number] = (idx + 1) % len(wait_messages)
+    if await state.is_in_process(phone):
+        return False
+    if state.shared:
+        ts = await state.get_last_activity(phone)
+        if ts and time.time() - ts < INACTIVITY_TTL_SECONDS:
+            return False
+    if inbox.is_busy(phone):
         return False
+
+    bot.chat_memory.delete_chat(phone)
+    await state.delete_chat(phone)
     return True
 
 
-async def _cleanup_inactive() -> None:
-    """Periodically clean inactive users and bots to prevent memory growth."""
-    while True:
-        try:
-            now = time.time()
-            to_remove: list[str] = []
-
-            for phone, ts in list(last_activity.items()):
-                if now - ts > INACTIVITY_TTL_SECONDS and not users_in_process.get(
-                    phone, False
-                ):
-                    to_remove.append(phone)
-
-            for phone in to_remove:
-                bot.chat_memory.delete_chat(phone)
-                last_activity.pop(phone, None)
-                logger.debug(f"Cleaned inactive session for {phone}")
-        except Exception as exc:
-            logger.error(f"Cleanup task error: {exc}")
-        finally:
-            try:
-                await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
-            except asyncio.CancelledError:
-                break
+# Cada sesión expira cerca de su plazo en vez de barrer todo el historial
+expiry = ExpiryScheduler(INACTIVITY_TTL_SECONDS, _expire_session)
+bot.chat_memory.expiry = expiry
 
 
 async def handle_new_user_setup(
@@ -284,7 +288,7 @@ async def handle_new_user_setup(
     logger.info(f"Primera interacción de {user_number}")
 
     try:
-        partner = await odoo_orion.get_partner_by_phone(format_number)
+        partner = await prefetch.get_partner_by_phone(format_number)
     except Exception as exc:
         logger.error(f"Error connecting to Odoo: {exc}")
         asyncio.create_task(
@@ -297,6 +301,8 @@ async def handle_new_user_setup(
 
     system_message = await create_system_message(format_number, partner)
     bot.chat_memory.add_msg(system_message, MessageType.DEVELOPER.value, format_number)
+    if partner:
+        bot.chat_memory.set_user_name(format_number, partner["name"])
     return True
 
 
@@ -317,8 +323,10 @@ async def create_system_message(format_number: str, partner: dict | None) -> str
         if partner.get("email"):
             user_data["email"] = partner["email"]
 
-        await db.create_user(phone=format_number, **user_data)
-        return f"Datos del usuario: {user_data}. Llámale por su nombre"
+        if not await db.create_user(phone=format_number, **user_data):
+            # usuario registrado en Odoo después de su primer mensaje
+            await db.update_user_data(format_number, user_data)
+        return user_data_prompt(user_data)
     else:
         logger.info(f"{format_number} no encontrado en Odoo")
         await db.create_user(phone=format_number)
@@ -336,6 +344,9 @@ async def gen_ai_msg(
 ) -> str | None:
     """Generate AI response for user message.
 
+    With STREAM_REPLIES the reply is already sent to the user chunk by chunk
+    when this returns.
+
     Args:
         format_number: Formatted phone number
         user_number: Original user number
@@ -345,6 +356,19 @@ async def gen_ai_msg(
         str: AI output or None if error occurred
     """
     try:
+        if config.STREAM_REPLIES:
+            # cada párrafo se envía en cuanto se genera, en orden
+            return await bot.async_stream_msg(
+                message,
+                odoo_number=format_number,
+                send=lambda chunk: notifications.send_whatsapp_message(
+                    chunk, user_number
+                ),
+                max_chars=WORDS_LIMIT,
+                background_tasks=background_tasks,
+                whatsapp_number=user_number,
+            )
+
         ai_msg = await bot.async_process_msg(
             message,
             background_tasks=background_tasks,
@@ -354,7 +378,7 @@ async def gen_ai_msg(
         return ai_msg
     except Exception as exc:
         logger.error(f"AI generation failed: {exc}")
-        bot.chat_memory.delete_chat(format_number)
+        bot.chat_memory.reset_chat(format_number)
         asyncio.create_task(
             notifications.send_whatsapp_message(
                 "Ha ocurrido un error y el chat fue reiniciado. Por favor, comencemos de nuevo",
@@ -396,75 +420,213 @@ async def send_ai_msg(ai_msg: str, user_number: str) -> None:
 
 
 # ============================================================================
-# MAIN WEBHOOK ENDPOINT
+# TURN PROCESSING
 # ============================================================================
 
 
-@app.post("/whatsapp")
-async def whatsapp_reply(request: Request, background_tasks: BackgroundTasks):
-    """Main endpoint for handling WhatsApp webhook messages.
+async def run_turn(format_number: str, user_number: str, messages: list[str]) -> None:
+    """Run a full agent turn for the messages buffered in the user's inbox.
 
-    This endpoint processes incoming WhatsApp messages, manages user state,
-    generates AI responses, and sends replies back to users.
+    Args:
+        format_number: Formatted phone number
+        user_number: Original user number
+        messages: Messages received since the previous turn, in order
     """
     start_time = time.time()
-    logger.debug("=" * 125)
-
-    # Parse incoming webhook data
-    webhook_data = await parse_webhook_data(request)
-    if not webhook_data:
-        return {"status": "error"}
+    incoming_msg = "\n".join(messages)
+    background_tasks = BackgroundTasks()
 
-    # Extract message content
-    message_data = extract_message_content(webhook_data)
-    if not message_data:
-        return {"status": "ok"}
-
-    user_number, incoming_msg, message_id = message_data
-    if message_id:
-        asyncio.create_task(notifications.mark_whatsapp_message_as_read(message_id))
+    prefetch_token = None
+    locked = False
+    try:
+        # Otro worker puede estar atendiendo al mismo usuario
+        try:
+            await state.lock_user(format_number, timeout=config.STATE_LOCK_WAIT_SECONDS)
+        except UserBusyError as exc:
+            # el turno vuelve a la cola y se atiende cuando el otro termine
+            logger.warning(f"{exc}, turno reprogramado")
+            raise RetryLater(config.STATE_LOCK_RETRY_SECONDS) from exc
+        except Exception as exc:
+            logger.error(f"Error tomando el lock de {format_number}: {exc}")
+            asyncio.create_task(
+                notifications.send_whatsapp_message(
+                    "Ha ocurrido un error procesando su mensaje. Por favor, inténtelo de nuevo",
+                    user_number,
+                )
+            )
+            return
+        locked = True
 
-    format_number = format_phone_number(user_number)
+        if state.shared:
+            chat = await state.load_chat(format_number)
+            if chat:
+                bot.chat_memory.set_messages(chat, format_number)
+            else:
+                bot.chat_memory.delete_chat(format_number)
 
-    if not await check_user_availability(format_number, user_number):
-        check_time(start_time)
-        return {"status": "ok"}
-
-    users_in_process[format_number] = True
-    try:
         logger.info(f"User {user_number}: {incoming_msg}")
 
+        # Sin chat en memoria: se recupera de la BD y solo si el usuario no
+        # tiene nombre registrado se consulta Odoo
+        new_session = False
         if not bot.chat_memory.has_chat(format_number):
+            new_session = not await bot.chat_memory.rehydrate(format_number)
+
+        # Lecturas de Odoo probables, en paralelo con la primera llamada al
+        # modelo; el partner solo se precarga si el chat no se pudo recuperar
+        if config.PREFETCH_ENABLED:
+            prefetch_token = prefetch.start_turn(
+                incoming_msg, format_number, new_session=new_session
+            )
+
+        if new_session:
             setup_success = await handle_new_user_setup(
                 format_number, user_number, incoming_msg, background_tasks
             )
             if not setup_success:
-                return {"status": "ok"}
+                return
 
         ai_msg = await gen_ai_msg(
             incoming_msg, format_number, user_number, background_tasks
         )
         if not ai_msg:
             logger.error("AI response generation returned None")
-            return {"status": "ok"}
+            return
 
-        # Solo escribir mensajes si el usuario ya existe en BD
-        try:
-            args_list = [
-                {"role": MessageType.USER.value, "message": incoming_msg},
-                {"role": MessageType.ASSISTANT.value, "message": ai_msg},
-            ]
-            for args in args_list:
-                asyncio.create_task(db.create_message(phone=format_number, **args))
+        if not config.STREAM_REPLIES:
+            await send_ai_msg(ai_msg, user_number)
+    finally:
+        if prefetch_token:
+            prefetch.end_turn(prefetch_token)
+        if locked:
+            try:
+                if bot.chat_memory.has_chat(format_number):
+                    await state.save_chat(
+                        format_number, bot.chat_memory.get_messages(format_number)
+                    )
+                else:
+                    await state.delete_chat(format_number)
+            finally:
+                await state.release_user(format_number)
+        check_time(start_time)
+        # sin request HTTP no hay quien ejecute las tareas en segundo plano
+        await background_tasks()
 
-        except Exception as exc:
-            logger.error(
-                f"Error al intentar persistir mensajes para {format_number}: {exc}"
-            )
 
-        await send_ai_msg(ai_msg, user_number)
+inbox = UserInbox(run_turn, debounce=config.INBOX_DEBOUNCE_SECONDS)
+
+
+async def process_turn_event(event: dict) -> None:
+    """Deliver an event drained from the turn queue to the user's inbox.
+
+    Returns once the turn that includes the messages has finished, so the
+    queue only discards the event after it was actually answered.
+
+    Args:
+        event: Payload persisted by the webhook with user_number and the
+            sender's messages in order
+    """
+    user_number = event["user_number"]
+    format_number = format_phone_number(user_number)
+
+    # eventos encolados antes de agrupar por remitente
+    messages = event.get("messages") or [
+        {"message": event["message"], "message_id": event.get("message_id")}
+    ]
+
+    # push() agrega al buzón antes de esperar, así que el orden se mantiene
+    await asyncio.gather(
+        *(inbox.push(format_number, user_number, m["message"]) for m in messages)
+    )
+
+
+turn_queue = TurnQueue(
+    db,
+    process_turn_event,
+    workers=config.TURN_WORKERS,
+    poll_interval=config.TURN_QUEUE_POLL_SECONDS,
+    max_attempts=config.TURN_MAX_ATTEMPTS,
+    stale_after=config.TURN_STALE_SECONDS,
+)
+
+
+# ============================================================================
+# MAIN WEBHOOK ENDPOINT
+# ============================================================================
+
+
+@app.post("/whatsapp")
+async def whatsapp_reply(request: Request):
+    """Main endpoint for handling WhatsApp webhook messages.
+
+    This endpoint only validates the incoming messages and persists them in the
+    durable turn queue, so Meta gets its 200 regardless of LLM latency. The
+    turn itself is processed by the queue workers (see process_turn_event).
+    """
+    start_time = time.time()
+    logger.debug("=" * 125)
+
+    # Parse incoming webhook data
+    webhook_data = await parse_webhook_data(request)
+    if not webhook_data:
+        return {"status": "error"}
+
+    # Extract every message of the delivery
+    messages = extract_messages(webhook_data)
+
+    # Drop redeliveries before any other work
+    new_messages = []
+    for message in messages:
+        message_id = message[2]
+        if message_id and not await dedup.is_new(message_id):
+            logger.info(f"Mensaje {message_id} duplicado, ignorado")
+            continue
+        new_messages.append(message)
+
+    if not new_messages:
         return {"status": "ok"}
-    finally:
-        users_in_process[format_number] = False
-        last_activity[format_number] = time.time()
-        check_time(start_time)
+
+    # Un evento por remitente: los remitentes se procesan en paralelo y los
+    # mensajes de un mismo remitente en orden
+    groups = group_messages_by_sender(new_messages)
+    results = await asyncio.gather(
+        *(
+            turn_queue.put({"user_number": user_number, "messages": user_messages})
+            for user_number, user_messages in groups.items()
+        ),
+        return_exceptions=True,
+    )
+
+    error = None
+    for user_messages, result in zip(groups.values(), results):
+        message_ids = [m["message_id"] for m in user_messages if m["message_id"]]
+        if isinstance(result, BaseException):
+            # sin encolar: se olvidan los ids para que el reintento de Meta
+            # se procese en vez de descartarse como duplicado
+            error = error or result
+            await asyncio.gather(*(dedup.forget(message_id) for message_id in message_ids))
+            continue
+        for message_id in message_ids:
+            asyncio.create_task(notifications.mark_whatsapp_message_as_read(message_id))
+
+    if error:
+        logger.error(f"Error encolando mensajes, se espera el reintento de Meta: {error}")
+        raise error
+    check_time(start_time)
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics():
+    """In-process counters: agent limits, chat sessions memory, turn queue and inboxes."""
+    return {
+        "agent": bot.stats(),
+        "router": bot.router.stats() if bot.router else None,
+        "tool_selection": bot.tool_selector.stats() if bot.tool_selector else None,
+        "prefetch": dict(prefetch.stats),
+        "shaping": shaping.stats_report(),
+        "sessions": bot.chat_memory.stats(),
+        "turn_queue": turn_queue.stats(),
+        "inbox": inbox.stats(),
+        "expiry": expiry.stats(),
+    }
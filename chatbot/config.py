@@ -25,6 +25,22 @@ class GlobalConfig(BaseConfig):
 
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None
+    # reintentos con espera exponencial y jitter ante errores transitorios
+    OPENAI_MAX_RETRIES: int = 3
+    OPENAI_BACKOFF_BASE_SECONDS: float = 0.5
+    OPENAI_BACKOFF_MAX_SECONDS: float = 8.0
+    # segunda petición si la primera tarda más que el p95
+    OPENAI_HEDGE_ENABLED: bool = False
+    OPENAI_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+    # fallos seguidos que abren el circuito y segundos hasta probar de nuevo
+    OPENAI_BREAKER_FAILURES: int = 5
+    OPENAI_BREAKER_RESET_SECONDS: float = 30.0
+    # concurrencia adaptativa (AIMD) y presupuesto de tokens por minuto;
+    # con 0 el presupuesto se toma de las cabeceras x-ratelimit-*
+    OPENAI_CONCURRENCY_INITIAL: int = 8
+    OPENAI_CONCURRENCY_MAX: int = 64
+    OPENAI_TPM_BUDGET: int = 0
 
     # Meta WhatsApp Business API
     WHATSAPP_ACCESS_TOKEN: str
@@ -48,6 +64,80 @@ class GlobalConfig(BaseConfig):
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
+    # Turn queue
+    TURN_WORKERS: int = 16
+    TURN_QUEUE_POLL_SECONDS: float = 5.0
+    TURN_MAX_ATTEMPTS: int = 3
+    TURN_STALE_SECONDS: int = 600
+    INBOX_DEBOUNCE_SECONDS: float = 1.0
+    # límites de un turno del agente; al alcanzarlos responde el modelo de respaldo
+    TURN_DEADLINE_SECONDS: float = 90.0
+    TURN_MAX_TOOL_ROUNDS: int = 6
+    TURN_FALLBACK_MODEL: str = "gpt-5-nano"
+    TURN_FALLBACK_SECONDS: float = 20.0
+
+    # Router de modelos: modelo pequeño por defecto, el grande solo si hace falta
+    ROUTER_ENABLED: bool = True
+    ROUTER_SMALL_MODEL: str = "gpt-5-nano"
+    ROUTER_DEFAULT_MODEL: str = "gpt-5-mini"
+    ROUTER_LARGE_MODEL: str = "gpt-5"
+    ROUTER_ESCALATE_TOOLS: list[str] = [
+        "create_sale_order_by_product_id",
+        "create_lead",
+        "presupuestos",
+        "execute_query",
+    ]
+    ROUTER_ESCALATE_KEYWORDS: list[str] = [
+        "pedido",
+        "comprar",
+        "presupuesto",
+        "cotizacion",
+        "factura",
+        "pagar",
+    ]
+    ROUTER_SMALL_TALK_MAX_CHARS: int = 40
+
+    # Enviar solo las herramientas de la intención del mensaje (y pedir el resto si hacen falta)
+    TOOL_SELECTION_ENABLED: bool = True
+
+    # Precarga especulativa de datos de Odoo al inicio de cada turno
+    PREFETCH_ENABLED: bool = True
+    # Reutilizar resultados de herramientas de lectura entre turnos
+    TOOL_MEMO_ENABLED: bool = True
+    # prompt_cache_key por usuario para aprovechar la caché de prompts de OpenAI
+    PROMPT_CACHE_ENABLED: bool = True
+    # historial en OpenAI (previous_response_id): cada llamada envía solo lo nuevo
+    SERVER_STATE_ENABLED: bool = False
+    # Responder saludos, agradecimientos y "mis pedidos" con plantillas, sin el modelo
+    SHORTCUTS_ENABLED: bool = True
+    # Ofrecer listas y botones de WhatsApp para elegir productos y pedidos
+    INTERACTIVE_REPLIES_ENABLED: bool = True
+    # Herramientas ejecutándose a la vez, entre todos los turnos
+    TOOL_MAX_CONCURRENCY: int = 16
+
+    # Deduplicación de mensajes entrantes ("memory" o "postgres")
+    DEDUP_BACKEND: str = "memory"
+    DEDUP_TTL_SECONDS: int = 24 * 60 * 60
+    DEDUP_MAX_IDS: int = 100_000
+
+    # Estado por usuario ("memory" o "postgres" para varios workers)
+    STATE_BACKEND: str = "memory"
+    STATE_LOCK_TTL_SECONDS: int = 300
+    STATE_LOCK_WAIT_SECONDS: float = 60.0
+    # usuario ocupado en otro worker: el turno vuelve a la cola tras este plazo
+    STATE_LOCK_RETRY_SECONDS: float = 10.0
+
+    # Chat memory
+    CHAT_TOKEN_BUDGET: int = 8000
+    SUMMARY_THRESHOLD_TOKENS: int = 6000
+    SUMMARY_KEEP_TOKENS: int = 2000
+    CHAT_REHYDRATE_MESSAGES: int = 20
+    # límites de las sesiones en memoria (LRU)
+    SESSION_MAX_COUNT: int = 5000
+    SESSION_MAX_BYTES: int = 256 * 1024 * 1024
+    # enviar la respuesta por párrafos mientras se genera
+    STREAM_REPLIES: bool = True
+
     # Others
     WORDS_LIMIT: Optional[int] = None
     CANVA_LINK: str
@@ -1,9 +1,12 @@
 import asyncio
+import hashlib
 import json
 import sys
 import pathlib
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Optional
+import time
+import weakref
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
 from chatbot.logging_conf import logger
 
 # Add project root to sys.path for direct execution
@@ -11,7 +14,7 @@ sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[3]))
 
 from dotenv import load_dotenv
 from fastapi import BackgroundTasks
-from openai import AsyncOpenAI, OpenAI
+from openai import AsyncOpenAI, BadRequestError, NotFoundError, RateLimitError
 
 from chatbot.config import config
 from chatbot.core.ai_agent.enumerations import (
@@ -20,98 +23,367 @@ from chatbot.core.ai_agent.enumerations import (
     ModelType,
     VerbosityType,
 )
-from chatbot.core.ai_agent.prompt import SYSTEM_PROMPT
+from chatbot.core.ai_agent.prompt import SYSTEM_PROMPT, user_data_prompt
+from chatbot.core.ai_agent.ratelimit import AdaptiveLimiter, estimate_request_tokens
+from chatbot.core.ai_agent.resilience import (
+    AIUnavailableError,
+    CircuitBreaker,
+    LatencyWindow,
+    backoff_delay,
+    is_retryable,
+)
+from chatbot.core.ai_agent.router import ModelRouter
+from chatbot.core.ai_agent.sessions import SessionStore
+from chatbot.core.ai_agent.shortcuts import ShortcutEngine
+from chatbot.core.ai_agent.streaming import SentenceChunker
+from chatbot.core.ai_agent.tool_selection import REQUEST_TOOLS, ToolSelector
+from chatbot.core.ai_agent.tokens import (
+    estimate_tokens,
+    pinned_count,
+    trim_to_budget,
+    window_start,
+)
+from chatbot.core.ai_agent.tools import choices, utils
 
 # from chatbot.core.ai_agent.tools.pg_tool import async_execute_query
 from chatbot.core.ai_agent.tools_json import tools_json
-from chatbot.core.ai_agent.tools.odoo_tools import odoo_tools
+from chatbot.core.ai_agent.tools.memo import ToolMemo
+from chatbot.core.ai_agent.tools.odoo_tools import (
+    odoo_tools,
+    tool_invalidations,
+    tool_ttls,
+)
 
 load_dotenv(".env")
 
 
+TURN_CANCELLED_MSG = "Cancelado: se agotó el tiempo del turno"
+TURN_LIMIT_MSG = (
+    "Disculpa, no pude completar tu consulta a tiempo. ¿Puedes intentarlo de nuevo?"
+)
+DEGRADED_MSG = (
+    "Disculpa, estamos teniendo problemas técnicos en este momento. "
+    "Escríbenos de nuevo en unos minutos y seguimos donde lo dejamos."
+)
+# cierre de una respuesta en streaming cortada después de enviar parte
+TURN_CUT_MSG = (
+    "Disculpa, no pude terminar la respuesta. Si necesitas más detalle, pregúntame de nuevo."
+)
+
+
 class SetMessagesError(Exception):
     pass
 
 
+def prompt_cache_key(phone: str) -> str:
+    """Stable per-user cache key; the phone number itself is not sent."""
+    return "chat-" + hashlib.sha256(phone.encode()).hexdigest()[:16]
+
+
 class ChatMemory:
-    def __init__(self, prompt=SYSTEM_PROMPT):
-        self.__ai_output: dict[str, Any] = {}
-        self.__messages: dict[str, list[dict]] = {}
-        self.__tool_msgs: dict[str, list[dict]] = {}
+    def __init__(
+        self,
+        prompt=SYSTEM_PROMPT,
+        token_budget=config.CHAT_TOKEN_BUDGET,
+        summary_threshold=config.SUMMARY_THRESHOLD_TOKENS,
+        summary_keep=config.SUMMARY_KEEP_TOKENS,
+        repository=None,
+        rehydrate_limit=config.CHAT_REHYDRATE_MESSAGES,
+        max_sessions=config.SESSION_MAX_COUNT,
+        max_bytes=config.SESSION_MAX_BYTES,
+        expiry=None,
+        ai_client=None,
+    ):
+        # con repository la memoria es una caché write-behind de la tabla messages
+        self.repository = repository
+        self.rehydrate_limit = rehydrate_limit
+        self.__pending_writes: list[dict] = []
+        self.__flush_task: asyncio.Task | None = None
+        self.token_budget = token_budget
+        self.summary_threshold = summary_threshold
+        self.summary_keep = summary_keep
+        self.__summaries: dict[str, dict] = {}
+        self.__summary_tasks: dict[str, asyncio.Task] = {}
+        self.__sessions = SessionStore(
+            max_sessions, max_bytes, on_evict=self._forget_session
+        )
+        # ExpiryScheduler opcional: cada turno reinicia el plazo de inactividad
+        self.expiry = expiry
+        # AIClient del agente para los resúmenes; sin él el chat no se compacta
+        self.ai_client = ai_client
         self.init_msg = {
             "role": MessageType.DEVELOPER.value,
             "content": prompt,
         }
         self.__last_time: float
 
-    def get_ai_output(self, phone: str):
-        if phone not in self.__ai_output:
-            return []
-
-        return self.__ai_output[phone].output
-
     def get_tool_msgs(self, phone: str):
-        if phone not in self.__tool_msgs:
+        session = self.__sessions.peek(phone)
+        if not session or not session.tool_count:
             return []
-        return self.__tool_msgs[phone]
+        return session.messages[-session.tool_count :]
 
     def get_messages(self, phone: str):
-        if phone not in self.__messages:
+        session = self.__sessions.get(phone)
+        if not session:
             logger.info(f"{phone} not found in memory")
             self.init_chat(phone)
+            session = self.__sessions.get(phone)
+
+        return session.messages  # type: ignore
+
+    def get_window(self, phone: str) -> list:
+        """Messages to send to the model, trimmed to the token budget."""
+        messages = self.get_messages(phone)
+        window = trim_to_budget(messages, self.token_budget)
+        if len(window) < len(messages):
+            logger.debug(
+                f"Chat de {phone} recortado: {len(window)}/{len(messages)} mensajes"
+            )
+        return window
 
-        return self.__messages[phone]
+    def maybe_summarize(self, phone: str) -> None:
+        """Compact the old part of the chat in the background if it grew too big.
+
+        The turns older than the recent window are replaced by a developer
+        message with their summary, placed after the pinned messages so it is
+        always sent. Never blocks the reply path.
+        """
+        session = self.__sessions.peek(phone)
+        if phone in self.__summary_tasks or not session or self.ai_client is None:
+            return
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        messages = session.messages
+        pinned_end = pinned_count(messages)
+        unpinned = sum(estimate_tokens(m) for m in messages[pinned_end:])
+        if unpinned < self.summary_threshold:
+            return
+
+        cut = window_start(messages, self.summary_keep, pinned_end)
+        if cut <= pinned_end:
+            return
+
+        self.__summary_tasks[phone] = asyncio.create_task(
+            self._summarize(phone, messages, pinned_end, cut)
+        )
+
+    async def _summarize(self, phone: str, messages: list, pinned_end: int, cut: int):
+        cut_item = messages[cut]
+        chat = messages[pinned_end:cut]
+        previous = self.__summaries.get(phone)
+        if previous:
+            chat = [{"role": MessageType.ASSISTANT.value, "content": previous["content"]}, *chat]
+
+        try:
+            summary = await utils.summarize_context(chat, self.ai_client)
+        except Exception as exc:
+            logger.error(f"Error resumiendo el chat de {phone}: {exc}")
+            return
+        finally:
+            self.__summary_tasks.pop(phone, None)
+
+        if not summary:
+            return
+
+        # el chat pudo reemplazarse, recortarse o desalojarse mientras se resumía
+        session = self.__sessions.peek(phone)
+        if not session or session.messages is not messages or len(messages) <= cut:
+            return
+        if messages[cut] is not cut_item:
+            return
+
+        summary_msg = {
+            "role": MessageType.DEVELOPER.value,
+            "content": f"Resumen de la conversación anterior: {summary}",
+        }
+        del messages[pinned_end:cut]
+        prev_index = next(
+            (i for i, m in enumerate(messages[:pinned_end]) if m is previous), None
+        )
+        if prev_index is not None:
+            messages[prev_index] = summary_msg
+        else:
+            messages.insert(pinned_end, summary_msg)
+
+        self.__summaries[phone] = summary_msg
+        self.__sessions.recount(session)
+        # la cadena de OpenAI tiene el historial sin compactar: se empieza otra
+        session.response_id = None
+        logger.info(f"Chat de {phone} compactado: {cut - pinned_end} mensajes resumidos")
 
     def get_last_time(self):
         return self.__last_time
 
     def _set_ai_output(self, ai_output, phone: str):
-        self.__ai_output[phone] = ai_output
-
-        if phone not in self.__messages:
+        session = self.__sessions.get(phone)
+        if not session:
             logger.info(f"{phone} not found in memory")
             return False
 
-        if phone not in self.__tool_msgs:
-            self.__tool_msgs[phone] = ai_output.output.copy()
-        else:
-            self.__tool_msgs[phone] += ai_output.output.copy()
+        # solo se conserva el texto de la respuesta, no el objeto Response
+        session.ai_msg = self._extract_ai_msg(ai_output.output)
+        session.tool_count += len(ai_output.output)
+        session.messages += ai_output.output
+        self.__sessions.grow(session, ai_output.output)
+        session.response_id = getattr(ai_output, "id", None)
+        session.synced = len(session.messages)
 
-        self.__messages[phone] += ai_output.output.copy()
+    def chain_input(self, phone: str) -> tuple[Optional[str], list]:
+        """Last stored response of the chat and the items it doesn't have yet.
+
+        Without a chain (new chat, compacted or reset), the whole window.
+        """
+        messages = self.get_messages(phone)
+        session = self.__sessions.peek(phone)
+        if not session.response_id:  # type: ignore
+            return None, self.get_window(phone)
+        return session.response_id, messages[session.synced :]  # type: ignore
+
+    def sync_chain(self, phone: str) -> None:
+        """Mark the reply added after the turn as already in the chain."""
+        session = self.__sessions.peek(phone)
+        if session and session.response_id:
+            session.synced = len(session.messages)
+
+    def reset_chain(self, phone: str) -> None:
+        session = self.__sessions.peek(phone)
+        if session:
+            session.response_id = None
 
     def _clean_tool_msgs(self, phone: str):
-        if phone not in self.__tool_msgs:
-            logger.info(f"{phone} not have tool messages")
+        session = self.__sessions.peek(phone)
+        if session:
+            session.tool_count = 0
 
-        self.__tool_msgs[phone] = []
+    def list_chats(self) -> list[str]:
+        return list(self.__sessions)
 
     def has_chat(self, phone: str) -> bool:
-        return phone in self.__messages and len(self.__messages[phone]) > 0
+        session = self.__sessions.peek(phone)
+        return session is not None and len(session.messages) > 0
+
+    def begin_turn(self, phone: str) -> None:
+        # una sesión con un turno en curso no se desaloja
+        session = self.__sessions.get(phone)
+        if session:
+            session.active = True
+
+    def end_turn(self, phone: str) -> None:
+        session = self.__sessions.peek(phone)
+        if session:
+            session.active = False
+            if self.expiry is not None:
+                self.expiry.touch(phone)
+
+    def stats(self) -> dict:
+        return self.__sessions.stats()
+
+    def session_stats(self, phone: str) -> dict | None:
+        return self.__sessions.session_stats(phone)
+
+    def _forget_session(self, phone: str) -> None:
+        if self.expiry is not None:
+            self.expiry.discard(phone)
+        task = self.__summary_tasks.pop(phone, None)
+        if task:
+            task.cancel()
+        self.__summaries.pop(phone, None)
 
     def delete_chat(self, phone: str) -> None:
-        if phone in self.__messages:
-            del self.__messages[phone]
-        if phone in self.__tool_msgs:
-            del self.__tool_msgs[phone]
-        if phone in self.__ai_output:
-            del self.__ai_output[phone]
+        self._forget_session(phone)
+        self.__sessions.pop(phone)
+
+    def reset_chat(self, phone: str) -> None:
+        """Delete the chat and mark the reset so it is not rehydrated later."""
+        self.delete_chat(phone)
+        self._persist(phone, MessageType.SYSTEM.value, "Chat reiniciado")
+
+    async def rehydrate(self, phone: str) -> bool:
+        """Rebuild a chat missing from memory from the users and messages tables.
+
+        Returns:
+            bool: True if the chat was rebuilt, False if the user is unknown
+            or has no name yet (the caller must look it up in Odoo)
+        """
+        if not self.repository:
+            return False
+
+        user = await self.repository.get_user(phone)
+        if not user or not user.name:  # type: ignore
+            return False
+
+        user_data = {"name": user.name}  # type: ignore
+        if user.email:  # type: ignore
+            user_data["email"] = user.email  # type: ignore
+
+        rows = await self.repository.get_recent_messages(phone, self.rehydrate_limit)
+        recent = []
+        for row in rows:
+            if row.role == MessageType.SYSTEM.value:  # type: ignore
+                # marca de reinicio: lo anterior no pertenece al chat actual
+                recent = []
+            elif row.role in (MessageType.USER.value, MessageType.ASSISTANT.value):  # type: ignore
+                recent.append({"role": row.role, "content": row.message})  # type: ignore
+
+        self.set_messages(
+            [
+                self.init_msg,
+                {"role": MessageType.DEVELOPER.value, "content": user_data_prompt(user_data)},
+                *recent,
+            ],
+            phone,
+        )
+        self.set_user_name(phone, user.name)  # type: ignore
+        logger.info(f"Chat de {phone} recuperado de la BD con {len(recent)} mensajes")
+        return True
+
+    def _persist(self, phone: str, role: str, message: str) -> None:
+        if not self.repository:
+            return
+
+        self.__pending_writes.append(
+            {"user_phone": phone, "role": role, "message": message}
+        )
+        if self.__flush_task is None or self.__flush_task.done():
+            try:
+                self.__flush_task = asyncio.create_task(self._flush())
+            except RuntimeError:
+                # sin event loop (consola síncrona)
+                self.__pending_writes.clear()
+
+    async def _flush(self) -> None:
+        while self.__pending_writes:
+            batch = self.__pending_writes
+            self.__pending_writes = []
+            try:
+                await self.repository.create_messages(batch)  # type: ignore
+            except Exception as exc:
+                logger.error(f"Error persistiendo {len(batch)} mensajes: {exc}")
 
     def init_chat(self, phone: str):
         self.set_messages([self.init_msg], phone)
         logger.info(f"New chat for {phone}")
 
     def add_msg(self, message: str, role: str, phone: str):
-        if phone not in self.__messages:
+        if phone not in self.__sessions:
             self.init_chat(phone)
 
         if MessageType.has_value(role):
-            self.__messages[phone].append(
-                {
-                    "role": role,
-                    "content": message,
-                }
-            )
+            session = self.__sessions.get(phone)
+            msg = {
+                "role": role,
+                "content": message,
+            }
+            session.messages.append(msg)  # type: ignore
+            self.__sessions.grow(session, [msg])  # type: ignore
             logger.info(f"New message from {role} added to chat of {phone}")
+            if role in (MessageType.USER.value, MessageType.ASSISTANT.value):
+                self._persist(phone, role, message)
             return True
 
         logger.warning(f"Invalid role {role}, must be one of: {MessageType.list_values()}")
@@ -127,38 +399,85 @@ class ChatMemory:
                     f"Invalid role {msg['role']} in the {id + 1} message, must be one of: {MessageType.list_values()}"
                 )
 
-        self.__messages[phone] = messages
+        previous = self.__sessions.peek(phone)
+        session = self.__sessions.put(phone, messages)
+        if previous:
+            session.user_name = previous.user_name
 
-    def _get_ai_msg(self, phone: str):
-        ai_output = self.get_ai_output(phone)
+    def set_user_name(self, phone: str, name: str) -> None:
+        """Keep the Odoo name of the user, for the shortcut templates."""
+        session = self.__sessions.peek(phone)
+        if session:
+            session.user_name = name
 
-        for item in ai_output:  # type: ignore
+    def get_user_name(self, phone: str) -> Optional[str]:
+        session = self.__sessions.peek(phone)
+        return session.user_name if session else None
+
+    @staticmethod
+    def _extract_ai_msg(output) -> str | None:
+        for item in output:  # type: ignore
             try:
                 if item.type == "message":
-                    ans = item.content[0].text  # type: ignore
-                    return ans
+                    return item.content[0].text  # type: ignore
 
             except Exception as exc:
                 logger.error(f"Error retrieving AI message: {exc}")
                 logger.error(item)
 
+        return None
+
+    def _get_ai_msg(self, phone: str):
+        session = self.__sessions.peek(phone)
+        if session and session.ai_msg:
+            return session.ai_msg
+
         return "No Answer"
 
     def _purge_tool_msgs(self, phone: str):
-        tool_msgs = self.get_tool_msgs(phone)
-        messages = self.get_messages(phone)
-        if tool_msgs:
-            clean_messages = [m for m in messages if m not in tool_msgs]
-            try:
-                self.set_messages(clean_messages, phone)
-            except SetMessagesError as exc:
-                logger.warning(f"Error purging tool messages: {exc}")
-            finally:
-                self._clean_tool_msgs(phone)
+        # Los items del turno siempre se agregan al final, así que basta con
+        # truncar el segmento: O(items del turno) sin importar el historial
+        session = self.__sessions.peek(phone)
+        if not session:
+            return
+
+        count = min(session.tool_count, len(session.messages))
+        if count:
+            purged = session.messages[-count:]
+            del session.messages[-count:]
+            self.__sessions.grow(session, purged, sign=-1)
+        session.tool_count = 0
+
+    def _set_ai_msg(self, ai_msg: str, phone: str) -> None:
+        session = self.__sessions.peek(phone)
+        if session:
+            session.ai_msg = ai_msg
+
+    def _close_pending_calls(self, phone: str, function_out: str) -> None:
+        """Give an output to the tool calls of the turn that never got one.
+
+        The API rejects a function_call without its output, so a cancelled
+        turn must close them before calling the model again.
+        """
+        calls, answered = [], set()
+        for item in self.get_tool_msgs(phone):
+            item_type = item.get("type") if isinstance(item, dict) else getattr(item, "type", None)
+            if item_type in (
+                MessageType.FUNCTION_CALL.value,
+                MessageType.CUSTOM_TOOL_CALL.value,
+            ):
+                calls.append(item.call_id)
+            elif item_type == MessageType.FUNCTION_CALL_OUTPUT.value:
+                answered.add(item["call_id"])
+
+        for call_id in calls:
+            if call_id not in answered:
+                self._set_tool_output(call_id, function_out, phone)
 
     def _set_tool_output(self, call_id, function_out, phone: str):
         # Store as ephemeral tool output; do not persist in history
-        if phone not in self.__messages:
+        session = self.__sessions.get(phone)
+        if not session:
             logger.info(f"{phone} not found in memory")
             return False
 
@@ -168,174 +487,404 @@ class ChatMemory:
             "output": str(function_out),
         }
 
-        if phone not in self.__tool_msgs:
-            self.__tool_msgs[phone] = [msg]
-        else:
-            self.__tool_msgs[phone].append(msg)
-
-        self.__messages[phone].append(msg)
+        session.tool_count += 1
+        session.messages.append(msg)
+        self.__sessions.grow(session, [msg])
 
 
 class AIClient:
+    """Responses API client with retries, optional hedging and a circuit breaker.
+
+    Transient errors are retried with jittered exponential backoff. With
+    hedging, a request still running after the p95 latency gets a twin and
+    the first answer wins. After repeated failures the circuit opens and
+    calls fail fast with AIUnavailableError until a trial call succeeds.
+    Every request first waits its turn in an AdaptiveLimiter that follows
+    the rate-limit headers, so bursts queue instead of failing with 429.
+    """
+
     def __init__(
         self,
         api_key: str,
+        base_url: Optional[str] = config.OPENAI_BASE_URL,
+        max_retries: int = config.OPENAI_MAX_RETRIES,
+        backoff_base: float = config.OPENAI_BACKOFF_BASE_SECONDS,
+        backoff_max: float = config.OPENAI_BACKOFF_MAX_SECONDS,
+        hedge: bool = config.OPENAI_HEDGE_ENABLED,
+        hedge_min_delay: float = config.OPENAI_HEDGE_MIN_DELAY_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
     ):
-        self.__client = OpenAI(api_key=api_key)
-        self.__async_client = AsyncOpenAI(api_key=api_key)
+        # los reintentos los gestiona el cliente, no el SDK
+        self.__async_client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker(
+            config.OPENAI_BREAKER_FAILURES, config.OPENAI_BREAKER_RESET_SECONDS
+        )
+        self.limiter = limiter or AdaptiveLimiter(
+            config.OPENAI_CONCURRENCY_INITIAL,
+            max_limit=config.OPENAI_CONCURRENCY_MAX,
+            tpm=config.OPENAI_TPM_BUDGET,
+        )
+        self.latency = LatencyWindow()
+        # tokens de entrada y cuántos vinieron de la caché de prompts, por modelo
+        self.cache_usage: dict[str, dict[str, int]] = {}
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+
+    def stats(self) -> dict:
+        p95 = self.latency.p95()
+        return {
+            **self.counters,
+            "latency_p95_ms": round(p95 * 1000) if p95 else None,
+            "breaker": self.breaker.stats(),
+            "limiter": self.limiter.stats(),
+            "prompt_cache": {
+                model: {
+                    **usage,
+                    "hit_rate": round(usage["cached_tokens"] / usage["input_tokens"], 3)
+                    if usage["input_tokens"]
+                    else None,
+                }
+                for model, usage in self.cache_usage.items()
+            },
+        }
+
+    def _record_usage(self, model: str, ai_output) -> None:
+        usage = getattr(ai_output, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "input_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        input_tokens = usage.input_tokens or 0
+
+        counters = self.cache_usage.setdefault(
+            model, {"calls": 0, "input_tokens": 0, "cached_tokens": 0}
+        )
+        counters["calls"] += 1
+        counters["input_tokens"] += input_tokens
+        counters["cached_tokens"] += cached
+        logger.info(
+            f"{model}: {cached} tokens de entrada en caché, {input_tokens - cached} sin caché"
+        )
 
     async def _async_gen_ai_output(self, params: dict):
-        ai_output = await self.__async_client.responses.create(**params)
+        return await self._with_retries(lambda: self._hedged(params))
+
+    async def _with_retries(self, call: Callable[[], Awaitable[Any]]):
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.counters["rejected"] += 1
+                raise AIUnavailableError("Circuito de OpenAI abierto")
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as exc:
+                if not is_retryable(exc):
+                    # error de la petición, no de OpenAI: no cuenta para el circuito
+                    self.breaker.release()
+                    raise
+                if isinstance(exc, RateLimitError):
+                    # OpenAI responde: el limitador ya redujo la concurrencia
+                    self.breaker.release()
+                else:
+                    self.breaker.failure()
+                if attempt >= self.max_retries:
+                    raise AIUnavailableError(f"OpenAI falló {attempt + 1} veces: {exc!r}") from exc
+
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, exc)
+                logger.warning(f"OpenAI falló ({exc!r}), reintento en {delay:.2f}s")
+                self.counters["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.success()
+            return result
+
+    async def _send(self, params: dict, stream: bool = False):
+        """Raw create call inside a limiter slot; the caller releases the slot.
+
+        Returns:
+            tuple: Tokens reserved in the limiter and the raw response
+        """
+        tokens = estimate_request_tokens(params)
+        await self.limiter.acquire(tokens)
+        try:
+            if stream:
+                raw = await self.__async_client.responses.with_raw_response.create(
+                    **params, stream=True
+                )
+            else:
+                raw = await self.__async_client.responses.with_raw_response.create(**params)
+        except BaseException as exc:
+            response = getattr(exc, "response", None)
+            self.limiter.release(
+                tokens,
+                headers=response.headers if response is not None else None,
+                outcome="rate_limited" if isinstance(exc, RateLimitError) else "error",
+            )
+            raise
+        return tokens, raw
+
+    async def _create(self, params: dict):
+        start = time.monotonic()
+        tokens, raw = await self._send(params)
+        used, headers, outcome = None, None, "error"
+        try:
+            headers = raw.headers
+            ai_output = raw.parse()
+            used, outcome = _total_tokens(ai_output), "ok"
+        finally:
+            # el hueco se libera aunque falle la lectura de la respuesta
+            self.limiter.release(tokens, used, headers, outcome=outcome)
+        self.latency.add(time.monotonic() - start)
+        self._record_usage(params["model"], ai_output)
         return ai_output
 
-    def _gen_ai_output(self, params: dict):
-        return self.__client.responses.create(**params)
+    async def _hedged(self, params: dict):
+        p95 = self.latency.p95()
+        if not self.hedge or p95 is None:
+            return await self._create(params)
+
+        first = asyncio.ensure_future(self._create(params))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(p95, self.hedge_min_delay))
+            if done:
+                return first.result()
+
+            logger.debug("Petición a OpenAI más lenta que el p95, enviando otra")
+            self.counters["hedges"] += 1
+            tasks.append(asyncio.ensure_future(self._create(params)))
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                if not pending:
+                    # fallaron las dos: se propaga el error de la última
+                    return done.pop().result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _async_stream_ai_output(self, params: dict):
+        """Yield the Responses API events of a streamed generation.
+
+        Only opening the stream is retried: once events were yielded the
+        caller may already have sent part of the reply.
+        """
+        tokens, raw = await self._with_retries(lambda: self._send(params, stream=True))
+        self.limiter.observe(raw.headers)
+        used, outcome = None, "closed"
+        try:
+            async for event in raw.parse():
+                if event.type == "response.completed":
+                    used, outcome = _total_tokens(event.response), "ok"
+                    self._record_usage(params["model"], event.response)
+                yield event
+        finally:
+            # el hueco se ocupa mientras dura el stream
+            self.limiter.release(tokens, used, outcome=outcome)
+
+
+def _total_tokens(ai_output) -> Optional[int]:
+    usage = getattr(ai_output, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
 
 
 class ToolRunner:
+    """Single scheduler for the tool calls of a model response.
+
+    Every call becomes a task right away, so all the calls of a response run
+    concurrently, while a semaphore per event loop bounds how many tools run
+    at the same time across all turns.
+    """
+
     def __init__(
         self,
         error_msg="Ha ocurrido un error inesperado",
+        memo: Optional[ToolMemo] = None,
+        max_concurrency: int = config.TOOL_MAX_CONCURRENCY,
+        ai_client: Optional["AIClient"] = None,
     ):
         self.ERROR_MSG = error_msg
+        self.memo = memo
+        # para el resumen del chat que create_lead adjunta al lead
+        self.ai_client = ai_client
+        self.max_concurrency = max_concurrency
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.running = 0
+        self.peak = 0
+        # llamadas que tuvieron que esperar un hueco
+        self.waits = 0
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "peak": self.peak,
+            "waits": self.waits,
+        }
 
-    def _run_functions(
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _bounded(self, make_coro: Callable[[], Awaitable[Any]]):
+        semaphore = self._semaphore()
+        if semaphore.locked():
+            self.waits += 1
+        async with semaphore:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                # se construye dentro de la tarea: un error de argumentos se
+                # devuelve como resultado de la herramienta
+                return await make_coro()
+            finally:
+                self.running -= 1
+
+    def schedule(
         self,
-        functions_called,
+        tool,
         odoo_number: str,
         chat_memory: ChatMemory,
         whatsapp_number: Optional[str],
         background_tasks: Optional[BackgroundTasks],
-    ) -> None:
-        logger.info(f"{len(functions_called)} functions need to be called!")
-
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for tool in functions_called:
-                function_name = tool.name
-                logger.info(f"function_name: {function_name}")
-
-                function_to_call = odoo_tools[function_name]
-                function_args = json.loads(tool.arguments)
-                function_args["background_tasks"] = background_tasks
-                if odoo_number:
-                    function_args["user_number"] = odoo_number
-
-                if whatsapp_number:
-                    function_args["twilio_number"] = whatsapp_number
-
-                if function_name == "create_lead":
-                    function_args["chat"] = chat_memory.get_messages(odoo_number)
-
-                fa_str = str(function_args)
-                logger.info(
-                    f"function_args: {fa_str[:100]}{'...' if len(fa_str) > 100 else ''}"
-                )
-                futures.append(executor.submit(function_to_call, **function_args))
-
-            self.run_futures(futures, functions_called, odoo_number, chat_memory)
+    ) -> asyncio.Task:
+        """Start a function or custom tool call as a task."""
+        if tool.type == MessageType.CUSTOM_TOOL_CALL.value:
+            make_coro = partial(
+                self._custom_tool_coroutine,
+                tool,
+                odoo_number,
+                whatsapp_number,
+                background_tasks,
+            )
+        else:
+            make_coro = partial(
+                self._function_coroutine,
+                tool,
+                odoo_number,
+                chat_memory,
+                whatsapp_number,
+                background_tasks,
+            )
+        return asyncio.ensure_future(self._bounded(make_coro))
 
-    def _run_custom_tools(
+    async def run_tools(
         self,
-        custom_tools_called,
+        tools_called,
         odoo_number: str,
         chat_memory: ChatMemory,
         whatsapp_number: Optional[str],
         background_tasks: Optional[BackgroundTasks],
     ) -> None:
-        logger.info(f"{len(custom_tools_called)} custom tools need to be called!")
-
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for tool in custom_tools_called:
-                logger.info(f"Custom tool name: {tool.name}")
-                function_to_call = odoo_tools[tool.name]
-                logger.info(f"Custom tool input: {tool.input}")
-
-                function_args = {"tool_input": tool.input}
-                function_args["background_tasks"] = background_tasks
-                if odoo_number:
-                    function_args["user_number"] = odoo_number
-                if whatsapp_number:
-                    function_args["twilio_number"] = whatsapp_number
-
-                futures.append(executor.submit(function_to_call, **function_args))
-
-            self.run_futures(futures, custom_tools_called, odoo_number, chat_memory)
-
-    def run_futures(self, futures, tools_called, phone: str, chat_memory: ChatMemory):
-        for future, tool in zip(futures, tools_called):
-            try:
-                function_out = future.result()
-                logger.info(f"{tool.name}: {function_out[:100]}")  # type: ignore
-            except Exception as exc:
-                logger.error(f"{tool.name}: {exc}")
-                function_out = self.ERROR_MSG
-
-            chat_memory._set_tool_output(tool.call_id, function_out, phone)
-
-    async def _async_run_functions(
+        """Run all the tool calls of a response and store their outputs."""
+        logger.info(f"{len(tools_called)} tools need to be called!")
+        tasks = [
+            self.schedule(tool, odoo_number, chat_memory, whatsapp_number, background_tasks)
+            for tool in tools_called
+        ]
+        await self.run_coroutines(tools_called, tasks, odoo_number, chat_memory)
+
+    def _function_coroutine(
         self,
-        functions_called,
+        tool,
         odoo_number: str,
         chat_memory: ChatMemory,
         whatsapp_number: Optional[str],
         background_tasks: Optional[BackgroundTasks],
-    ) -> None:
-        logger.info(f"{len(functions_called)} function need to be called!")
-        tasks = []
-        for tool in functions_called:
-            function_name = tool.name
-            logger.info(f"function_name: {function_name}")
-            function_to_call = odoo_tools[function_name]  # type: ignore
-
-            function_args = json.loads(tool.arguments)
-            function_args["background_tasks"] = background_tasks
-            if odoo_number:
-                function_args["user_number"] = odoo_number
-            if whatsapp_number:
-                function_args["twilio_number"] = whatsapp_number
-            if function_name == "create_lead":
-                function_args["chat"] = chat_memory.get_messages(odoo_number)
-
-            fa_str = str(function_args)
-            logger.info(f"function_args: {fa_str[:100]}{'...' if len(fa_str) > 100 else ''}")
-            tasks.append(function_to_call(**function_args))
-
-        await self.run_coroutines(functions_called, tasks, odoo_number, chat_memory)
-
-    async def _async_run_custom_tools(  # type: ignore
+    ):
+        function_name = tool.name
+        logger.info(f"function_name: {function_name}")
+        function_to_call = odoo_tools[function_name]  # type: ignore
+
+        function_args = json.loads(tool.arguments)
+        function_args["background_tasks"] = background_tasks
+        if odoo_number:
+            function_args["user_number"] = odoo_number
+        if whatsapp_number:
+            function_args["twilio_number"] = whatsapp_number
+        if function_name == "create_lead":
+            function_args["chat"] = chat_memory.get_messages(odoo_number)
+            function_args["ai_client"] = self.ai_client
+
+        fa_str = str(function_args)
+        logger.info(f"function_args: {fa_str[:100]}{'...' if len(fa_str) > 100 else ''}")
+        if self.memo is None:
+            return self._deliver(function_to_call(**function_args))
+
+        return self._deliver(
+            self.memo.call(
+                function_name,
+                function_args,
+                odoo_number,
+                lambda: function_to_call(**function_args),
+            )
+        )
+
+    @staticmethod
+    async def _deliver(call: Awaitable[Any]):
+        # los mensajes interactivos se envían fuera de la memo, también en un acierto
+        function_out = await call
+        if isinstance(function_out, choices.Offer):
+            asyncio.create_task(function_out.send())
+            return str(function_out)
+        return function_out
+
+    def _custom_tool_coroutine(
         self,
-        custom_tools_called,
+        tool,
         odoo_number: str,
-        chat_memory: ChatMemory,
         whatsapp_number: Optional[str],
         background_tasks: Optional[BackgroundTasks],
-    ) -> None:
-        logger.info(f"{len(custom_tools_called)} custom tools need to be called!")
-
-        tasks = []
-        for tool in custom_tools_called:
-            logger.info(f"function_name: {tool.name}")
-            function_to_call = odoo_tools[tool.name]  # type: ignore
-
-            logger.info(f"Input tool: {tool.input}")
+    ):
+        logger.info(f"function_name: {tool.name}")
+        function_to_call = odoo_tools[tool.name]  # type: ignore
 
-            function_args = {"tool_input": tool.input}
-            function_args["background_tasks"] = background_tasks
-            if odoo_number:
-                function_args["user_number"] = odoo_number
-            if whatsapp_number:
-                function_args["twilio_number"] = whatsapp_number
+        logger.info(f"Input tool: {tool.input}")
 
-            tasks.append(function_to_call(**function_args))
+        function_args = {"tool_input": tool.input}
+        function_args["background_tasks"] = background_tasks
+        if odoo_number:
+            function_args["user_number"] = odoo_number
+        if whatsapp_number:
+            function_args["twilio_number"] = whatsapp_number
 
-        await self.run_coroutines(custom_tools_called, tasks, odoo_number, chat_memory)
+        return function_to_call(**function_args)
 
     async def run_coroutines(
         self, tools_called, tasks, phone: str, chat_memory: ChatMemory
     ):
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        tasks = [asyncio.ensure_future(task) for task in tasks]
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            # turno cancelado: se conservan las herramientas que ya terminaron
+            for tool, task in zip(tools_called, tasks):
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    chat_memory._set_tool_output(tool.call_id, task.result(), phone)
+                else:
+                    task.cancel()
+            raise
 
         for tool, function_out in zip(tools_called, results):
             if isinstance(function_out, Exception):
@@ -352,139 +901,554 @@ class Agent:
         self,
         name="Jumo Agent",
         model=ModelType.GPT_5.value,
+        repository=None,
+        max_tool_rounds=config.TURN_MAX_TOOL_ROUNDS,
+        turn_deadline=config.TURN_DEADLINE_SECONDS,
+        fallback_model=config.TURN_FALLBACK_MODEL,
+        fallback_timeout=config.TURN_FALLBACK_SECONDS,
+        router: Optional[ModelRouter] = None,
+        tool_selector: Optional[ToolSelector] = None,
+        shortcuts: Optional[ShortcutEngine] = None,
+        tool_memo=config.TOOL_MEMO_ENABLED,
+        prompt_cache=config.PROMPT_CACHE_ENABLED,
+        server_state=config.SERVER_STATE_ENABLED,
     ):
         self.name = name
         self.model = model
-        self.chat_memory = ChatMemory()
+        # un solo cliente (pool, limitador y circuito) para turnos y resúmenes
         self._ai_client = AIClient(config.OPENAI_API_KEY)
-        self._tool_runner = ToolRunner()
+        self.chat_memory = ChatMemory(repository=repository, ai_client=self._ai_client)
+        self._tool_runner = ToolRunner(
+            memo=ToolMemo(tool_ttls, tool_invalidations) if tool_memo else None,
+            ai_client=self._ai_client,
+        )
+        self.prompt_cache = prompt_cache
+        # encadenar llamadas con previous_response_id y enviar solo lo nuevo
+        self.server_state = server_state
+        self.chain_stats = {"chained": 0, "full": 0, "items_sent": 0, "expired": 0}
+        self.max_tool_rounds = max_tool_rounds
+        self.turn_deadline = turn_deadline
+        self.fallback_model = fallback_model
+        self.fallback_timeout = fallback_timeout
+        # sin router todos los turnos usan self.model
+        self.router = router
+        # sin selector se envían todas las herramientas en cada llamada
+        self.tool_selector = tool_selector
+        # sin atajos todos los mensajes pasan por el modelo
+        self.shortcuts = shortcuts
+        # veces que se cortó un turno por cada límite
+        self.limit_hits = {"deadline": 0, "max_tool_rounds": 0}
+        self.fallback_errors = 0
+        # turnos respondidos con DEGRADED_MSG porque OpenAI no estaba disponible
+        self.degraded_replies = 0
+
+    def stats(self) -> dict:
+        memo = self._tool_runner.memo
+        return {
+            "tools": self._tool_runner.stats(),
+            "tool_memo": memo.stats() if memo else None,
+            "limit_hits": dict(self.limit_hits),
+            "fallback_errors": self.fallback_errors,
+            "degraded_replies": self.degraded_replies,
+            "openai": self._ai_client.stats(),
+            "server_state": dict(self.chain_stats) if self.server_state else None,
+            "shortcuts": self.shortcuts.stats() if self.shortcuts else None,
+            "max_tool_rounds": self.max_tool_rounds,
+            "turn_deadline": self.turn_deadline,
+        }
 
-    def process_msg(
+    def _prefix_params(
+        self, odoo_number: str, model: str, tools: Optional[list] = None
+    ) -> dict:
+        """Request fields shared by every call of a user's chat.
+
+        The prompt OpenAI caches is tools, then input: the tools in their
+        fixed tools_json order, then SYSTEM_PROMPT and the user data as the
+        pinned head of the window, then the conversation, which only grows
+        at the end. Nothing per turn goes before the conversation, so
+        consecutive calls with the same tools share the longest possible
+        prefix, and the per-user prompt_cache_key routes them to the same
+        cache. With a ToolSelector the tools are one of its fixed sets,
+        which only grow within a chat, so the block stays stable too.
+
+        With server_state the history lives in OpenAI: the call chains to
+        the chat's last stored response and input only has the items added
+        since (the user message, function_call_outputs), so the request size
+        no longer grows with the conversation.
+        """
+        params = {
+            "model": model,  # type: ignore
+            "tools": tools if tools is not None else tools_json,  # type: ignore
+        }
+        if self.server_state:
+            previous, items = self.chat_memory.chain_input(odoo_number)
+            params["input"] = items
+            params["store"] = True
+            if previous:
+                params["previous_response_id"] = previous
+            self.chain_stats["chained" if previous else "full"] += 1
+            self.chain_stats["items_sent"] += len(items)
+        else:
+            params["input"] = self.chat_memory.get_window(odoo_number)
+        if self.prompt_cache:
+            params["prompt_cache_key"] = prompt_cache_key(odoo_number)
+        return params
+
+    def _chain_expired(self, params: dict, exc: BaseException, odoo_number: str) -> bool:
+        """Whether the call failed because the chained response is gone.
+
+        In that case the chain is dropped so the next call resends the full
+        local window.
+        """
+        if "previous_response_id" not in params:
+            return False
+        missing = isinstance(exc, NotFoundError) or (
+            isinstance(exc, BadRequestError)
+            and (
+                exc.param == "previous_response_id"
+                or "previous response" in str(exc).lower()
+            )
+        )
+        if not missing:
+            return False
+
+        self.chain_stats["expired"] += 1
+        logger.warning(
+            f"Response {params['previous_response_id']} de {odoo_number} no disponible, "
+            "reenviando el historial local"
+        )
+        self.chat_memory.reset_chain(odoo_number)
+        return True
+
+    def _build_params(
+        self, odoo_number: str, model: Optional[str] = None, tools: Optional[list] = None
+    ) -> dict:
+        model = model or self.model
+        params = self._prefix_params(odoo_number, model, tools)  # type: ignore
+        if model.startswith(ModelType.GPT_5.value):  # type: ignore
+            params["text"] = {"verbosity": VerbosityType.LOW.value}
+            params["reasoning"] = {"effort": EffortType.MINIMAL.value}
+        return params
+
+    def _route(self, message: str) -> str:
+        return self.router.route(message) if self.router else self.model
+
+    def _select_tools(self, message: str, odoo_number: str) -> list:
+        if not self.tool_selector:
+            return tools_json
+        return self.tool_selector.select(message, odoo_number)
+
+    async def _generate(self, params: dict):
+        start = time.monotonic()
+        ai_output = await self._ai_client._async_gen_ai_output(params)
+        if self.router:
+            self.router.record(
+                params["model"], time.monotonic() - start, getattr(ai_output, "usage", None)
+            )
+        return ai_output
+
+    def _fallback_params(self, odoo_number: str) -> dict:
+        # tool_choice none: el modelo responde con los resultados que ya tiene
+        params = self._prefix_params(odoo_number, self.fallback_model)
+        params["tool_choice"] = "none"
+        if self.fallback_model.startswith("gpt-5"):
+            params["reasoning"] = {"effort": EffortType.MINIMAL.value}
+        return params
+
+    def _hit_limit(self, limit: str, odoo_number: str) -> None:
+        self.limit_hits[limit] += 1
+        logger.warning(
+            f"Turno de {odoo_number} cortado por {limit}, respondiendo con {self.fallback_model}"
+        )
+        self.chat_memory._close_pending_calls(odoo_number, TURN_CANCELLED_MSG)
+
+    async def _async_fallback(self, limit: str, odoo_number: str) -> None:
+        self._hit_limit(limit, odoo_number)
+        try:
+            ai_output = await asyncio.wait_for(
+                self._generate(self._fallback_params(odoo_number)),
+                self.fallback_timeout,
+            )
+            self.chat_memory._set_ai_output(ai_output, odoo_number)
+        except Exception as exc:
+            self.fallback_errors += 1
+            logger.error(f"Fallback de {odoo_number} falló: {exc!r}")
+            self.chat_memory._set_ai_msg(TURN_LIMIT_MSG, odoo_number)
+            # la respuesta local no está en la cadena de OpenAI
+            self.chat_memory.reset_chain(odoo_number)
+
+    def _degrade(self, odoo_number: str, exc: Exception) -> None:
+        # el chat se conserva: el usuario puede seguir cuando OpenAI vuelva
+        self.degraded_replies += 1
+        logger.error(f"OpenAI no disponible para {odoo_number}: {exc}")
+        self.chat_memory._close_pending_calls(odoo_number, TURN_CANCELLED_MSG)
+        self.chat_memory._set_ai_msg(DEGRADED_MSG, odoo_number)
+        self.chat_memory.reset_chain(odoo_number)
+
+    def _cut_short(self, odoo_number: str, delivered: list[str]) -> None:
+        # el chat guarda lo que el usuario recibió, seguido del aviso de corte
+        self.chat_memory._set_ai_msg("\n\n".join([*delivered, TURN_CUT_MSG]), odoo_number)
+        # la respuesta local no está en la cadena de OpenAI
+        self.chat_memory.reset_chain(odoo_number)
+
+    async def _shortcut(
+        self, message: str, odoo_number: str, whatsapp_number: Optional[str]
+    ) -> str | None:
+        """Template reply of the shortcut engine, recorded in the chat like a model turn."""
+        if self.shortcuts is None:
+            return None
+        # como un turno del modelo: la sesión no se desaloja mientras tanto y
+        # end_turn renueva el plazo de inactividad
+        self.chat_memory.begin_turn(odoo_number)
+        try:
+            ai_msg = await self.shortcuts.answer(
+                message,
+                odoo_number,
+                whatsapp_number,
+                self.chat_memory.get_user_name(odoo_number),
+            )
+            if ai_msg is None:
+                return None
+
+            logger.info(f"{self.name}: {ai_msg}")
+            # el modelo verá ambos mensajes en el siguiente turno (y con
+            # server_state se envían como elementos nuevos de la cadena)
+            self.chat_memory.add_msg(message, MessageType.USER.value, odoo_number)
+            self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, odoo_number)
+        finally:
+            self.chat_memory.end_turn(odoo_number)
+        self.chat_memory.maybe_summarize(odoo_number)
+        return ai_msg
+
+    async def async_process_msg(
         self,
         message: str,
         odoo_number: str,
         background_tasks: Optional[BackgroundTasks] = None,
         whatsapp_number: Optional[str] = None,
     ) -> str | None:
-        logger.info(f"Running {self.model} with {len(tools_json)} tools")
-
-        self.chat_memory.add_msg(message, MessageType.USER.value, odoo_number)
+        ai_msg = await self._shortcut(message, odoo_number, whatsapp_number)
+        if ai_msg is not None:
+            return ai_msg
 
-        while True:
-            params = {
-                "model": self.model,  # type: ignore
-                "input": self.chat_memory.get_messages(odoo_number),  # type: ignore
-                "tools": tools_json,  # type: ignore
-            }
-            if self.model == ModelType.GPT_5.value:  # type: ignore
-                params["text"] = {"verbosity": VerbosityType.LOW.value}
-                params["reasoning"] = {"effort": EffortType.MINIMAL.value}
-
-            ai_output = self._ai_client._gen_ai_output(params)
-            self.chat_memory._set_ai_output(ai_output, odoo_number)
-
-            functions_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.FUNCTION_CALL.value
-            ]
-
-            custom_tools_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.CUSTOM_TOOL_CALL.value
-            ]
-
-            if not functions_called and not custom_tools_called:
-                break
+        tools = self._select_tools(message, odoo_number)
+        logger.info(f"Running {self.name} with {len(tools)} tools")
 
-            if functions_called:
-                self._tool_runner._run_functions(
-                    functions_called,
-                    odoo_number,
-                    self.chat_memory,
-                    whatsapp_number,
-                    background_tasks,
+        self.chat_memory.add_msg(message, MessageType.USER.value, odoo_number)
+        self.chat_memory.begin_turn(odoo_number)
+        try:
+            try:
+                # al vencer el plazo se cancelan la llamada al modelo o las
+                # herramientas en curso
+                limit = await asyncio.wait_for(
+                    self._async_tool_loop(
+                        odoo_number,
+                        self._route(message),
+                        tools,
+                        background_tasks,
+                        whatsapp_number,
+                    ),
+                    self.turn_deadline,
                 )
+            except asyncio.TimeoutError:
+                limit = "deadline"
+            except AIUnavailableError as exc:
+                limit = None
+                self._degrade(odoo_number, exc)
 
-            if custom_tools_called:
-                self._tool_runner._run_custom_tools(
-                    custom_tools_called,
-                    odoo_number,
-                    self.chat_memory,
-                    whatsapp_number,
-                    background_tasks,
-                )
+            if limit:
+                await self._async_fallback(limit, odoo_number)
+        finally:
+            self.chat_memory.end_turn(odoo_number)
 
         self.chat_memory._purge_tool_msgs(odoo_number)
         ai_msg = self.chat_memory._get_ai_msg(odoo_number)
         logger.info(f"{self.name}: {ai_msg}")
         self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, odoo_number)
+        self.chat_memory.sync_chain(odoo_number)
+        self.chat_memory.maybe_summarize(odoo_number)
         return ai_msg
 
-    async def async_process_msg(
+    async def _async_tool_loop(
         self,
-        message: str,
         odoo_number: str,
-        background_tasks: Optional[BackgroundTasks] = None,
-        whatsapp_number: Optional[str] = None,
+        model: str,
+        tools: list,
+        background_tasks: Optional[BackgroundTasks],
+        whatsapp_number: Optional[str],
     ) -> str | None:
-        logger.info(f"Running {self.name} with {len(tools_json)} tools")
-
-        self.chat_memory.add_msg(message, MessageType.USER.value, odoo_number)
+        """Model/tool rounds of a turn.
 
+        Returns:
+            str: "max_tool_rounds" if the model was still calling tools after
+            the last allowed round, None if it answered
+        """
+        rounds = 0
         while True:
-            params = {
-                "model": self.model,  # type: ignore
-                "input": self.chat_memory.get_messages(odoo_number),  # type: ignore
-                "tools": tools_json,  # type: ignore
-            }
-            if self.model == ModelType.GPT_5.value:  # type: ignore
-                params["text"] = {"verbosity": VerbosityType.LOW.value}
-                params["reasoning"] = {"effort": EffortType.MINIMAL.value}
-
-            ai_output = await self._ai_client._async_gen_ai_output(params)
+            params = self._build_params(odoo_number, model, tools)
+            try:
+                ai_output = await self._generate(params)
+            except (BadRequestError, NotFoundError) as exc:
+                if self._chain_expired(params, exc, odoo_number):
+                    continue
+                raise
+            if self.tool_selector and self.tool_selector.expansion(ai_output):
+                # se repite la llamada con todas las herramientas
+                self.tool_selector.record_expansion(odoo_number)
+                tools = tools_json
+                continue
+            if self.router and self.router.escalation(ai_output, model):
+                # la salida del modelo pequeño se descarta sin ejecutar nada
+                model = self.router.large_model
+                continue
             self.chat_memory._set_ai_output(ai_output, odoo_number)
 
-            functions_called = [
+            tools_called = [
                 item
                 for item in ai_output.output  # type: ignore
-                if item.type == MessageType.FUNCTION_CALL.value
+                if item.type
+                in (MessageType.FUNCTION_CALL.value, MessageType.CUSTOM_TOOL_CALL.value)
             ]
+            if not tools_called:
+                return None
+
+            await self._tool_runner.run_tools(
+                tools_called,
+                odoo_number,
+                self.chat_memory,
+                whatsapp_number,
+                background_tasks,
+            )
 
-            custom_tools_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.CUSTOM_TOOL_CALL.value
-            ]
+            rounds += 1
+            if rounds >= self.max_tool_rounds:
+                return "max_tool_rounds"
 
-            if not functions_called and not custom_tools_called:
-                break
+    async def async_stream_msg(
+        self,
+        message: str,
+        odoo_number: str,
+        send: Callable[[str], Awaitable[Any]],
+        max_chars: int,
+        background_tasks: Optional[BackgroundTasks] = None,
+        whatsapp_number: Optional[str] = None,
+    ) -> str | None:
+        """Streaming variant of async_process_msg.
+
+        Complete paragraphs are passed to send as soon as they are generated
+        instead of waiting for the whole reply, and tool calls start running
+        as soon as their item is done, while the model is still streaming.
+
+        Args:
+            message: User's message
+            odoo_number: Formatted phone number, used as chat key
+            send: Coroutine called with each chunk of the reply, in order
+            max_chars: Max length of a chunk (WhatsApp message limit)
+            background_tasks: Tasks to run after the turn
+            whatsapp_number: Original user number
+
+        Returns:
+            str: Full reply of the assistant
+        """
+        ai_msg = await self._shortcut(message, odoo_number, whatsapp_number)
+        if ai_msg is not None:
+            # las plantillas caben en un mensaje; si no, se parten como el stream
+            chunker = SentenceChunker(max_chars)
+            chunks = [ai_msg] if len(ai_msg) <= max_chars else chunker.feed(ai_msg) + chunker.flush()
+            for chunk in chunks:
+                await send(chunk)
+            return ai_msg
+
+        tools = self._select_tools(message, odoo_number)
+        logger.info(f"Streaming {self.name} with {len(tools)} tools")
 
-            if functions_called:
-                await self._tool_runner._async_run_functions(
-                    functions_called,
-                    odoo_number,
-                    self.chat_memory,
-                    whatsapp_number,
-                    background_tasks,
-                )
+        self.chat_memory.add_msg(message, MessageType.USER.value, odoo_number)
+        chunker = SentenceChunker(max_chars)
+        delivered: list[str] = []
+        cut = False
+
+        async def send_chunk(chunk: str) -> None:
+            await send(chunk)
+            delivered.append(chunk)
 
-            if custom_tools_called:
-                await self._tool_runner._async_run_custom_tools(
-                    custom_tools_called,
-                    odoo_number,
-                    self.chat_memory,
-                    whatsapp_number,
-                    background_tasks,
+        self.chat_memory.begin_turn(odoo_number)
+        try:
+            try:
+                limit = await asyncio.wait_for(
+                    self._async_stream_loop(
+                        odoo_number,
+                        self._route(message),
+                        tools,
+                        chunker,
+                        send_chunk,
+                        background_tasks,
+                        whatsapp_number,
+                    ),
+                    self.turn_deadline,
                 )
+            except asyncio.TimeoutError:
+                limit = "deadline"
+            except AIUnavailableError as exc:
+                limit = None
+                chunker = SentenceChunker(max_chars)
+                self._degrade(odoo_number, exc)
+                cut = bool(delivered)
+                if cut:
+                    self._cut_short(odoo_number, delivered)
+
+            if limit:
+                # lo que quedó a medias en el chunker se descarta
+                chunker = SentenceChunker(max_chars)
+                cut = bool(delivered)
+                if cut:
+                    # el usuario ya leyó parte: otra respuesta completa la repetiría
+                    self._hit_limit(limit, odoo_number)
+                    self._cut_short(odoo_number, delivered)
+                else:
+                    await self._async_fallback(limit, odoo_number)
+        finally:
+            self.chat_memory.end_turn(odoo_number)
+
+        for chunk in chunker.flush():
+            await send_chunk(chunk)
 
         self.chat_memory._purge_tool_msgs(odoo_number)
         ai_msg = self.chat_memory._get_ai_msg(odoo_number)
+        if cut:
+            await send(TURN_CUT_MSG)
+        elif not delivered:
+            for chunk in chunker.feed(ai_msg) + chunker.flush():
+                await send(chunk)
         logger.info(f"{self.name}: {ai_msg}")
         self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, odoo_number)
+        self.chat_memory.sync_chain(odoo_number)
+        self.chat_memory.maybe_summarize(odoo_number)
         return ai_msg
 
+    async def _async_stream_loop(
+        self,
+        odoo_number: str,
+        model: str,
+        tools: list,
+        chunker: SentenceChunker,
+        send: Callable[[str], Awaitable[None]],
+        background_tasks: Optional[BackgroundTasks],
+        whatsapp_number: Optional[str],
+    ) -> str | None:
+        """Streamed model/tool rounds of a turn, see _async_tool_loop.
+
+        The router's checks run before any text reaches the user: the first
+        chunk is held until it passes the low-confidence check, and a reply
+        too short to release a chunk is checked whole when the round ends.
+        Once text was sent the turn stays on its model (escalation tools
+        included), so the user never gets a partial answer followed by the
+        large model's.
+        """
+        rounds = 0
+        released = False
+        while True:
+            params = self._build_params(odoo_number, model, tools)
+            ai_output = None
+            escalate = expand = False
+            tools_called, tasks = [], []
+
+            start = time.monotonic()
+            stream = self._ai_client._async_stream_ai_output(params)
+            try:
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        for chunk in chunker.feed(event.delta):
+                            if (
+                                not released
+                                and self.router
+                                and self.router.escalate_text(chunk, model)
+                            ):
+                                escalate = True
+                                break
+                            released = True
+                            await send(chunk)
+                        if escalate:
+                            break
+
+                    elif event.type == "response.output_item.done":
+                        tool = event.item
+                        if tool.type not in (
+                            MessageType.FUNCTION_CALL.value,
+                            MessageType.CUSTOM_TOOL_CALL.value,
+                        ):
+                            continue
+                        if tool.name == REQUEST_TOOLS:
+                            expand = True
+                            break
+                        if (
+                            not released
+                            and self.router
+                            and self.router.escalate_tool(tool.name, model)
+                        ):
+                            escalate = True
+                            break
+
+                        tools_called.append(tool)
+                        tasks.append(
+                            self._tool_runner.schedule(
+                                tool,
+                                odoo_number,
+                                self.chat_memory,
+                                whatsapp_number,
+                                background_tasks,
+                            )
+                        )
+
+                    elif event.type == "response.completed":
+                        ai_output = event.response
+
+                    elif event.type in ("response.failed", "error"):
+                        raise RuntimeError(f"Streaming failed: {event}")
+
+                if ai_output is None and not (escalate or expand):
+                    raise RuntimeError("Stream ended without response.completed")
+            except BaseException as exc:
+                for task in tasks:
+                    task.cancel()
+                if self._chain_expired(params, exc, odoo_number):
+                    continue
+                raise
+            finally:
+                await stream.aclose()
+
+            if escalate or expand:
+                for task in tasks:
+                    task.cancel()
+                chunker.reset()
+                if expand:
+                    self.tool_selector.record_expansion(odoo_number)  # type: ignore
+                    tools = tools_json
+                else:
+                    model = self.router.large_model  # type: ignore
+                continue
+
+            if self.router:
+                self.router.record(
+                    model, time.monotonic() - start, getattr(ai_output, "usage", None)
+                )
+                if not released and not tools_called and self.router.escalation(ai_output, model):
+                    # respuesta vacía o dudosa que aún no salió del chunker
+                    chunker.reset()
+                    model = self.router.large_model
+                    continue
+            self.chat_memory._set_ai_output(ai_output, odoo_number)
+            if not tools_called:
+                return None
+
+            logger.info(f"{len(tools_called)} tools called while streaming")
+            await self._tool_runner.run_coroutines(
+                tools_called, tasks, odoo_number, self.chat_memory
+            )
+
+            rounds += 1
+            if rounds >= self.max_tool_rounds:
+                return "max_tool_rounds"
+
 
 async def console_chat_main():
     """
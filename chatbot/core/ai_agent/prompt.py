@@ -73,3 +73,18 @@ De acuerdo al sector y a la conversación se le debe recomendar unos módulos u
 
 13. Cuando un cliente te hable en un idioma, debes detectar el idioma y conversar con ese cliente en ese idioma en particular, debes esta forma si te escriben en ingles, debes responder y escribirle siempre en ingles, si cambia a catalan o te habla otro cliente en catalan, lo mismo. Así con cada cliente.
     """
+
+
+def user_data_prompt(user_data: dict) -> str:
+    return f"Datos del usuario: {user_data}. Llámale por su nombre"
+
+
+# Compactación del historial: el resumen sustituye a los mensajes antiguos
+# y el modelo sigue la conversación a partir de él
+SUMMARY_PROMPT = """Resume la conversación entre un cliente y el asistente virtual de la tienda para que el asistente pueda continuarla sin el historial.
+Conserva literalmente, sin redondear ni omitir:
+- números e IDs de pedidos y presupuestos, con su estado y monto;
+- productos mencionados con su SKU, precio y cantidades;
+- nombre, empresa y correo del cliente si aparecen;
+- lo que el cliente pidió y aún está pendiente, y lo que el asistente prometió hacer.
+Omite saludos y cortesías. Texto plano en viñetas breves, sin HTML ni markdown."""
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from typing import Mapping, Optional
+
+from chatbot.core.ai_agent.tokens import CHARS_PER_TOKEN, estimate_tokens
+from chatbot.logging_conf import logger
+
+# tokens de salida que se reservan por petición hasta conocer el uso real
+OUTPUT_TOKENS_RESERVE = 500
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset(value: Optional[str]) -> float:
+    """Seconds of an OpenAI reset header ("20ms", "1s", "6m0s")."""
+    if not value:
+        return 0.0
+    return sum(float(amount) * _UNITS[unit] for amount, unit in _DURATION.findall(value))
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def estimate_request_tokens(params: dict) -> int:
+    """Tokens a Responses request will consume: input, tool schemas and output reserve."""
+    items = params.get("input") or []
+    if isinstance(items, str):
+        tokens = len(items) // CHARS_PER_TOKEN
+    else:
+        tokens = sum(estimate_tokens(item) for item in items)
+    if params.get("tools"):
+        tokens += len(json.dumps(params["tools"], default=str)) // CHARS_PER_TOKEN
+    return tokens + OUTPUT_TOKENS_RESERVE
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit plus a tokens-per-minute budget for OpenAI calls.
+
+    Calls wait in a FIFO queue until there is a free slot and enough token
+    budget. Every successful call raises the limit by 1/limit (about +1 per
+    round of calls) and a 429 halves it, at most once per second. The token
+    budget refills continuously at tpm/60 per second and follows the
+    x-ratelimit-* headers of the responses; when a reset header says the
+    quota is exhausted, dispatch pauses until the reset.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        tpm: int = 0,
+        decrease_ratio: float = 0.5,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_ratio = decrease_ratio
+        # 0: sin presupuesto hasta que lo digan las cabeceras
+        self.tpm = tpm
+        self.tokens = float(tpm)
+        self.in_flight = 0
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: deque[tuple[asyncio.Future, int]] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.counters = {"calls": 0, "queued": 0, "rate_limited": 0, "decreases": 0}
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            **self.counters,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "tpm": self.tpm,
+            "tokens_available": int(self.tokens) if self.tpm else None,
+        }
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for a slot and token budget, in arrival order."""
+        self.counters["calls"] += 1
+        if not self._waiters and self._wait_time(tokens) == 0 and self._has_slot():
+            self._start(tokens)
+            return
+
+        self.counters["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((waiter, tokens))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # ya tenía el hueco asignado
+                self.release(tokens, outcome="cancelled")
+            else:
+                self._waiters = deque(w for w in self._waiters if w[0] is not waiter)
+                self._dispatch()
+            raise
+
+    def release(
+        self,
+        reserved: int,
+        used: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        outcome: str = "ok",
+    ) -> None:
+        """Free the slot of a finished call.
+
+        Args:
+            reserved: Tokens taken from the budget by acquire
+            used: Tokens actually used, from the response usage
+            headers: Response headers, to follow the server's limits
+            outcome: "ok", "rate_limited" or anything else for other endings
+        """
+        self.in_flight -= 1
+        if used is not None and self.tpm:
+            self.tokens -= used - reserved
+        if headers is not None:
+            self.observe(headers)
+
+        if outcome == "ok":
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif outcome == "rate_limited":
+            self.counters["rate_limited"] += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= 1:
+                self._last_decrease = now
+                self.counters["decreases"] += 1
+                self.limit = max(self.min_limit, self.limit * self.decrease_ratio)
+                logger.warning(f"OpenAI limitó la tasa, concurrencia reducida a {int(self.limit)}")
+        self._dispatch()
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Update the budget from the x-ratelimit-* headers of a response."""
+        limit_tokens = _int_header(headers, "x-ratelimit-limit-tokens")
+        if limit_tokens and limit_tokens != self.tpm:
+            if not self.tpm:
+                self.tokens = float(limit_tokens)
+            self.tpm = limit_tokens
+
+        self._refill()
+        remaining_tokens = _int_header(headers, "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and self.tpm:
+            self.tokens = min(self.tokens, float(remaining_tokens))
+
+        if _int_header(headers, "x-ratelimit-remaining-requests") == 0:
+            self._block(parse_reset(headers.get("x-ratelimit-reset-requests")))
+        if remaining_tokens == 0:
+            self._block(parse_reset(headers.get("x-ratelimit-reset-tokens")))
+
+    def _block(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.tpm:
+            self.tokens = min(
+                float(self.tpm), self.tokens + (now - self._refilled_at) * self.tpm / 60
+            )
+        self._refilled_at = now
+
+    def _wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if not self.tpm:
+            return 0.0
+        self._refill()
+        # una petición mayor que el presupuesto espera a tenerlo lleno
+        missing = min(tokens, self.tpm) - self.tokens
+        return missing * 60 / self.tpm if missing > 0 else 0.0
+
+    def _start(self, tokens: int) -> None:
+        self.in_flight += 1
+        if self.tpm:
+            self.tokens -= tokens
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._has_slot():
+            waiter, tokens = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            wait = self._wait_time(tokens)
+            if wait > 0:
+                self._schedule(wait)
+                return
+            self._waiters.popleft()
+            self._start(tokens)
+            waiter.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
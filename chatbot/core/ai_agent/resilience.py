@@ -0,0 +1,111 @@
+import random
+import time
+from collections import deque
+from typing import Optional
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from chatbot.logging_conf import logger
+
+
+class AIUnavailableError(Exception):
+    """OpenAI can't answer right now: circuit open or transient errors exhausted retries."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Connection errors, timeouts, 408/409/429 and 5xx are worth retrying."""
+    if isinstance(exc, (APIConnectionError, RateLimitError, InternalServerError)):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code in (408, 409)
+
+
+def backoff_delay(attempt: int, base: float, cap: float, exc: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than a Retry-After header."""
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return min(delay, cap)
+
+
+class LatencyWindow:
+    """Latencies of the last successful calls, to derive the hedging delay."""
+
+    def __init__(self, samples: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=samples)
+
+    def add(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+
+class CircuitBreaker:
+    """Stops calling OpenAI after consecutive transient failures.
+
+    After failure_threshold failures in a row the circuit opens and calls
+    fail fast for reset_timeout seconds. Then a single trial call is let
+    through (half open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial = False
+        # medio abierto: una sola llamada de prueba a la vez
+        if self._trial:
+            return False
+        self._trial = True
+        return True
+
+    def success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuito de OpenAI cerrado")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial = False
+
+    def release(self) -> None:
+        """End a call that says nothing about OpenAI's health (cancelled, bad request)."""
+        self._trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                logger.warning(f"Circuito de OpenAI abierto tras {self.failures} fallos")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened}
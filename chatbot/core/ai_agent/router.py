@@ -0,0 +1,178 @@
+import re
+import statistics
+import unicodedata
+from collections import deque
+from typing import Iterable, Optional
+
+from chatbot.core.ai_agent.enumerations import MessageType, ModelType
+from chatbot.logging_conf import logger
+
+# respuestas de modelos pequeños que indican que no resolvieron la consulta
+LOW_CONFIDENCE_MARKERS = (
+    "no estoy segur",
+    "no tengo informacion",
+    "no tengo esa informacion",
+    "no puedo ayudarte con",
+    "no se exactamente",
+    "no dispongo de",
+)
+
+SMALL_TALK = re.compile(
+    r"^[¡¿\s]*(hola|buen[oa]s?( dias| tardes| noches)?|hey|ok|okay|vale|perfecto|genial|"
+    r"gracias|muchas gracias|mil gracias|adios|chao|hasta luego|si|no|dale|listo)[\s!.?]*$"
+)
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c)).strip()
+
+
+def low_confidence(text: str) -> bool:
+    """Whether a reply (already normalized) did not resolve the query."""
+    return not text or any(marker in text for marker in LOW_CONFIDENCE_MARKERS)
+
+
+class RouteStats:
+    """Latency and token counters of the model calls of one route."""
+
+    def __init__(self, samples: int = 500):
+        self.calls = 0
+        self.turns = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._latencies: deque[float] = deque(maxlen=samples)
+
+    def record(self, latency: float, usage=None) -> None:
+        self.calls += 1
+        self._latencies.append(latency)
+        if usage is not None:
+            self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+            self.output_tokens += getattr(usage, "output_tokens", 0) or 0
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self._latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else None
+        return {
+            "turns": self.turns,
+            "calls": self.calls,
+            "latency_p50_ms": round(statistics.median(latencies) * 1000) if latencies else None,
+            "latency_p95_ms": round(p95 * 1000) if p95 else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class ModelRouter:
+    """Picks the cheapest model that can handle a turn.
+
+    Small talk goes to the small model, everything else to the default
+    model, and turns that look like orders or quotes go straight to the
+    large model. A turn started on a cheaper model is escalated when it
+    calls one of the escalation tools or answers with low confidence; the
+    caller then discards that output and repeats the call on the large model.
+    """
+
+    def __init__(
+        self,
+        small_model: str = ModelType.GPT_5_nano.value,
+        default_model: str = ModelType.GPT_5_mini.value,
+        large_model: str = ModelType.GPT_5.value,
+        escalate_tools: Iterable[str] = (),
+        escalate_keywords: Iterable[str] = (),
+        small_talk_max_chars: int = 40,
+    ):
+        self.small_model = small_model
+        self.default_model = default_model
+        self.large_model = large_model
+        self.escalate_tools = set(escalate_tools)
+        self.escalate_keywords = tuple(normalize(k) for k in escalate_keywords)
+        self.small_talk_max_chars = small_talk_max_chars
+        self.escalations: dict[str, int] = {"keyword": 0, "tool": 0, "low_confidence": 0}
+        self._routes: dict[str, RouteStats] = {}
+
+    def route(self, message: str) -> str:
+        """Model to start the turn with."""
+        text = normalize(message)
+        if any(keyword in text for keyword in self.escalate_keywords):
+            self.escalations["keyword"] += 1
+            return self._start(self.large_model)
+
+        if len(text) <= self.small_talk_max_chars and SMALL_TALK.match(text):
+            return self._start(self.small_model)
+
+        return self._start(self.default_model)
+
+    def escalation(self, ai_output, model: str) -> Optional[str]:
+        """Reason to repeat a model call on the large model, if any.
+
+        Args:
+            ai_output: Response returned by model
+            model: Model that generated it
+
+        Returns:
+            str: "tool" or "low_confidence", None to keep the output
+        """
+        if model == self.large_model:
+            return None
+
+        texts, calls_tools = [], False
+        for item in ai_output.output:
+            if item.type in (
+                MessageType.FUNCTION_CALL.value,
+                MessageType.CUSTOM_TOOL_CALL.value,
+            ):
+                if item.name in self.escalate_tools:
+                    return self._escalate("tool", model)
+                calls_tools = True
+            elif item.type == "message":
+                texts.extend(part.text for part in item.content if hasattr(part, "text"))
+
+        if calls_tools:
+            return None
+
+        if low_confidence(normalize(" ".join(texts))):
+            return self._escalate("low_confidence", model)
+
+        return None
+
+    def escalate_text(self, text: str, model: str) -> bool:
+        """Streaming check of the first chunk of text, before it is sent.
+
+        Only the first chunk can be checked: once text reached the user the
+        turn stays on its model, so the reply is never sent twice.
+        """
+        if model != self.large_model and low_confidence(normalize(text)):
+            self._escalate("low_confidence", model)
+            return True
+        return False
+
+    def escalate_tool(self, name: str, model: str) -> bool:
+        """Streaming check of a single tool call, see escalation()."""
+        if model != self.large_model and name in self.escalate_tools:
+            self._escalate("tool", model)
+            return True
+        return False
+
+    def record(self, model: str, latency: float, usage=None) -> None:
+        self._stats(model).record(latency, usage)
+
+    def stats(self) -> dict:
+        return {
+            "escalations": dict(self.escalations),
+            "routes": {model: stats.as_dict() for model, stats in self._routes.items()},
+        }
+
+    def _stats(self, model: str) -> RouteStats:
+        if model not in self._routes:
+            self._routes[model] = RouteStats()
+        return self._routes[model]
+
+    def _start(self, model: str) -> str:
+        self._stats(model).turns += 1
+        return model
+
+    def _escalate(self, reason: str, model: str) -> str:
+        self.escalations[reason] += 1
+        logger.info(f"Escalando de {model} a {self.large_model} por {reason}")
+        return reason
@@ -0,0 +1,160 @@
+import heapq
+import time
+from collections import OrderedDict
+from typing import Callable, Iterator, Optional
+
+from chatbot.core.ai_agent.tokens import estimate_size
+from chatbot.logging_conf import logger
+
+
+class Session:
+    """Chat state of a single phone number."""
+
+    __slots__ = (
+        "messages",
+        "tool_count",
+        "ai_msg",
+        "size",
+        "last_access",
+        "active",
+        "response_id",
+        "synced",
+        "user_name",
+    )
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        # items de herramientas al final del chat (segmento del turno en curso)
+        self.tool_count = 0
+        # último texto del asistente; no se guarda el Response completo
+        self.ai_msg: Optional[str] = None
+        self.size = sum(estimate_size(m) for m in messages)
+        self.last_access = time.time()
+        self.active = False
+        # último Response guardado en OpenAI y cuántos mensajes ya tiene
+        self.response_id: Optional[str] = None
+        self.synced = 0
+        # nombre del cliente en Odoo, para las plantillas de los atajos
+        self.user_name: Optional[str] = None
+
+
+class SessionStore:
+    """LRU store of chat sessions with a hard cap on count and total bytes.
+
+    Sizes are approximate (see tokens.estimate_size) and tracked incrementally
+    by the caller through grow()/recount(). When a cap is exceeded, the least
+    recently used idle sessions are evicted; sessions in the middle of a turn
+    are never evicted.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_bytes: int,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._on_evict = on_evict
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def __contains__(self, phone: str) -> bool:
+        return phone in self._sessions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._sessions))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, phone: str) -> Optional[Session]:
+        """Return the session and mark it as most recently used."""
+        session = self._sessions.get(phone)
+        if session:
+            self._sessions.move_to_end(phone)
+            session.last_access = time.time()
+        return session
+
+    def peek(self, phone: str) -> Optional[Session]:
+        return self._sessions.get(phone)
+
+    def put(self, phone: str, messages: list) -> Session:
+        self.pop(phone)
+        session = Session(messages)
+        self._sessions[phone] = session
+        self.total_bytes += session.size
+        self._enforce_limits()
+        return session
+
+    def pop(self, phone: str) -> Optional[Session]:
+        session = self._sessions.pop(phone, None)
+        if session:
+            self.total_bytes -= session.size
+        return session
+
+    def grow(self, session: Session, items: list, sign: int = 1) -> None:
+        """Account for items appended to (sign=1) or removed from (sign=-1) a session."""
+        delta = sign * sum(estimate_size(m) for m in items)
+        session.size += delta
+        self.total_bytes += delta
+        if delta > 0:
+            self._enforce_limits()
+
+    def recount(self, session: Session) -> None:
+        size = sum(estimate_size(m) for m in session.messages)
+        self.total_bytes += size - session.size
+        session.size = size
+        self._enforce_limits()
+
+    def _enforce_limits(self) -> None:
+        if len(self._sessions) <= self.max_sessions and self.total_bytes <= self.max_bytes:
+            return
+
+        # la sesión más reciente nunca se desaloja: es la que se está usando
+        for phone in list(self._sessions)[:-1]:
+            if len(self._sessions) <= self.max_sessions and self.total_bytes <= self.max_bytes:
+                return
+            if self._sessions[phone].active:
+                continue
+
+            session = self.pop(phone)
+            self.evictions += 1
+            logger.debug(f"Sesión de {phone} desalojada ({session.size} bytes)")  # type: ignore
+            if self._on_evict:
+                self._on_evict(phone)
+
+        if len(self._sessions) <= self.max_sessions and self.total_bytes <= self.max_bytes:
+            return
+        logger.warning(
+            f"Memoria de sesiones sobre el límite con sesiones activas: "
+            f"{len(self._sessions)} sesiones, {self.total_bytes} bytes"
+        )
+
+    def session_stats(self, phone: str) -> Optional[dict]:
+        session = self._sessions.get(phone)
+        if not session:
+            return None
+        return {"phone": phone, **self._describe(session)}
+
+    @staticmethod
+    def _describe(session: Session) -> dict:
+        return {
+            "messages": len(session.messages),
+            "bytes": session.size,
+            "idle_seconds": round(time.time() - session.last_access, 1),
+            "active": session.active,
+        }
+
+    def stats(self, top: int = 10) -> dict:
+        # solo tamaños: /metrics no expone los teléfonos de los clientes
+        largest = heapq.nlargest(top, self._sessions.values(), key=lambda s: s.size)
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "largest": [self._describe(session) for session in largest],
+        }
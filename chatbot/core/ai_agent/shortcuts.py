@@ -0,0 +1,216 @@
+import asyncio
+import re
+from typing import Awaitable, Callable, Optional
+
+from chatbot.core.ai_agent.router import normalize
+from chatbot.core.ai_agent.tools import prefetch, utils
+from chatbot.core.ai_agent.tools.choices import amount, order_state
+from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+from chatbot.core.ai_agent.tools.odoo_tools import sale_orders
+from chatbot.logging_conf import logger
+
+# respuesta a un mensaje interactivo: "[<id>] <título>"
+SELECTION = re.compile(r"^\[(?P<kind>[a-z_]+)(?::(?P<value>[^\]]+))?\]\s*(?P<title>.*)$", re.DOTALL)
+
+# sobre el texto normalizado: minúsculas y sin tildes
+GREETING = re.compile(r"^[¡¿\s]*(hola|buen[oa]s?( dias| tardes| noches)?|hey)[\s!.?]*$")
+THANKS = re.compile(r"^[¡¿\s]*(ok,? |perfecto,? )?((muchas|mil) )?gracias[\s!.?]*$")
+MY_ORDERS = re.compile(
+    r"^[¡¿\s]*(ver |quiero ver )?(mis|los) (pedidos|presupuestos|cotizaciones|compras)[\s!.?]*$"
+)
+
+MAX_ORDERS = 10
+
+
+class ShortcutTurn:
+    """What a shortcut handler knows about the turn."""
+
+    __slots__ = ("phone", "value", "whatsapp_number", "user_name")
+
+    def __init__(
+        self,
+        phone: str,
+        value: Optional[str] = None,
+        whatsapp_number: Optional[str] = None,
+        user_name: Optional[str] = None,
+    ):
+        self.phone = phone
+        # valor del id interactivo ("order:12" -> "12")
+        self.value = value
+        self.whatsapp_number = whatsapp_number
+        # nombre en Odoo guardado en la sesión; None si no es cliente
+        self.user_name = user_name
+
+
+# turno -> respuesta, o None para pasar el mensaje al modelo
+Handler = Callable[[ShortcutTurn], Awaitable[Optional[str]]]
+
+
+def selection_text(reply_id: str, title: str) -> str:
+    """User message of a tap on an interactive button or list row."""
+    return f"[{reply_id}] {title}" if reply_id else title
+
+
+def parse_selection(message: str) -> Optional[tuple[str, Optional[str], str]]:
+    """(kind, value, title) of a message built by selection_text, or None."""
+    match = SELECTION.match(message.strip())
+    if not match:
+        return None
+    return match["kind"], match["value"], match["title"]
+
+
+def format_orders(orders: list[dict]) -> str:
+    lines = ["Estos son tus pedidos:", ""]
+    for order in orders[:MAX_ORDERS]:
+        date = str(order.get("date_order") or "")[:10]
+        lines.append(
+            f"• {order['name']} ({date}): {amount(order.get('amount_total'))} - {order_state(order)}"
+        )
+    if len(orders) > MAX_ORDERS:
+        lines.append(f"…y {len(orders) - MAX_ORDERS} pedidos más.")
+    lines += ["", f"Si quieres el detalle de alguno, escríbeme su número (por ejemplo {orders[0]['name']})."]
+    return "\n".join(lines)
+
+
+def format_product(product: dict) -> str:
+    lines = [product["name"]]
+    if product.get("default_code"):
+        lines[0] += f" (SKU {product['default_code']})"
+    lines.append(f"Precio: {amount(product.get('list_price'))}")
+    stock = product.get("qty_available")
+    lines.append(f"Disponibles: {int(stock)} unidades" if stock else "Sin stock en este momento")
+    if product.get("description_sale"):
+        lines += ["", str(product["description_sale"])]
+    lines += ["", "¿Quieres que te prepare un presupuesto? Dime cuántas unidades necesitas."]
+    return "\n".join(lines)
+
+
+def format_order(order: dict) -> str:
+    date = str(order.get("date_order") or "")[:10]
+    return "\n".join(
+        [
+            f"Pedido {order['name']} ({date})",
+            f"Estado: {order_state(order)}",
+            f"Total: {amount(order.get('amount_total'))}",
+            f"Puedes verlo aquí: {order['link']}",
+        ]
+    )
+
+
+class ShortcutEngine:
+    """Answers the most frequent messages with templates, without calling the model.
+
+    Greetings, thanks, "mis pedidos" and taps on interactive replies are
+    matched with rules over the whole message; anything else (or a rule
+    whose handler returns None) goes to the model as usual. Handlers read
+    Odoo through the turn cache, so they share the prefetched data.
+
+    Interactive replies carry the id of the option ("sku:TAL2040",
+    "order:12"), so they are resolved with an exact lookup instead of the
+    name search and the model turn a typed answer would need.
+    """
+
+    def __init__(self):
+        self.text_rules: list[tuple[str, re.Pattern, Handler]] = [
+            ("greeting", GREETING, self._greeting),
+            ("thanks", THANKS, self._thanks),
+            ("orders", MY_ORDERS, self._orders),
+        ]
+        # id de la respuesta interactiva -> regla
+        self.selection_rules: dict[str, Handler] = {
+            "sku": self._product_by_sku,
+            "product": self._product_by_id,
+            "order": self._order,
+        }
+        self.counters = {"turns": 0, "answered": 0, "errors": 0}
+        self.hits: dict[str, int] = {}
+
+    def match(self, message: str) -> Optional[tuple[str, Handler, Optional[str]]]:
+        """(rule, handler, value) of the rule that takes the message, or None."""
+        selection = parse_selection(message)
+        if selection:
+            kind, value, _ = selection
+            handler = self.selection_rules.get(kind)
+            return (kind, handler, value) if handler else None
+
+        text = normalize(message)
+        for rule, pattern, handler in self.text_rules:
+            if pattern.match(text):
+                return rule, handler, None
+        return None
+
+    async def answer(
+        self,
+        message: str,
+        phone: str,
+        whatsapp_number: Optional[str] = None,
+        user_name: Optional[str] = None,
+    ) -> Optional[str]:
+        """Reply for the message, or None when it must go to the model."""
+        self.counters["turns"] += 1
+        matched = self.match(message)
+        if not matched:
+            return None
+
+        rule, handler, value = matched
+        try:
+            reply = await handler(ShortcutTurn(phone, value, whatsapp_number, user_name))
+        except Exception as exc:
+            self.counters["errors"] += 1
+            logger.error(f"Atajo {rule} falló para {phone}: {exc}")
+            return None
+        if reply is None:
+            return None
+
+        self.counters["answered"] += 1
+        self.hits[rule] = self.hits.get(rule, 0) + 1
+        logger.info(f"Atajo {rule} respondió a {phone} sin llamar al modelo")
+        return reply
+
+    def stats(self) -> dict:
+        turns = self.counters["turns"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["answered"] / turns, 3) if turns else None,
+            "rules": dict(self.hits),
+        }
+
+    async def _greeting(self, turn: ShortcutTurn) -> Optional[str]:
+        # sin cliente en Odoo el modelo tiene que pedir los datos de registro;
+        # el nombre viene de la sesión, sin consultar Odoo
+        if not turn.user_name:
+            return None
+        first_name = turn.user_name.split()[0]
+        return f"¡Hola, {first_name}! ¿En qué puedo ayudarte hoy?"
+
+    async def _thanks(self, turn: ShortcutTurn) -> Optional[str]:
+        return "¡Con gusto! Si necesitas algo más, aquí estoy."
+
+    async def _orders(self, turn: ShortcutTurn) -> Optional[str]:
+        orders = await sale_orders(turn.phone)
+        if isinstance(orders, str):
+            # el motivo (sin cliente, sin pedidos) lo explica mejor el modelo
+            return None
+        return format_orders(orders)
+
+    async def _product_by_sku(self, turn: ShortcutTurn) -> Optional[str]:
+        product = await prefetch.cached(
+            ("product_sku", str(turn.value)), lambda: odoo_orion.get_product_by_sku(turn.value)
+        )
+        return format_product(product) if product else None
+
+    async def _product_by_id(self, turn: ShortcutTurn) -> Optional[str]:
+        product = await odoo_orion.get_product_by_id(int(turn.value))  # type: ignore
+        return format_product(product) if product else None
+
+    async def _order(self, turn: ShortcutTurn) -> Optional[str]:
+        partner, order = await asyncio.gather(
+            prefetch.get_partner_by_phone(turn.phone),
+            odoo_orion.get_sale_order_by_id(int(turn.value)),  # type: ignore
+        )
+        # un id ajeno o inexistente lo explica el modelo
+        if not partner or not order or not utils.order_belongs_to(order, partner):
+            return None
+        if turn.whatsapp_number:
+            asyncio.create_task(utils.send_report(order["id"], turn.whatsapp_number))
+        return format_order(order)
@@ -0,0 +1,102 @@
+import re
+
+# fin de oración seguido de espacio o salto de línea
+SENTENCE_END = re.compile(r"[.!?…:](?=\s)")
+# sin ":" para no separar una introducción de la lista que le sigue
+SENTENCE_STOP = re.compile(r"[.!?…](?=\s)")
+# "4." al inicio de línea numera un elemento, no termina una oración
+ITEM_NUMBER = re.compile(r"\s*\d+\.")
+LIST_ITEM = re.compile(r"^[ \t]*(\d+[.)]|[-•*])\s", re.MULTILINE)
+
+
+class SentenceChunker:
+    """Splits a streamed reply into WhatsApp-sized messages.
+
+    Text is released at paragraph breaks once at least min_chars have been
+    buffered, so the first paragraph goes out as soon as it is complete
+    while short lines (list items) are grouped. A paragraph that reaches
+    sentence_chars is released at its last complete sentence, so a reply
+    written as a single paragraph is not held until the end; inside a list
+    it is released at the end of a line instead, so an item never loses its
+    number. A paragraph longer than max_chars is cut at the last sentence
+    end, newline or space that fits.
+    """
+
+    def __init__(self, max_chars: int, min_chars: int = 80, sentence_chars: int = 300):
+        self.max_chars = max_chars
+        self.min_chars = min(min_chars, max_chars)
+        self.sentence_chars = min(max(sentence_chars, self.min_chars), max_chars)
+        self._buffer = ""
+
+    def feed(self, delta: str) -> list[str]:
+        """Add a text delta and return the chunks that are ready to send."""
+        self._buffer += delta
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return chunks
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+
+    def reset(self) -> None:
+        """Drop the buffered text (the generation it came from was discarded)."""
+        self._buffer = ""
+
+    def flush(self) -> list[str]:
+        """Return whatever is left at the end of the reply."""
+        chunks = []
+        while len(self._buffer) > self.max_chars:
+            cut = self._split_long()
+            chunks.append(self._buffer[:cut].strip())
+            self._buffer = self._buffer[cut:].lstrip()
+
+        rest = self._buffer.strip()
+        self._buffer = ""
+        if rest:
+            chunks.append(rest)
+        return chunks
+
+    def _find_cut(self) -> int | None:
+        limit = min(len(self._buffer), self.max_chars)
+        paragraph = self._buffer.rfind("\n\n", 0, limit + 1)
+        if paragraph >= self.min_chars:
+            return paragraph
+
+        if len(self._buffer) > self.sentence_chars:
+            cut = self._last_stop(SENTENCE_STOP, limit)
+            if cut >= self.sentence_chars:
+                return cut
+
+        if len(self._buffer) > self.max_chars:
+            return self._split_long()
+
+        return None
+
+    def _split_long(self) -> int:
+        sentence_end = self._last_stop(SENTENCE_END, self.max_chars)
+        if sentence_end > 0:
+            return sentence_end
+
+        window = self._buffer[: self.max_chars]
+        for separator in ("\n", " "):
+            pos = window.rfind(separator)
+            if pos > 0:
+                return pos
+
+        return self.max_chars
+
+    def _last_stop(self, pattern: re.Pattern, limit: int) -> int:
+        """End of the last sentence within limit (line end inside a list), or -1."""
+        if LIST_ITEM.search(self._buffer, 0, limit):
+            line_end = self._buffer.rfind("\n", 0, limit)
+            if line_end > 0:
+                return line_end
+
+        for match in reversed(list(pattern.finditer(self._buffer, 0, limit))):
+            line_start = self._buffer.rfind("\n", 0, match.start()) + 1
+            if not ITEM_NUMBER.fullmatch(self._buffer, line_start, match.end()):
+                return match.end()
+        return -1
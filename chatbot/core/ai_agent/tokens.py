@@ -0,0 +1,110 @@
+from chatbot.core.ai_agent.enumerations import MessageType
+
+# ~4 caracteres por token en español/inglés con los tokenizadores de OpenAI
+CHARS_PER_TOKEN = 4
+# tokens fijos por mensaje (rol, separadores)
+MESSAGE_OVERHEAD = 4
+# costo aproximado en memoria de un item (dict/objeto y sus claves)
+ITEM_OVERHEAD_BYTES = 240
+
+PINNED_ROLES = (MessageType.DEVELOPER.value, MessageType.SYSTEM.value)
+
+
+def _get(item, key: str, default=None):
+    if isinstance(item, dict):
+        return item.get(key, default)
+    return getattr(item, key, default)
+
+
+def _role(item) -> str | None:
+    return _get(item, "role")
+
+
+def _text_chars(item) -> int:
+    chars = 0
+    for key in ("content", "output", "arguments"):
+        value = _get(item, key)
+        if isinstance(value, str):
+            chars += len(value)
+        elif isinstance(value, list):
+            for part in value:
+                text = _get(part, "text")
+                if isinstance(text, str):
+                    chars += len(text)
+    return chars
+
+
+def estimate_tokens(item) -> int:
+    """Cheap token estimate of a chat item.
+
+    Only string lengths are read (O(1) each), so it can run over the whole
+    history on every call without becoming a hot spot.
+
+    Args:
+        item: Chat message dict or Responses output item
+
+    Returns:
+        int: Approximate number of tokens
+    """
+    return _text_chars(item) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD
+
+
+def estimate_size(item) -> int:
+    """Approximate memory footprint in bytes of a chat item."""
+    return _text_chars(item) + ITEM_OVERHEAD_BYTES
+
+
+def pinned_count(messages: list) -> int:
+    """Number of leading developer/system messages (prompt and user context)."""
+    pinned_end = 0
+    while pinned_end < len(messages) and _role(messages[pinned_end]) in PINNED_ROLES:
+        pinned_end += 1
+    return pinned_end
+
+
+def window_start(messages: list, budget: int, pinned_end: int = 0) -> int:
+    """Index of the oldest message of the most recent turns that fit budget.
+
+    A turn starts at a user message; the newest turn is always included.
+    """
+    start = len(messages)
+    used = 0
+    turn_tokens = 0
+    for i in range(len(messages) - 1, pinned_end - 1, -1):
+        turn_tokens += estimate_tokens(messages[i])
+        if _role(messages[i]) != MessageType.USER.value and i != pinned_end:
+            continue
+
+        if used + turn_tokens > budget and start < len(messages):
+            break
+
+        used += turn_tokens
+        turn_tokens = 0
+        start = i
+
+    return start
+
+
+def trim_to_budget(messages: list, budget: int) -> list:
+    """Sliding window over a conversation that fits a token budget.
+
+    The leading developer/system messages (prompt and per-user context) are
+    always kept. The rest is kept by whole turns, newest first, where a turn
+    starts at a user message; the current turn is always kept so tool calls
+    and their outputs are never split.
+
+    Args:
+        messages: Full conversation
+        budget: Max tokens for the returned window
+
+    Returns:
+        list: Pinned messages followed by the most recent turns
+    """
+    pinned_end = pinned_count(messages)
+    remaining = budget - sum(estimate_tokens(m) for m in messages[:pinned_end])
+    start = window_start(messages, remaining, pinned_end)
+
+    if start == pinned_end:
+        return messages
+
+    return messages[:pinned_end] + messages[start:]
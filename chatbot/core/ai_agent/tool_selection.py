@@ -0,0 +1,159 @@
+import re
+from collections import OrderedDict
+from typing import Iterable
+
+from chatbot.core.ai_agent.router import normalize
+from chatbot.core.ai_agent.tools.prefetch import find_skus
+from chatbot.core.ai_agent.tools_json import odoo_tools_json, tools_json
+from chatbot.logging_conf import logger
+
+REQUEST_TOOLS = "request_more_tools"
+
+request_more_tools = {
+    "type": "function",
+    "name": REQUEST_TOOLS,
+    "description": "Pide el resto de herramientas (catálogo, imágenes, pedidos, compras) cuando las disponibles no bastan para atender al cliente",
+}
+
+# herramientas de cada intención; las de cuenta van siempre por el flujo de registro
+INTENT_TOOLS = {
+    "account": ["get_partner", "create_partner"],
+    "catalog": [
+        "get_product_by_sku",
+        "get_product_by_name",
+        "get_all_products",
+        "get_products_by_category_id",
+        "get_all_categories",
+    ],
+    "images": [
+        "get_product_by_sku",
+        "get_product_by_name",
+        "send_main_product_image",
+        "send_all_product_images",
+    ],
+    "orders": ["presupuestos", "get_sale_order_by_name", "get_sale_order_by_id"],
+    "purchase": [
+        "get_product_by_sku",
+        "get_product_by_name",
+        "create_sale_order_by_product_id",
+        "create_lead",
+    ],
+}
+
+# Conjuntos fijos de herramientas, cada uno contiene al anterior; las
+# intenciones solo eligen el nivel. "purchase" y request_more_tools suben
+# al nivel completo (tools_json).
+TOOL_TIERS = (
+    ("browse", ("account", "catalog", "images")),
+    ("orders", ("account", "catalog", "images", "orders")),
+)
+FULL = "full"
+
+# sobre el texto normalizado: minúsculas y sin tildes
+INTENT_PATTERNS = {
+    "catalog": re.compile(
+        r"\b(producto|precio|cuesta|cuanto|stock|disponib|tienen|hay|venden|catalogo|"
+        r"categoria|modelo|marca|sku|codigo|busco|necesito|oferta)"
+    ),
+    "images": re.compile(r"\b(foto|imagen|imagenes|muestra|ensena|ver como)"),
+    "orders": re.compile(
+        r"\b(pedido|orden|presupuesto|cotizacion|factura|seguimiento|mis compras|envio)|\bs\d{3,}\b"
+    ),
+    "purchase": re.compile(
+        r"\b(compr|quiero|quisiera|pedir|encarg|cotiza|llevo|unidades|reserv)|@"
+    ),
+}
+
+
+def detect_intents(message: str) -> set[str]:
+    text = normalize(message)
+    intents = {intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(text)}
+    # find_skus ya descarta los nombres de pedido (S00012)
+    if find_skus(message):
+        intents.add("catalog")
+    return intents
+
+
+class ToolSelector:
+    """Picks the tools to send for a turn instead of the whole tools_json.
+
+    Intents are detected with keywords over the user's message and choose
+    one of a few fixed tool sets (TOOL_TIERS, then the full tools_json).
+    The sets are built once in the order of odoo_tools_json, each one ends
+    with request_more_tools, and a chat only moves up: the tools block,
+    which leads the prompt OpenAI caches, stays byte-identical across the
+    turns of a chat and changes at most once per tier. When the model calls
+    request_more_tools the caller repeats the call with every tool and the
+    chat stays on the full set.
+    """
+
+    def __init__(
+        self,
+        tools: Iterable[dict] = odoo_tools_json,
+        intent_tools: dict[str, list[str]] = INTENT_TOOLS,
+        full_tools: list[dict] = tools_json,
+        max_users: int = 10_000,
+    ):
+        self.tools = list(tools)
+        self.max_users = max_users
+        self.tiers: list[tuple[str, list[dict]]] = []
+        for tier, intents in TOOL_TIERS:
+            names = {name for intent in intents for name in intent_tools.get(intent, [])}
+            subset = [tool for tool in self.tools if tool["name"] in names]
+            self.tiers.append((tier, [*subset, request_more_tools]))
+        self.tiers.append((FULL, full_tools))
+        # nivel de cada chat; solo sube
+        self._levels: OrderedDict[str, int] = OrderedDict()
+        self.counters = {"turns": 0, "tools_sent": 0, "tools_total": 0, "expansions": 0}
+        self.intent_counts: dict[str, int] = {}
+        self.tier_counts: dict[str, int] = {}
+
+    def select(self, message: str, phone: str) -> list[dict]:
+        intents = detect_intents(message)
+        level = max(self._level(intents), self._levels.pop(phone, 0))
+        self._remember(phone, level)
+        tier, tools = self.tiers[level]
+
+        self.counters["turns"] += 1
+        self.counters["tools_sent"] += len(tools)
+        self.counters["tools_total"] += len(self.tools)
+        for intent in intents:
+            self.intent_counts[intent] = self.intent_counts.get(intent, 0) + 1
+        self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+        logger.debug(f"Herramientas para {phone}: {tier} ({len(tools)})")
+        return tools
+
+    def _level(self, intents: set[str]) -> int:
+        if "purchase" in intents:
+            return len(self.tiers) - 1
+        for level, (_, tier_intents) in enumerate(TOOL_TIERS):
+            if intents <= set(tier_intents):
+                return level
+        return len(self.tiers) - 1
+
+    def _remember(self, phone: str, level: int) -> None:
+        self._levels[phone] = level
+        while len(self._levels) > self.max_users:
+            self._levels.popitem(last=False)
+
+    def expansion(self, ai_output) -> bool:
+        """Whether the model asked for the full tool set."""
+        return any(
+            getattr(item, "name", None) == REQUEST_TOOLS for item in ai_output.output
+        )
+
+    def record_expansion(self, phone: str) -> None:
+        self.counters["expansions"] += 1
+        # los turnos siguientes mantienen el mismo bloque de herramientas
+        self._levels.pop(phone, None)
+        self._remember(phone, len(self.tiers) - 1)
+        logger.info(f"{phone} pidió el resto de herramientas")
+
+    def stats(self) -> dict:
+        total = self.counters["tools_total"]
+        return {
+            **self.counters,
+            "tools_ratio": round(self.counters["tools_sent"] / total, 3) if total else None,
+            "intents": dict(self.intent_counts),
+            "tiers": dict(self.tier_counts),
+        }
@@ -0,0 +1,89 @@
+from typing import Awaitable, Callable, Optional
+
+from chatbot.config import config
+from chatbot.core import notifications
+
+ORDER_STATES = {
+    "draft": "Presupuesto",
+    "sent": "Presupuesto enviado",
+    "sale": "Confirmado",
+    "done": "Completado",
+    "cancel": "Cancelado",
+}
+
+# para que el modelo no vuelva a escribir la lista que ya ve el cliente
+OFFERED_NOTE = (
+    "(El cliente recibió estas opciones en un mensaje interactivo para elegir una; "
+    "no las repitas, solo invítalo a elegir)"
+)
+
+
+def amount(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return f"${value}"
+
+
+def order_state(order: dict) -> str:
+    return ORDER_STATES.get(order.get("state"), order.get("state"))  # type: ignore
+
+
+def product_option(product: dict) -> dict:
+    """Option of a product; the SKU, when there is one, is an exact key in Odoo."""
+    sku = product.get("default_code")
+    details = [str(sku)] if sku else []
+    details.append(amount(product.get("list_price")))
+    return {
+        "id": f"sku:{sku}" if sku else f"product:{product['id']}",
+        "title": product["name"],
+        "description": " · ".join(details),
+    }
+
+
+def order_option(order: dict) -> dict:
+    date = str(order.get("date_order") or "")[:10]
+    return {
+        "id": f"order:{order['id']}",
+        "title": order["name"],
+        "description": f"{date} · {amount(order.get('amount_total'))} · {order_state(order)}",
+    }
+
+
+class Offer(str):
+    """Tool output that carries an interactive message for the user.
+
+    The message is sent by ToolRunner after the tool call, outside ToolMemo,
+    so an output served from the memo sends it again and OFFERED_NOTE stays
+    true.
+    """
+
+    def __new__(cls, output: str, interactive: dict, to: str):
+        offer = super().__new__(cls, output)
+        offer.interactive = interactive
+        offer.to = to
+        return offer
+
+    def send(self) -> Awaitable[bool]:
+        return notifications.send_whatsapp_interactive(self.interactive, self.to)
+
+
+def offer(
+    tool_output: str,
+    records: list[dict],
+    option: Callable[[dict], dict],
+    body: str,
+    button: str,
+    twilio_number: Optional[str],
+) -> str:
+    """Offer records to pick from as a WhatsApp interactive message.
+
+    Taps come back as "[<id>] <title>" messages that the shortcut engine
+    resolves to the exact record. Returns the tool output for the model;
+    when there are options to offer, an Offer with OFFERED_NOTE appended.
+    """
+    if not (config.INTERACTIVE_REPLIES_ENABLED and twilio_number) or len(records) < 2:
+        return tool_output
+
+    options = [option(record) for record in records[: notifications.MAX_LIST_ROWS]]
+    interactive = notifications.choices_interactive(body, button, options)
+    return Offer(f"{tool_output}\n{OFFERED_NOTE}", interactive, twilio_number)
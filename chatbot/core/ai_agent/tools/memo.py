@@ -0,0 +1,116 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from chatbot.logging_conf import logger
+
+# argumentos que inyecta ToolRunner y no forman parte de la consulta
+CONTEXT_ARGS = ("background_tasks", "user_number", "twilio_number", "chat", "ai_client")
+
+
+class Failure(str):
+    """Tool output that reports a failed query (e.g. Odoo did not answer).
+
+    The model gets it like any other output, but ToolMemo never stores it,
+    so a transient error is not replayed to the next turns.
+    """
+
+
+def normalize_args(args: dict) -> str:
+    normalized = {}
+    for key, value in args.items():
+        if key in CONTEXT_ARGS:
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ToolMemo:
+    """Memoizes read tool results across turns, per user.
+
+    Entries are keyed by (tool, normalized args, user) and live for the TTL
+    declared for the tool; tools without a TTL are never cached, and neither
+    are Failure outputs. Running a write tool drops the user's entries of the
+    reads it makes stale.
+    """
+
+    def __init__(
+        self,
+        ttls: dict[str, float],
+        invalidations: dict[str, list[str]],
+        max_entries: int = 10_000,
+    ):
+        self._ttls = ttls
+        self._invalidations = invalidations
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def call(
+        self,
+        name: str,
+        args: dict,
+        user: Optional[str],
+        run: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached result of the tool call or run it.
+
+        Args:
+            name: Tool name
+            args: Tool arguments as sent to the function
+            user: Phone number the call is made for
+            run: Runs the tool; only called on a miss
+        """
+        ttl = self._ttls.get(name)
+        if not ttl:
+            result = await run()
+            self.invalidate_for(name, user)
+            return result
+
+        key = (name, normalize_args(args), user)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._count(name, "hits")
+            self._entries.move_to_end(key)
+            logger.debug(f"{name} servido desde la memo")
+            return entry[1]
+
+        self._count(name, "misses")
+        result = await run()
+        if isinstance(result, Failure):
+            self._count(name, "failures")
+            return result
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def invalidate_for(self, name: str, user: Optional[str]) -> None:
+        stale = self._invalidations.get(name)
+        if not stale:
+            return
+
+        keys = [key for key in self._entries if key[0] in stale and key[2] == user]
+        for key in keys:
+            del self._entries[key]
+        if keys:
+            self._count(name, "invalidations", len(keys))
+            logger.debug(f"{name} invalidó {len(keys)} resultados de {user}")
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "tools": {k: dict(v) for k, v in self._counters.items()}}
+
+    def _count(self, name: str, counter: str, amount: int = 1) -> None:
+        counters = self._counters.setdefault(
+            name, {"hits": 0, "misses": 0, "invalidations": 0, "failures": 0}
+        )
+        counters[counter] += amount
@@ -1,8 +1,8 @@
 import asyncio
-import json
 
 from chatbot.core import notifications
-from chatbot.core.ai_agent.tools import utils
+from chatbot.core.ai_agent.tools import choices, prefetch, shaping, utils
+from chatbot.core.ai_agent.tools.memo import Failure
 from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
 from chatbot.logging_conf import logger
 
@@ -21,7 +21,7 @@ async def create_sale_order_by_product_id(
     product_id = int(product_id)
 
     partner, odoo_product = await asyncio.gather(
-        odoo_orion.get_partner_by_phone(user_number),
+        prefetch.get_partner_by_phone(user_number),
         odoo_orion.get_product_by_sku(product_id, template_first=False),
     )
     if not partner:
@@ -38,11 +38,19 @@ async def create_sale_order_by_product_id(
         twilio_number,
         background_tasks,
     )
+    prefetch.invalidate(("presupuestos", user_number))
     return ans
 
 
 async def create_lead(
-    user_number, name, email, background_tasks, chat, product_name, twilio_number=None
+    user_number,
+    name,
+    email,
+    background_tasks,
+    chat,
+    product_name,
+    ai_client,
+    twilio_number=None,
 ) -> str:
     logger.debug("Creando lead...")
     if twilio_number:
@@ -54,12 +62,13 @@ async def create_lead(
         )
 
     partner, status = await odoo_orion.create_partner(name, user_number, email)
+    prefetch.invalidate(prefetch.partner_key(user_number))
     if status == "ERROR":
         return "Error durante la creación del partner"
 
     resume_html, resume_text = await asyncio.gather(
-        utils.resume_chat(chat, html_format=True),
-        utils.resume_chat(chat, html_format=False),
+        utils.resume_chat(chat, ai_client, html_format=True),
+        utils.resume_chat(chat, ai_client, html_format=False),
     )
     logger.debug("Chat resumido")
     lead = await odoo_orion.create_lead(partner, resume_html, email)
@@ -81,7 +90,7 @@ async def get_partner(user_number, background_tasks, twilio_number=None) -> str:
                 to=twilio_number,
             )
         )
-    partner = await odoo_orion.get_partner_by_phone(user_number)
+    partner = await prefetch.get_partner_by_phone(user_number)
     if partner:
         return f"Partner encontrado: {partner}"
 
@@ -101,6 +110,7 @@ async def create_partner(
         )
 
     partner, status = await odoo_orion.create_partner(name, user_number, email)
+    prefetch.invalidate(prefetch.partner_key(user_number))
     if status == "ALREADY":
         return f"Partner encontrado: {partner}"
     elif status == "CREATE":
@@ -109,7 +119,7 @@ async def create_partner(
     return "Error creando partner"
 
 
-async def presupuestos(user_number, background_tasks, twilio_number=None) -> str:
+async def presupuestos(user_number, background_tasks, twilio_number=None, cursor=0) -> str:
     logger.debug(f"Getting sale orders (presupuestos) of {user_number}")
     if twilio_number:
         asyncio.create_task(
@@ -118,7 +128,33 @@ async def presupuestos(user_number, background_tasks, twilio_number=None) -> str
                 to=twilio_number,
             )
         )
-    partner = await odoo_orion.get_partner_by_phone(user_number)
+    orders = await sale_orders(user_number)
+    if isinstance(orders, str):
+        return orders
+
+    shaped = shaping.shape_list("presupuestos", orders, shaping.ORDER_FIELDS, cursor)
+    if cursor:
+        return shaped
+    return choices.offer(
+        shaped,
+        orders,
+        choices.order_option,
+        "Elige un pedido para ver su detalle:",
+        "Ver pedidos",
+        twilio_number,
+    )
+
+
+def sale_orders(user_number):
+    """fetch_presupuestos through the turn cache."""
+    return prefetch.cached(
+        ("presupuestos", user_number), lambda: fetch_presupuestos(user_number)
+    )
+
+
+async def fetch_presupuestos(user_number) -> list[dict] | str:
+    """Sale orders of the user's partner (or its company), or why there are none."""
+    partner = await prefetch.get_partner_by_phone(user_number)
     if not partner:
         return f"No se encontró ningún cliente con el teléfono {user_number}"
 
@@ -128,13 +164,13 @@ async def presupuestos(user_number, background_tasks, twilio_number=None) -> str
         company = await odoo_orion.get_partner_by_id(partner["parent_id"][0])
         sale_orders = await odoo_orion.presupuestos(company["id"])  # type: ignore
         if sale_orders:
-            return json.dumps(sale_orders)
+            return sale_orders
 
         logger.debug(f"La compañía {partner['parent_id'][0]} no tiene presupuestos")
 
     sale_orders = await odoo_orion.presupuestos(partner["id"])
     if sale_orders:
-        return json.dumps(sale_orders)
+        return sale_orders
 
     msg = f"No se encontraron pedidos asociados a {user_number}"
     logger.warning(msg)
@@ -153,7 +189,7 @@ async def get_sale_order_by_name(
             )
         )
     partner, order = await asyncio.gather(
-        odoo_orion.get_partner_by_phone(user_number),
+        prefetch.get_partner_by_phone(user_number),
         odoo_orion.get_sale_order_by_name(name),
     )
     return await utils.check_order(partner, order, twilio_number)
@@ -171,7 +207,7 @@ async def get_sale_order_by_id(
             to=twilio_number,
         )
     partner, order = await asyncio.gather(
-        odoo_orion.get_partner_by_phone(user_number),
+        prefetch.get_partner_by_phone(user_number),
         odoo_orion.get_sale_order_by_id(id),
     )
     return await utils.check_order(partner, order, twilio_number)
@@ -189,15 +225,19 @@ async def get_product_by_sku(
             )
         )
 
-    product = await odoo_orion.get_product_by_sku(sku, image=False)
+    product = await prefetch.cached(
+        ("product_sku", str(sku)), lambda: odoo_orion.get_product_by_sku(sku)
+    )
     if product:
-        return json.dumps(product)
+        return shaping.shape_record(
+            "get_product_by_sku", product, shaping.PRODUCT_DETAIL_FIELDS
+        )
 
     return f"Producto con sku {sku} no encontrado"
 
 
 async def get_product_by_name(
-    name, user_number, background_tasks, twilio_number=None
+    name, user_number, background_tasks, twilio_number=None, cursor=0
 ) -> str:
     logger.debug(f"Consultando producto {name}")
     if twilio_number:
@@ -210,14 +250,29 @@ async def get_product_by_name(
 
     products = await odoo_orion.get_product_by_name(name, image=False)
     if products:
-        return json.dumps(products)
+        shaped = shaping.shape_list(
+            "get_product_by_name", products, shaping.PRODUCT_FIELDS, cursor
+        )
+        # con más opciones de las que caben, mejor que el cliente precise
+        if cursor or len(products) > notifications.MAX_LIST_ROWS:
+            return shaped
+        return choices.offer(
+            shaped,
+            products,
+            choices.product_option,
+            f"Encontré {len(products)} productos para «{name}». Elige uno para ver su detalle:",
+            "Ver productos",
+            twilio_number,
+        )
 
     return (
         f"Producto {name} no encontrado. Indique su sku para una búsqueda más precisa"
     )
 
 
-async def get_all_products(user_number, background_tasks, twilio_number=None) -> str:
+async def get_all_products(
+    user_number, background_tasks, twilio_number=None, cursor=0
+) -> str:
     logger.debug("Consultando todos los productos...")
     if twilio_number:
         asyncio.create_task(
@@ -229,13 +284,15 @@ async def get_all_products(user_number, background_tasks, twilio_number=None) ->
 
     products = await odoo_orion.get_all_products()
     if products:
-        return json.dumps(products)
+        return shaping.shape_list(
+            "get_all_products", products, shaping.PRODUCT_FIELDS, cursor
+        )
 
-    return "Falló la consulta"
+    return Failure("Falló la consulta")
 
 
 async def get_products_by_category_id(
-    category_id: int, user_number, background_tasks, twilio_number=None
+    category_id: int, user_number, background_tasks, twilio_number=None, cursor=0
 ) -> str:
     if isinstance(category_id, str):
         category_id = int(category_id)
@@ -263,13 +320,16 @@ async def get_products_by_category_id(
 
     products = await odoo_orion.get_products_by_category_id(category_id)
     if products:
-        ans = json.dumps(products)
-        return ans
+        return shaping.shape_list(
+            "get_products_by_category_id", products, shaping.PRODUCT_FIELDS, cursor
+        )
 
     return f"No se encontraron productos con category_id {display_name}"
 
 
-async def get_all_categories(user_number, background_tasks, twilio_number=None) -> str:
+async def get_all_categories(
+    user_number, background_tasks, twilio_number=None, cursor=0
+) -> str:
     logger.debug("Consultando todas las categorías...")
     if twilio_number:
         asyncio.create_task(
@@ -280,9 +340,11 @@ async def get_all_categories(user_number, background_tasks, twilio_number=None)
         )
     categories = await odoo_orion.get_all_categories()
     if categories:
-        return json.dumps(categories)
+        return shaping.shape_list(
+            "get_all_categories", categories, shaping.CATEGORY_FIELDS, cursor
+        )
 
-    return "Falló la obtención de categorías"
+    return Failure("Falló la obtención de categorías")
 
 
 async def send_main_product_image(
@@ -352,3 +414,29 @@ odoo_tools = {
     "send_main_product_image": send_main_product_image,
     "send_all_product_images": send_all_product_images,
 }
+
+# Segundos que se reutiliza el resultado de una lectura con los mismos
+# argumentos para el mismo usuario (ver ToolMemo). Sin TTL no se cachea.
+# get_sale_order_by_* no se cachean: cada llamada envía el PDF del pedido.
+tool_ttls = {
+    "get_partner": 300,
+    "presupuestos": 60,
+    "get_product_by_sku": 120,
+    "get_product_by_name": 120,
+    "get_all_products": 300,
+    "get_products_by_category_id": 300,
+    "get_all_categories": 1800,
+}
+
+# Escrituras y las lecturas del mismo usuario que dejan desactualizadas
+tool_invalidations = {
+    "create_partner": ["get_partner", "presupuestos"],
+    "create_lead": ["get_partner", "presupuestos"],
+    "create_sale_order_by_product_id": [
+        "presupuestos",
+        "get_product_by_sku",
+        "get_product_by_name",
+        "get_all_products",
+        "get_products_by_category_id",
+    ],
+}
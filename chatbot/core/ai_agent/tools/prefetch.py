@@ -0,0 +1,153 @@
+import asyncio
+import re
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+from chatbot.logging_conf import logger
+
+# "sku 12345", "ref: AB-123" o códigos sueltos con el formato de los SKU:
+# 2 a 5 letras y 3 a 6 dígitos ("TAL2040", "AB-123"); fuera de correos y URLs
+SKU_PATTERN = re.compile(
+    r"\b(?:sku|ref(?:erencia)?|c[oó]digo)\s*[:#]?\s*((?=[a-z-]*\d)[a-z0-9-]{3,})\b"
+    r"|(?<![\w@.-])([a-z]{2,5}-?\d{3,6})(?![\w@-]|\.\w)",
+    re.IGNORECASE,
+)
+# nombres de pedido de Odoo (S00012), que también parecen SKUs
+ORDER_NAME = re.compile(r"S\d{3,}", re.IGNORECASE)
+ORDERS_PATTERN = re.compile(
+    r"\b(?:mis|mi)\s+(?:pedidos?|presupuestos?|compras?|[oó]rdenes)\b"
+    r"|\bpresupuestos\b|\bestado de(?:l| mi)? pedido\b",
+    re.IGNORECASE,
+)
+MAX_SKUS = 3
+
+Factory = Callable[[], Awaitable[Any]]
+
+_turn_cache: ContextVar[Optional["TurnCache"]] = ContextVar("turn_cache", default=None)
+
+# contadores globales de la precarga
+stats = {"turns": 0, "started": 0, "hits": 0, "unused": 0}
+
+
+class TurnCache:
+    """Odoo reads of the current turn, keyed by what they fetch.
+
+    Prefetched reads are started as tasks before the first model call; a
+    tool that needs the same data awaits the task instead of going to Odoo
+    again. Reads made by tools are cached too, for the rest of the turn.
+    """
+
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self._prefetched: set[Hashable] = set()
+        self._used: set[Hashable] = set()
+
+    def prefetch(self, key: Hashable, factory: Factory) -> None:
+        if key in self._tasks:
+            return
+        self._tasks[key] = asyncio.create_task(factory())
+        self._prefetched.add(key)
+        stats["started"] += 1
+
+    async def get(self, key: Hashable, factory: Factory) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.create_task(factory())
+        elif key in self._prefetched and key not in self._used:
+            stats["hits"] += 1
+        self._used.add(key)
+
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return await factory()
+            raise
+        except Exception as exc:
+            # una precarga fallida no debe tumbar la herramienta: se reintenta
+            logger.warning(f"Lectura cacheada {key} falló ({exc}), reintentando")
+            self._tasks.pop(key, None)
+            return await factory()
+
+    def invalidate(self, key: Hashable) -> None:
+        task = self._tasks.pop(key, None)
+        if task and not task.done():
+            task.cancel()
+
+    def close(self) -> None:
+        stats["unused"] += len(self._prefetched - self._used)
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+        self._tasks.clear()
+
+
+async def cached(key: Hashable, factory: Factory) -> Any:
+    """Read through the turn cache, or call factory directly outside a turn."""
+    cache = _turn_cache.get()
+    if cache is None:
+        return await factory()
+    return await cache.get(key, factory)
+
+
+def invalidate(key: Hashable) -> None:
+    cache = _turn_cache.get()
+    if cache is not None:
+        cache.invalidate(key)
+
+
+def partner_key(phone: str) -> tuple:
+    return ("partner", phone)
+
+
+def get_partner_by_phone(phone: str):
+    return cached(partner_key(phone), lambda: odoo_orion.get_partner_by_phone(phone))
+
+
+def find_skus(text: str) -> list[str]:
+    skus = []
+    for match in SKU_PATTERN.finditer(text):
+        sku = match.group(1) or match.group(2)
+        if ORDER_NAME.fullmatch(sku):
+            continue
+        if sku not in skus:
+            skus.append(sku)
+    return skus[:MAX_SKUS]
+
+
+def start_turn(text: str, phone: str, new_session: bool) -> Token:
+    """Open the turn cache and start the reads the message will likely need.
+
+    Args:
+        text: Messages of the turn
+        phone: Formatted phone number
+        new_session: No chat in memory nor in the DB, the partner will be looked up
+
+    Returns:
+        Token: To pass to end_turn
+    """
+    from chatbot.core.ai_agent.tools.odoo_tools import fetch_presupuestos
+
+    cache = TurnCache()
+    token = _turn_cache.set(cache)
+    stats["turns"] += 1
+
+    wants_orders = bool(ORDERS_PATTERN.search(text))
+    if new_session or wants_orders:
+        cache.prefetch(partner_key(phone), lambda: odoo_orion.get_partner_by_phone(phone))
+    if wants_orders:
+        cache.prefetch(("presupuestos", phone), lambda: fetch_presupuestos(phone))
+    for sku in find_skus(text):
+        cache.prefetch(
+            ("product_sku", sku), lambda sku=sku: odoo_orion.get_product_by_sku(sku)
+        )
+
+    return token
+
+
+def end_turn(token: Token) -> None:
+    cache = _turn_cache.get()
+    if cache is not None:
+        cache.close()
+    _turn_cache.reset(token)
@@ -0,0 +1,121 @@
+import json
+from typing import Iterable
+
+from chatbot.core.ai_agent.tokens import CHARS_PER_TOKEN
+
+# Campos que el modelo necesita de cada registro de Odoo
+PRODUCT_FIELDS = ["id", "default_code", "name", "list_price", "qty_available", "categ_id"]
+PRODUCT_DETAIL_FIELDS = PRODUCT_FIELDS + [
+    "brand_name",
+    "compare_list_price",
+    "tax_string",
+    "description_sale",
+    "out_of_stock_message",
+    "allow_out_of_stock_order",
+    "has_image",
+]
+ORDER_FIELDS = ["id", "name", "date_order", "state", "amount_total", "link"]
+CATEGORY_FIELDS = ["id", "name", "parent_id", "product_count"]
+
+# nombres de columna más cortos o más claros para el modelo
+COLUMN_NAMES = {"default_code": "sku", "list_price": "price", "qty_available": "stock"}
+
+PAGE_SIZE = 25
+
+# tokens estimados antes y después de dar forma, por herramienta
+stats: dict[str, dict[str, int]] = {}
+# registros que se serializan para estimar el tamaño de una lista de Odoo
+SIZE_SAMPLE = 5
+
+
+def _value(value):
+    # many2one de Odoo: [id, "nombre"] -> "nombre"
+    if isinstance(value, list) and len(value) == 2 and isinstance(value[1], str):
+        return value[1]
+    return value
+
+
+def project(record: dict, fields: Iterable[str]) -> dict:
+    """Keep only fields, flatten many2one pairs and drop empty values.
+
+    Odoo returns False for empty fields, so False values are dropped too.
+    """
+    projected = {}
+    for field in fields:
+        value = _value(record.get(field))
+        if value is None or value is False or value == "" or value == []:
+            continue
+        projected[COLUMN_NAMES.get(field, field)] = value
+    return projected
+
+
+def _cell(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def encode_table(records: list[dict], fields: list[str]) -> str:
+    """Pipe-separated table with a header row; repeats no keys per record."""
+    columns = [COLUMN_NAMES.get(field, field) for field in fields]
+    rows = ["|".join(columns)]
+    for record in records:
+        projected = project(record, fields)
+        rows.append("|".join(_cell(projected.get(column, "")) for column in columns))
+    return "\n".join(rows)
+
+
+def shape_list(tool: str, records: list[dict], fields: list[str], cursor=0) -> str:
+    """Page of records as a compact table, with a cursor to get the next page.
+
+    Args:
+        tool: Tool name, for stats
+        records: Odoo records
+        fields: Fields to keep, in column order
+        cursor: Index of the first record of the page (sent by the model)
+
+    Returns:
+        str: Table followed by the page range and the next cursor if any
+    """
+    start = max(int(cursor or 0), 0)
+    page = records[start : start + PAGE_SIZE]
+    shaped = encode_table(page, fields)
+
+    end = start + len(page)
+    shaped += f"\n[{start + 1}-{end} de {len(records)}]"
+    if end < len(records):
+        shaped += f" Hay más: vuelve a llamar con cursor={end}"
+
+    _record(tool, records, shaped)
+    return shaped
+
+
+def shape_record(tool: str, record: dict, fields: list[str]) -> str:
+    shaped = json.dumps(project(record, fields), ensure_ascii=False, separators=(",", ":"))
+    _record(tool, record, shaped)
+    return shaped
+
+
+def _raw_chars(raw) -> int:
+    # sin serializar la lista entera en cada llamada: se extrapola una muestra
+    if isinstance(raw, list) and len(raw) > SIZE_SAMPLE:
+        return len(json.dumps(raw[:SIZE_SAMPLE])) * len(raw) // SIZE_SAMPLE
+    return len(json.dumps(raw))
+
+
+def _record(tool: str, raw, shaped: str) -> None:
+    counters = stats.setdefault(tool, {"calls": 0, "raw_tokens": 0, "shaped_tokens": 0})
+    counters["calls"] += 1
+    counters["raw_tokens"] += _raw_chars(raw) // CHARS_PER_TOKEN
+    counters["shaped_tokens"] += len(shaped) // CHARS_PER_TOKEN
+
+
+def stats_report() -> dict:
+    report = {}
+    for tool, counters in stats.items():
+        raw = counters["raw_tokens"]
+        report[tool] = {
+            **counters,
+            "reduction": round(1 - counters["shaped_tokens"] / raw, 3) if raw else None,
+        }
+    return report
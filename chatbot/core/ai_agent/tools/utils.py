@@ -1,4 +1,3 @@
-import json
 import asyncio
 import os
 
@@ -8,8 +7,10 @@ from cloudinary.utils import cloudinary_url
 
 from chatbot.config import config
 from chatbot.core import notifications
-from chatbot.core.ai_agent.enumerations import MessageType
+from chatbot.core.ai_agent.enumerations import EffortType, MessageType, ModelType
+from chatbot.core.ai_agent.prompt import SUMMARY_PROMPT
 from chatbot.core.ai_agent.tools.odoo_manager import OdooHttpException  # type: ignore
+from chatbot.core.ai_agent.tools import shaping
 from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
 from chatbot.logging_conf import logger
 
@@ -143,6 +144,17 @@ async def send_report(sale_order_id, twilio_number=None):
     return True
 
 
+def order_belongs_to(order, partner) -> bool:
+    """Whether the order is the partner's or of the company the partner belongs to."""
+    if order["partner_id"][0] == partner["id"]:
+        return True
+    return bool(
+        not partner["is_company"]
+        and partner["parent_id"]
+        and order["partner_id"][0] == partner["parent_id"][0]
+    )
+
+
 async def check_order(partner, order, twilio_number):
     if not partner:
         msg = "El partner no existe"
@@ -154,19 +166,10 @@ async def check_order(partner, order, twilio_number):
         logger.warning(msg)
         return msg
 
-    # verifica que el pedido esté asociado al partner
-    if order["partner_id"][0] == partner["id"]:
+    # verifica que el pedido esté asociado al partner o a su compañía
+    if order_belongs_to(order, partner):
         await send_report(order["id"], twilio_number)
-        return json.dumps(order)
-
-    # Si el partner pertenece a una compañía verificar que el pedido pertenezca a la compañía
-    if not partner["is_company"] and partner["parent_id"]:
-        logger.info(f"Compañía {partner['parent_id']} tomada como referencia")
-        partner = await odoo_orion.get_partner_by_id(partner["parent_id"][0])
-        # verifica que el pedido esté asociado a la compañía
-        if order["partner_id"][0] == partner["id"]:  # type: ignore
-            await send_report(order["id"], twilio_number)
-            return json.dumps(order)
+        return shaping.shape_record("get_sale_order", order, shaping.ORDER_FIELDS)
 
     logger.warning(
         f"El pedido le pertenece a {order['partner_id']}, no a {partner['name']}"  # type: ignore
@@ -174,9 +177,44 @@ async def check_order(partner, order, twilio_number):
     return "El pedido no le pertenece a usted"
 
 
+def _chat_text(chat: list[dict[str, str]]) -> str:
+    chat_str = ""
+    for msg in chat:
+        if "role" not in msg:
+            continue
+
+        if msg.get("role") not in [MessageType.USER.value, MessageType.ASSISTANT.value]:
+            continue
+
+        chat_str += f"{msg['role']}: {msg.get('content', '')} \n"
+    return chat_str
+
+
+async def _summarize_with(ai_client, sys_msg: str, chat: list[dict[str, str]]) -> str | None:
+    ai_output = await ai_client._async_gen_ai_output(
+        {
+            "model": ModelType.GPT_5_mini.value,
+            "input": [
+                {"role": MessageType.DEVELOPER.value, "content": sys_msg},
+                {"role": MessageType.USER.value, "content": _chat_text(chat)},
+            ],
+            "reasoning": {"effort": EffortType.MINIMAL.value},
+        }
+    )
+    return ai_output.output_text
+
+
 async def resume_chat(
-    chat: list[dict[str, str]], html_format: bool = True
+    chat: list[dict[str, str]], ai_client, html_format: bool = True
 ) -> str | None:
+    """Summary of the chat for the lead created in Odoo and its email.
+
+    Args:
+        chat: Messages of the chat
+        ai_client: AIClient of the agent, so the call shares its rate
+            limiter and circuit breaker
+        html_format: HTML for Odoo, plain text for the email
+    """
     logger.debug("Resumiendo chat...")
     msg_base = """A continuación te paso una conversación entre un cliente y un asistente virtual. Necesito que resumas la conversación para que quede bien definida la intencion del cliente y se destaquen: el servicio que desea el cliente, los precios ofrecidos por el asistente, nombre del cliente y empresa a la que pertenece (si aparece)"""
 
@@ -186,22 +224,14 @@ async def resume_chat(
         + " No utilices saltos de línea ni formato markdown, solo texto plano. Tu respuesta se enviará por email"
     )
     sys_msg = msg_html if html_format else msg_plain
+    return await _summarize_with(ai_client, sys_msg, chat)
 
-    chat_str = ""
-    for msg in chat:
-        if "role" not in msg:
-            continue
 
-        if msg.get("role") not in [MessageType.USER.value, MessageType.ASSISTANT.value]:
-            continue
+async def summarize_context(chat: list[dict[str, str]], ai_client) -> str | None:
+    """Summary that replaces the old part of the chat (see ChatMemory.maybe_summarize).
 
-        chat_str += f"{msg['role']}: {msg.get('content', '')} \n"
-
-    # Importar localmente para evitar importación circular con completions
-    from chatbot.core.ai_agent.completions import AsyncAgent
-
-    resumidor = AsyncAgent(
-        name="Resumidor", prompt=sys_msg, api_key=config.OPENAI_API_KEY
-    )
-    msg = await resumidor.process_msg(chat_str, "resume_chat")
-    return msg
+    Keeps order ids, products and prices so the model can continue the
+    conversation from it.
+    """
+    logger.debug("Compactando chat...")
+    return await _summarize_with(ai_client, SUMMARY_PROMPT, chat)
@@ -73,6 +73,15 @@ presupuestos = {
     "type": "function",
     "name": "presupuestos",
     "description": "Consulta todos los pedidos de un cliente",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "cursor": {
+                "type": "integer",
+                "description": "Posición desde la que seguir listando, si la respuesta anterior lo indica",
+            }
+        },
+    },
 }
 
 get_sale_order_by_name = {
@@ -117,7 +126,11 @@ get_product_by_name = {
     "parameters": {
         "type": "object",
         "properties": {
-            "name": {"type": "string", "description": "Nombre del producto a consultar"}
+            "name": {"type": "string", "description": "Nombre del producto a consultar"},
+            "cursor": {
+                "type": "integer",
+                "description": "Posición desde la que seguir listando, si la respuesta anterior lo indica",
+            },
         },
         "required": ["name"],
     },
@@ -127,6 +140,15 @@ get_all_products = {
     "type": "function",
     "name": "get_all_products",
     "description": "Consulta todos los productos disponibles",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "cursor": {
+                "type": "integer",
+                "description": "Posición desde la que seguir listando, si la respuesta anterior lo indica",
+            }
+        },
+    },
 }
 
 get_products_by_category_id = {
@@ -136,7 +158,11 @@ get_products_by_category_id = {
     "parameters": {
         "type": "object",
         "properties": {
-            "category_id": {"type": "integer", "description": "id de la categoría"}
+            "category_id": {"type": "integer", "description": "id de la categoría"},
+            "cursor": {
+                "type": "integer",
+                "description": "Posición desde la que seguir listando, si la respuesta anterior lo indica",
+            },
         },
         "required": ["category_id"],
     },
@@ -146,6 +172,15 @@ get_all_categories = {
     "type": "function",
     "name": "get_all_categories",
     "description": "Consulta todas las categorías de productos disponibles",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "cursor": {
+                "type": "integer",
+                "description": "Posición desde la que seguir listando, si la respuesta anterior lo indica",
+            }
+        },
+    },
 }
 
 send_main_product_image = {
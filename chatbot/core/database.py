@@ -1,12 +1,16 @@
 import json
+import sqlite3
 import sys
+from datetime import datetime, timedelta
 from functools import wraps
 from typing import Callable, Optional
 
 import asyncpg
 import databases
 import sqlalchemy
-from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from chatbot.config import config
 from chatbot.core.ai_agent.prompt import SYSTEM_PROMPT
@@ -47,6 +51,40 @@ class Repository:
             sqlalchemy.Column("message", String, nullable=False),
             sqlalchemy.Column("created_at", DateTime, default=func.now()),
         )
+        # ventana reciente del chat de un usuario en una sola consulta
+        self.message_phone_index = sqlalchemy.Index(
+            "ix_messages_user_phone_id",
+            self.message_table.c.user_phone,
+            self.message_table.c.id,
+        )
+        # cola durable de turnos entrantes (ver chatbot.core.turn_queue)
+        self.events_table = sqlalchemy.Table(
+            "inbound_events",
+            self.metadata,
+            sqlalchemy.Column("id", Integer, primary_key=True, autoincrement=True),
+            sqlalchemy.Column("payload", Text, nullable=False),
+            sqlalchemy.Column("status", String, nullable=False, index=True),
+            sqlalchemy.Column("attempts", Integer, nullable=False, default=0),
+            sqlalchemy.Column("created_at", DateTime, default=func.now()),
+            sqlalchemy.Column("claimed_at", DateTime, nullable=True),
+        )
+        # ids de mensajes de WhatsApp ya procesados (ver chatbot.core.dedup)
+        self.processed_messages_table = sqlalchemy.Table(
+            "processed_messages",
+            self.metadata,
+            sqlalchemy.Column("message_id", String, primary_key=True),
+            sqlalchemy.Column("created_at", DateTime, nullable=False, index=True),
+        )
+        # estado compartido entre workers (ver chatbot.core.state)
+        self.user_state_table = sqlalchemy.Table(
+            "user_state",
+            self.metadata,
+            sqlalchemy.Column("phone", String, primary_key=True),
+            sqlalchemy.Column("lock_owner", String, nullable=True),
+            sqlalchemy.Column("lock_expires_at", DateTime, nullable=True),
+            sqlalchemy.Column("last_activity", DateTime, nullable=True),
+            sqlalchemy.Column("chat", Text, nullable=True),
+        )
         if not database_url:
             self.__database_url = config.DATABASE_URL
         else:
@@ -54,11 +92,19 @@ class Repository:
             
         self.engine = sqlalchemy.create_engine(self.__database_url)
         self.metadata.create_all(self.engine)
+        # create_all no agrega índices nuevos a tablas ya existentes
+        self.message_phone_index.create(self.engine, checkfirst=True)
         self.database = databases.Database(
             self.__database_url,
             force_rollback=False,
         )
 
+    def _insert(self, table: sqlalchemy.Table):
+        # INSERT con soporte de ON CONFLICT según el motor de la BD
+        if self.database.url.dialect == "sqlite":
+            return sqlite_insert(table)
+        return postgresql_insert(table)
+
     async def connect(self):
         await self.database.connect()
 
@@ -94,7 +140,10 @@ class Repository:
         async with self.database.transaction():
             try:
                 await self.database.execute(query)
-            except asyncpg.exceptions.UniqueViolationError:  # llave duplicada
+            except (
+                asyncpg.exceptions.UniqueViolationError,
+                sqlite3.IntegrityError,
+            ):  # llave duplicada
                 logger.warning(f"User with phone number {phone} already exists")
                 return False
 
@@ -174,6 +223,26 @@ class Repository:
         async with self.database.transaction():
             return await self.database.fetch_all(query)
 
+    async def get_recent_messages(self, phone: str, limit: int):
+        query = (
+            self.message_table.select()
+            .where(self.message_table.c.user_phone == phone)
+            .order_by(self.message_table.c.id.desc())
+            .limit(limit)
+        )
+        async with self.database.transaction():
+            messages = await self.database.fetch_all(query)
+
+        return list(reversed(messages))
+
+    async def create_messages(self, messages: list[dict]):
+        # inserción por lotes de {"user_phone", "role", "message"}
+        query = self.message_table.insert()
+        async with self.database.transaction():
+            await self.database.execute_many(query, messages)
+
+        logger.debug(f"{len(messages)} mensajes persistidos")
+
     async def get_chat(self, phone: str) -> list[dict]:
         messages_obj = await self.get_messages(phone)
 
@@ -183,6 +252,180 @@ class Repository:
         messages = await self.get_chat(phone)
         return json.dumps(messages)
 
+    async def enqueue_event(self, payload: dict) -> int:
+        query = (
+            self.events_table.insert()
+            .values(payload=json.dumps(payload), status="pending", attempts=0)
+            .returning(self.events_table.c.id)
+        )
+        async with self.database.transaction():
+            event_id = await self.database.fetch_val(query)
+
+        logger.debug(f"Evento {event_id} encolado")
+        return event_id
+
+    async def claim_event(self, event_id: int) -> dict | None:
+        # el UPDATE condicional es atómico: solo un worker puede reclamar el evento
+        query = (
+            self.events_table.update()
+            .where(
+                self.events_table.c.id == event_id,
+                self.events_table.c.status == "pending",
+            )
+            .values(
+                status="processing",
+                attempts=self.events_table.c.attempts + 1,
+                claimed_at=datetime.now(),
+            )
+            .returning(self.events_table.c.payload, self.events_table.c.attempts)
+        )
+        async with self.database.transaction():
+            row = await self.database.fetch_one(query)
+
+        if not row:
+            return None
+
+        return {"payload": json.loads(row.payload), "attempts": row.attempts}  # type: ignore
+
+    async def complete_event(self, event_id: int):
+        query = self.events_table.delete().where(self.events_table.c.id == event_id)
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+    async def fail_event(self, event_id: int, attempts: int, max_attempts: int):
+        status = "failed" if attempts >= max_attempts else "pending"
+        query = (
+            self.events_table.update()
+            .where(self.events_table.c.id == event_id)
+            .values(status=status)
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+        logger.warning(f"Evento {event_id} marcado como {status} (intento {attempts})")
+
+    async def release_event(self, event_id: int):
+        # devuelto sin procesar (usuario ocupado): no cuenta como intento
+        query = (
+            self.events_table.update()
+            .where(self.events_table.c.id == event_id)
+            .values(status="pending", attempts=self.events_table.c.attempts - 1)
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+    async def get_pending_event_ids(self, limit: int = 100) -> list[int]:
+        query = (
+            sqlalchemy.select(self.events_table.c.id)
+            .where(self.events_table.c.status == "pending")
+            .order_by(self.events_table.c.id.asc())
+            .limit(limit)
+        )
+        async with self.database.transaction():
+            rows = await self.database.fetch_all(query)
+
+        return [row.id for row in rows]  # type: ignore
+
+    async def register_message_id(self, message_id: str) -> bool:
+        """Register a WhatsApp message id.
+
+        Returns:
+            bool: True if the id was new, False if it was already registered
+        """
+        table = self.processed_messages_table
+        query = (
+            self._insert(table)
+            .values(message_id=message_id, created_at=datetime.now())
+            .on_conflict_do_nothing(index_elements=[table.c.message_id])
+            .returning(table.c.message_id)
+        )
+        async with self.database.transaction():
+            inserted = await self.database.fetch_val(query)
+
+        return inserted is not None
+
+    async def forget_message_id(self, message_id: str) -> None:
+        query = self.processed_messages_table.delete().where(
+            self.processed_messages_table.c.message_id == message_id
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+    async def purge_message_ids(self, older_than_seconds: int) -> None:
+        cutoff = datetime.now() - timedelta(seconds=older_than_seconds)
+        query = self.processed_messages_table.delete().where(
+            self.processed_messages_table.c.created_at < cutoff
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+    async def acquire_user_lock(self, phone: str, owner: str, ttl: int) -> bool:
+        table = self.user_state_table
+        now = datetime.now()
+        insert = self._insert(table).values(
+            phone=phone, lock_owner=owner, lock_expires_at=now + timedelta(seconds=ttl)
+        )
+        # solo se toma el lock si está libre, vencido o ya es nuestro
+        query = insert.on_conflict_do_update(
+            index_elements=[table.c.phone],
+            set_={
+                "lock_owner": insert.excluded.lock_owner,
+                "lock_expires_at": insert.excluded.lock_expires_at,
+            },
+            where=sqlalchemy.or_(
+                table.c.lock_owner.is_(None),
+                table.c.lock_owner == owner,
+                table.c.lock_expires_at < now,
+            ),
+        ).returning(table.c.phone)
+        async with self.database.transaction():
+            acquired = await self.database.fetch_val(query)
+
+        return acquired is not None
+
+    async def release_user_lock(self, phone: str, owner: str) -> None:
+        query = (
+            self.user_state_table.update()
+            .where(
+                self.user_state_table.c.phone == phone,
+                self.user_state_table.c.lock_owner == owner,
+            )
+            .values(lock_owner=None, lock_expires_at=None, last_activity=datetime.now())
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+    async def get_user_state(self, phone: str):
+        query = self.user_state_table.select().where(
+            self.user_state_table.c.phone == phone
+        )
+        async with self.database.transaction():
+            return await self.database.fetch_one(query)
+
+    async def update_user_state(self, phone: str, **values) -> None:
+        table = self.user_state_table
+        insert = self._insert(table).values(phone=phone, **values)
+        query = insert.on_conflict_do_update(
+            index_elements=[table.c.phone],
+            set_={key: getattr(insert.excluded, key) for key in values},
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
+    async def requeue_stale_events(self, older_than_seconds: int) -> None:
+        # eventos que quedaron en "processing" tras una caída del proceso
+        cutoff = datetime.now() - timedelta(seconds=older_than_seconds)
+        query = (
+            self.events_table.update()
+            .where(
+                self.events_table.c.status == "processing",
+                self.events_table.c.claimed_at < cutoff,
+            )
+            .values(status="pending")
+        )
+        async with self.database.transaction():
+            await self.database.execute(query)
+
 
 try:
     db = Repository()
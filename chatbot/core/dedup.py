@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from chatbot.core.database import Repository
+from chatbot.logging_conf import logger
+
+
+class MessageDeduplicator:
+    """Tracks WhatsApp message ids so webhook retries are processed once."""
+
+    async def is_new(self, message_id: str) -> bool:
+        raise NotImplementedError
+
+    async def forget(self, message_id: str) -> None:
+        """Undo is_new for an id whose message could not be enqueued,
+        so the webhook retry is processed instead of dropped."""
+        raise NotImplementedError
+
+
+class InMemoryDeduplicator(MessageDeduplicator):
+    """Bounded, TTL-evicting seen-set kept in process memory.
+
+    Ids are stored in insertion order, so expired ids are always at the front
+    and both the check and the eviction are O(1) amortized.
+    """
+
+    def __init__(self, ttl: int = 24 * 60 * 60, max_size: int = 100_000):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self.duplicates = 0
+
+    async def is_new(self, message_id: str) -> bool:
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        if message_id in self._seen:
+            self.duplicates += 1
+            return False
+
+        self._seen[message_id] = now
+        if len(self._seen) > self._max_size:
+            self._seen.popitem(last=False)
+        return True
+
+    async def forget(self, message_id: str) -> None:
+        self._seen.pop(message_id, None)
+
+    def _evict_expired(self, now: float) -> None:
+        while self._seen:
+            message_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self._ttl:
+                return
+            self._seen.pop(message_id)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class PostgresDeduplicator(MessageDeduplicator):
+    """Seen-set shared across workers through the processed_messages table."""
+
+    def __init__(self, repository: Repository, ttl: int = 24 * 60 * 60):
+        self._repository = repository
+        self._ttl = ttl
+        self._last_purge = time.monotonic()
+        self._purge_task: Optional[asyncio.Task] = None
+        self.duplicates = 0
+
+    async def is_new(self, message_id: str) -> bool:
+        now = time.monotonic()
+        if now - self._last_purge > self._ttl / 24 and (
+            self._purge_task is None or self._purge_task.done()
+        ):
+            self._last_purge = now
+            self._purge_task = asyncio.create_task(
+                self._repository.purge_message_ids(self._ttl)
+            )
+            self._purge_task.add_done_callback(self._purge_done)
+
+        if await self._repository.register_message_id(message_id):
+            return True
+
+        self.duplicates += 1
+        return False
+
+    async def forget(self, message_id: str) -> None:
+        await self._repository.forget_message_id(message_id)
+
+    def _purge_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error purgando ids de mensajes: {task.exception()!r}")
+
+
+def create_deduplicator(
+    backend: str, repository: Repository, ttl: int, max_size: int
+) -> MessageDeduplicator:
+    if backend == "postgres":
+        return PostgresDeduplicator(repository, ttl=ttl)
+
+    if backend != "memory":
+        logger.warning(f"Backend de deduplicación desconocido {backend}, usando memoria")
+    return InMemoryDeduplicator(ttl=ttl, max_size=max_size)
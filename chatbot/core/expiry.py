@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from chatbot.logging_conf import logger
+
+
+class ExpiryScheduler:
+    """Expires idle sessions close to their deadline using a min-heap.
+
+    touch() and discard() are O(log n) and O(1): rescheduled keys leave a
+    stale heap entry behind that is skipped when it surfaces, and the heap is
+    rebuilt when stale entries outnumber the live ones. The timer task only
+    wakes up for the nearest deadline instead of scanning every session.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        handler: Callable[[str], Awaitable[bool]],
+        history: int = 50,
+    ):
+        """
+        Args:
+            ttl: Seconds of inactivity before a key expires
+            handler: Called with the expired key; returns False to postpone
+                the expiry another ttl (e.g. the user is in the middle of a turn)
+            history: Number of recent expirations kept for stats()
+        """
+        self._ttl = ttl
+        self._handler = handler
+        self._deadlines: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._recent: deque[dict] = deque(maxlen=history)
+        self.expired = 0
+        self.postponed = 0
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Expiración de sesiones iniciada (ttl {self._ttl}s)")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def touch(self, key: str) -> None:
+        """Set the key's deadline to ttl seconds from now."""
+        deadline = time.time() + self._ttl
+        self._deadlines[key] = deadline
+        # con el heap vacío el timer espera sin plazo: hay que despertarlo
+        if not self._heap or deadline < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (deadline, key))
+        self._compact()
+
+    def discard(self, key: str) -> None:
+        self._deadlines.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": len(self._deadlines),
+            "expired": self.expired,
+            "postponed": self.postponed,
+            "next_in_seconds": self._next_in(),
+            "recent": list(self._recent),
+        }
+
+    def _next_in(self) -> Optional[float]:
+        # la cima del heap, tras descartar las entradas viejas que la tapan
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return round(max(self._heap[0][0] - time.time(), 0), 1)
+
+    def _compact(self) -> None:
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(deadline, key) for key, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list[str]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            # entrada vieja de una clave reprogramada o descartada
+            if self._deadlines.get(key) != deadline:
+                continue
+            del self._deadlines[key]
+            due.append(key)
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            for key in self._pop_due(time.time()):
+                await self._expire(key)
+
+    async def _expire(self, key: str) -> None:
+        try:
+            done = await self._handler(key)
+        except Exception as exc:
+            logger.error(f"Error expirando la sesión de {key}: {exc}")
+            done = False
+
+        if not done:
+            self.postponed += 1
+            if key not in self._deadlines:
+                self.touch(key)
+            return
+
+        self.expired += 1
+        # sin la clave: stats() se expone en /metrics y las claves son teléfonos
+        self._recent.append({"at": datetime.now().isoformat()})
+        logger.debug(f"Sesión inactiva de {key} expirada")
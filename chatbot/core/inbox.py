@@ -0,0 +1,103 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from chatbot.logging_conf import logger
+
+
+class UserInbox:
+    """Per-user ordered inbox that folds message bursts into a single turn.
+
+    Messages that arrive while a user's turn is running (or within the
+    debounce window) are buffered and delivered together to the next turn,
+    so nothing the user writes is dropped and bursts cost one LLM turn.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, str, list[str]], Awaitable[None]],
+        debounce: float = 1.0,
+    ):
+        self._handler = handler
+        self._debounce = debounce
+        self._pending: dict[str, list[str]] = {}
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._last_push: dict[str, float] = {}
+        self._drainers: dict[str, asyncio.Task] = {}
+        self.turns = 0
+        self.coalesced = 0
+
+    async def push(self, format_number: str, user_number: str, message: str) -> None:
+        """Buffer a message and wait until the turn that includes it finishes.
+
+        Args:
+            format_number: Formatted phone number, used as inbox key
+            user_number: Original user number, used to reply
+            message: User's message
+
+        Raises:
+            Exception: Whatever the turn handler raised for that turn
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._pending.setdefault(format_number, []).append(message)
+        self._waiters.setdefault(format_number, []).append(waiter)
+        self._last_push[format_number] = loop.time()
+
+        if format_number not in self._drainers:
+            self._drainers[format_number] = asyncio.create_task(
+                self._drain(format_number, user_number)
+            )
+        else:
+            logger.debug(f"Mensaje de {format_number} agregado al buzón")
+
+        await waiter
+
+    def is_busy(self, format_number: str) -> bool:
+        return format_number in self._drainers
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._drainers),
+            "turns": self.turns,
+            "coalesced": self.coalesced,
+        }
+
+    async def _wait_quiet(self, format_number: str) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            idle = loop.time() - self._last_push.get(format_number, 0)
+            if idle >= self._debounce:
+                return
+            await asyncio.sleep(self._debounce - idle)
+
+    async def _drain(self, format_number: str, user_number: str) -> None:
+        try:
+            while self._pending.get(format_number):
+                await self._wait_quiet(format_number)
+
+                messages = self._pending.pop(format_number)
+                waiters = self._waiters.pop(format_number)
+                self.turns += 1
+                if len(messages) > 1:
+                    self.coalesced += len(messages) - 1
+                    logger.info(
+                        f"{len(messages)} mensajes de {format_number} agrupados en un turno"
+                    )
+
+                try:
+                    await self._handler(format_number, user_number, messages)
+                except Exception as exc:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(exc)
+                else:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(None)
+        finally:
+            self._drainers.pop(format_number, None)
+            self._last_push.pop(format_number, None)
+            # solo quedan mensajes si el drenado fue cancelado
+            self._pending.pop(format_number, None)
+            for waiter in self._waiters.pop(format_number, []):
+                waiter.cancel()
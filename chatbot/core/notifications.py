@@ -187,6 +187,105 @@ async def send_whatsapp_message_with_retry(body, to, media=None):
     return False
 
 
+# Límites de los mensajes interactivos de WhatsApp
+MAX_BUTTONS = 3
+MAX_LIST_ROWS = 10
+BUTTON_TITLE_CHARS = 20
+ROW_TITLE_CHARS = 24
+ROW_DESCRIPTION_CHARS = 72
+INTERACTIVE_BODY_CHARS = 1024
+
+
+def _fit(text, limit: int) -> str:
+    text = str(text)
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def buttons_interactive(body: str, options: list[dict]) -> dict:
+    """Reply buttons message for up to MAX_BUTTONS options ({"id", "title"})."""
+    return {
+        "type": "button",
+        "body": {"text": _fit(body, INTERACTIVE_BODY_CHARS)},
+        "action": {
+            "buttons": [
+                {
+                    "type": "reply",
+                    "reply": {"id": option["id"], "title": _fit(option["title"], BUTTON_TITLE_CHARS)},
+                }
+                for option in options[:MAX_BUTTONS]
+            ]
+        },
+    }
+
+
+def list_interactive(body: str, button: str, options: list[dict]) -> dict:
+    """List message for up to MAX_LIST_ROWS options ({"id", "title", "description"})."""
+    rows = []
+    for option in options[:MAX_LIST_ROWS]:
+        row = {"id": option["id"], "title": _fit(option["title"], ROW_TITLE_CHARS)}
+        if option.get("description"):
+            row["description"] = _fit(option["description"], ROW_DESCRIPTION_CHARS)
+        rows.append(row)
+    return {
+        "type": "list",
+        "body": {"text": _fit(body, INTERACTIVE_BODY_CHARS)},
+        "action": {
+            "button": _fit(button, BUTTON_TITLE_CHARS),
+            "sections": [{"title": _fit(button, ROW_TITLE_CHARS), "rows": rows}],
+        },
+    }
+
+
+def choices_interactive(body: str, button: str, options: list[dict]) -> dict:
+    """Buttons when the options fit in them, a list otherwise."""
+    if len(options) <= MAX_BUTTONS and all(
+        len(str(option["title"])) <= BUTTON_TITLE_CHARS for option in options
+    ):
+        return buttons_interactive(body, options)
+    return list_interactive(body, button, options)
+
+
+async def send_whatsapp_interactive(interactive: dict, to) -> bool:
+    """Send a WhatsApp interactive message (list or reply buttons) using Meta's API.
+
+    The user's choice comes back in the webhook as a button_reply or
+    list_reply with the id of the option.
+    """
+    if config.ENV_STATE == "test":
+        return True
+
+    try:
+        logger.debug(f"Enviando mensaje interactivo ({interactive['type']}) a {to}")
+
+        headers = {
+            "Authorization": f"Bearer {config.WHATSAPP_ACCESS_TOKEN}",
+            "Content-Type": "application/json",
+        }
+
+        url = f"https://graph.facebook.com/v22.0/{config.WHATSAPP_PHONE_NUMBER_ID}/messages"
+
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "interactive",
+            "interactive": interactive,
+        }
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, headers=headers, json=payload) as resp:
+                data = await resp.json(content_type=None)
+                if resp.status == 200:
+                    logger.debug(f"Mensaje interactivo enviado a {to}")
+                    return True
+                else:
+                    logger.error(f"Error enviando mensaje interactivo: {data}")
+                    return False
+
+    except Exception as exc:
+        logger.error(f"Error enviando mensaje interactivo de WhatsApp a {to}. Error: {exc}")
+        return False
+
+
 # New helper to mark messages as read via WhatsApp Cloud API
 async def mark_whatsapp_message_as_read(message_id: str) -> bool:
     """Mark an incoming WhatsApp message as read using Meta's API.
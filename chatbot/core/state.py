@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+
+from chatbot.core.database import Repository
+from chatbot.logging_conf import logger
+
+
+class UserBusyError(Exception):
+    pass
+
+
+class StateBackend:
+    """Per-user state shared by the API workers: turn locks, last activity
+    and chat history snapshots.
+    """
+
+    # True cuando el estado vive fuera del proceso y hay que sincronizar el chat
+    shared = False
+
+    async def acquire_user(self, phone: str) -> bool:
+        raise NotImplementedError
+
+    async def release_user(self, phone: str) -> None:
+        raise NotImplementedError
+
+    async def is_in_process(self, phone: str) -> bool:
+        raise NotImplementedError
+
+    async def get_last_activity(self, phone: str) -> float | None:
+        raise NotImplementedError
+
+    async def load_chat(self, phone: str) -> list[dict] | None:
+        raise NotImplementedError
+
+    async def save_chat(self, phone: str, messages: list) -> None:
+        raise NotImplementedError
+
+    async def delete_chat(self, phone: str) -> None:
+        raise NotImplementedError
+
+    async def lock_user(self, phone: str, timeout: float, interval: float = 0.2):
+        """Wait until the user's turn lock is acquired.
+
+        Raises:
+            UserBusyError: If another worker keeps the lock for longer than timeout
+        """
+        deadline = time.monotonic() + timeout
+        while not await self.acquire_user(phone):
+            if time.monotonic() >= deadline:
+                raise UserBusyError(f"Usuario {phone} en proceso en otro worker")
+            await asyncio.sleep(interval)
+
+
+class InMemoryStateBackend(StateBackend):
+    """State kept in process memory; only valid with a single worker.
+
+    The agent's ChatMemory is already the chat store in this mode, so chat
+    snapshots are not duplicated here.
+    """
+
+    def __init__(self):
+        self._in_process: set[str] = set()
+        self._last_activity: dict[str, float] = {}
+
+    async def acquire_user(self, phone: str) -> bool:
+        if phone in self._in_process:
+            return False
+        self._in_process.add(phone)
+        return True
+
+    async def release_user(self, phone: str) -> None:
+        self._in_process.discard(phone)
+        self._last_activity[phone] = time.time()
+
+    async def is_in_process(self, phone: str) -> bool:
+        return phone in self._in_process
+
+    async def get_last_activity(self, phone: str) -> float | None:
+        return self._last_activity.get(phone)
+
+    async def load_chat(self, phone: str) -> list[dict] | None:
+        return None
+
+    async def save_chat(self, phone: str, messages: list) -> None:
+        return None
+
+    async def delete_chat(self, phone: str) -> None:
+        self._last_activity.pop(phone, None)
+
+
+class PostgresStateBackend(StateBackend):
+    """State shared by every worker through the user_state table.
+
+    Turn locks carry an expiry so a crashed worker can't pin a user forever.
+    Chat history is saved at the end of each turn, while the lock is held.
+    """
+
+    shared = True
+
+    def __init__(self, repository: Repository, lock_ttl: int = 300):
+        self._repository = repository
+        self._lock_ttl = lock_ttl
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire_user(self, phone: str) -> bool:
+        return await self._repository.acquire_user_lock(
+            phone, self._owner, self._lock_ttl
+        )
+
+    async def release_user(self, phone: str) -> None:
+        await self._repository.release_user_lock(phone, self._owner)
+
+    async def is_in_process(self, phone: str) -> bool:
+        row = await self._repository.get_user_state(phone)
+        if not row or not row.lock_owner:  # type: ignore
+            return False
+        return row.lock_expires_at > datetime.now()  # type: ignore
+
+    async def get_last_activity(self, phone: str) -> float | None:
+        row = await self._repository.get_user_state(phone)
+        if not row or not row.last_activity:  # type: ignore
+            return None
+        return row.last_activity.timestamp()  # type: ignore
+
+    async def load_chat(self, phone: str) -> list[dict] | None:
+        row = await self._repository.get_user_state(phone)
+        if not row or not row.chat:  # type: ignore
+            return None
+        return json.loads(row.chat)  # type: ignore
+
+    async def save_chat(self, phone: str, messages: list) -> None:
+        # al final del turno solo quedan mensajes con role/content
+        chat = [msg for msg in messages if isinstance(msg, dict) and "role" in msg]
+        await self._repository.update_user_state(phone, chat=json.dumps(chat))
+
+    async def delete_chat(self, phone: str) -> None:
+        await self._repository.update_user_state(phone, chat=None)
+
+
+def create_state_backend(
+    backend: str, repository: Repository, lock_ttl: int
+) -> StateBackend:
+    if backend == "postgres":
+        logger.info("Usando estado compartido en Postgres")
+        return PostgresStateBackend(repository, lock_ttl=lock_ttl)
+
+    if backend != "memory":
+        logger.warning(f"Backend de estado desconocido {backend}, usando memoria")
+    return InMemoryStateBackend()
@@ -0,0 +1,59 @@
+"""Fake Responses API items and clients shared by the agent tests."""
+
+import asyncio
+from types import SimpleNamespace
+
+
+def function_call(call_id: str, name: str = "fake_tool", arguments: str = "{}"):
+    return SimpleNamespace(type="function_call", call_id=call_id, name=name, arguments=arguments)
+
+
+def custom_call(call_id: str, name: str = "fake_tool"):
+    return SimpleNamespace(type="custom_tool_call", call_id=call_id, name=name, input="x")
+
+
+def text_item(text: str):
+    return SimpleNamespace(
+        type="message", role="assistant", content=[SimpleNamespace(text=text)]
+    )
+
+
+def output(*items, **fields):
+    """Response with the given output items (and fields such as id or usage)."""
+    return SimpleNamespace(output=list(items), **fields)
+
+
+def text_output(text: str, **fields):
+    return output(text_item(text), **fields)
+
+
+def text_events(text: str, size: int = 7) -> list:
+    """Stream events of a text reply, in deltas of size characters."""
+    events = [
+        SimpleNamespace(type="response.output_text.delta", delta=text[i : i + size])
+        for i in range(0, len(text), size)
+    ]
+    events.append(SimpleNamespace(type="response.output_item.done", item=text_item(text)))
+    events.append(SimpleNamespace(type="response.completed", response=text_output(text)))
+    return events
+
+
+def call_events(*calls) -> list:
+    """Stream events of a response that only calls tools."""
+    events = [SimpleNamespace(type="response.output_item.done", item=call) for call in calls]
+    events.append(SimpleNamespace(type="response.completed", response=output(*calls)))
+    return events
+
+
+class FakeStreamClient:
+    """Streams one list of events per call, in order."""
+
+    def __init__(self, rounds: list[list]):
+        self.rounds = rounds
+        self.models: list[str] = []
+
+    async def _async_stream_ai_output(self, params: dict):
+        self.models.append(params["model"])
+        for event in self.rounds.pop(0):
+            await asyncio.sleep(0)
+            yield event
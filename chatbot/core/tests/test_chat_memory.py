@@ -0,0 +1,129 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from chatbot.core.ai_agent.completions import ChatMemory
+from chatbot.core.ai_agent.prompt import SUMMARY_PROMPT
+from chatbot.core.database import Repository
+
+
+class TestChatMemoryRehydrate(unittest.IsolatedAsyncioTestCase):
+    phone = "+53 520 45 84 6"
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp_dir.name, "memory.db")
+        self.repository = Repository(f"sqlite:///{db_path}")
+        await self.repository.connect()
+
+    async def asyncTearDown(self):
+        await self.repository.disconnect()
+        self.tmp_dir.cleanup()
+
+    async def flush(self):
+        await asyncio.sleep(0.05)
+
+    async def test_unknown_user_is_not_rehydrated(self):
+        memory = ChatMemory(repository=self.repository)
+        self.assertFalse(await memory.rehydrate(self.phone))
+
+        await self.repository.create_user(phone=self.phone)
+        self.assertFalse(await memory.rehydrate(self.phone))
+
+    async def test_chat_survives_a_new_memory(self):
+        await self.repository.create_user(phone=self.phone, name="Osliani")
+        memory = ChatMemory(repository=self.repository)
+        memory.add_msg("contexto", "developer", self.phone)
+        memory.add_msg("hola", "user", self.phone)
+        memory.add_msg("¡Hola Osliani!", "assistant", self.phone)
+        await self.flush()
+
+        restarted = ChatMemory(repository=self.repository)
+        self.assertTrue(await restarted.rehydrate(self.phone))
+
+        messages = restarted.get_messages(self.phone)
+        self.assertEqual(messages[0], restarted.init_msg)
+        self.assertIn("Osliani", messages[1]["content"])
+        self.assertEqual(restarted.get_user_name(self.phone), "Osliani")
+        self.assertEqual(
+            messages[2:],
+            [
+                {"role": "user", "content": "hola"},
+                {"role": "assistant", "content": "¡Hola Osliani!"},
+            ],
+        )
+
+    async def test_reset_chat_is_not_rehydrated(self):
+        await self.repository.create_user(phone=self.phone, name="Osliani")
+        memory = ChatMemory(repository=self.repository)
+        memory.add_msg("hola", "user", self.phone)
+        memory.reset_chat(self.phone)
+        memory.add_msg("empecemos de nuevo", "user", self.phone)
+        await self.flush()
+
+        restarted = ChatMemory(repository=self.repository)
+        await restarted.rehydrate(self.phone)
+        self.assertEqual(
+            restarted.get_messages(self.phone)[2:],
+            [{"role": "user", "content": "empecemos de nuevo"}],
+        )
+
+
+class TestPurgeToolMsgs(unittest.TestCase):
+    phone = "+53 520 45 84 6"
+
+    def test_only_the_turn_segment_is_purged(self):
+        memory = ChatMemory()
+        output = {"type": "function_call_output", "call_id": "1", "output": "ok"}
+        # un mensaje previo idéntico por valor a un tool output no debe borrarse
+        memory.get_messages(self.phone).append(dict(output))
+        memory.add_msg("mis pedidos", "user", self.phone)
+
+        call = SimpleNamespace(type="function_call", call_id="1", name="presupuestos")
+        memory._set_ai_output(SimpleNamespace(output=[call]), self.phone)
+        memory._set_tool_output("1", "ok", self.phone)
+        self.assertEqual(len(memory.get_tool_msgs(self.phone)), 2)
+
+        memory._purge_tool_msgs(self.phone)
+        messages = memory.get_messages(self.phone)
+        self.assertEqual(messages[1], output)
+        self.assertEqual(messages[-1], {"role": "user", "content": "mis pedidos"})
+        self.assertEqual(memory.get_tool_msgs(self.phone), [])
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def _async_gen_ai_output(self, params: dict):
+        self.calls.append(params)
+        return SimpleNamespace(output_text="- Pedido S00012: confirmado, $1250")
+
+
+class TestSummarize(unittest.IsolatedAsyncioTestCase):
+    phone = "+53 520 45 84 6"
+
+    async def test_old_turns_are_summarized_with_the_agents_client(self):
+        client = RecordingClient()
+        memory = ChatMemory(summary_threshold=10, summary_keep=10, ai_client=client)
+        for i in range(6):
+            memory.add_msg(f"¿Cómo va el pedido S0001{i}? " * 5, "user", self.phone)
+            memory.add_msg(f"El pedido S0001{i} está confirmado. " * 5, "assistant", self.phone)
+
+        memory.maybe_summarize(self.phone)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(client.calls[0]["input"][0]["content"], SUMMARY_PROMPT)
+        self.assertIn("S00010", client.calls[0]["input"][1]["content"])
+        summaries = [
+            m for m in memory.get_messages(self.phone)
+            if str(m.get("content", "")).startswith("Resumen de la conversación anterior")
+        ]
+        self.assertEqual(len(summaries), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from chatbot.core.database import Repository
+from chatbot.core.dedup import InMemoryDeduplicator, PostgresDeduplicator
+
+
+class TestInMemoryDeduplicator(unittest.IsolatedAsyncioTestCase):
+    async def test_retry_is_detected(self):
+        dedup = InMemoryDeduplicator()
+        self.assertTrue(await dedup.is_new("wamid.1"))
+        self.assertFalse(await dedup.is_new("wamid.1"))
+        self.assertEqual(dedup.duplicates, 1)
+
+    async def test_size_is_capped(self):
+        dedup = InMemoryDeduplicator(max_size=3)
+        for n in range(10):
+            await dedup.is_new(f"wamid.{n}")
+
+        self.assertEqual(len(dedup), 3)
+        self.assertTrue(await dedup.is_new("wamid.0"))
+
+    async def test_expired_ids_are_evicted(self):
+        dedup = InMemoryDeduplicator(ttl=0)
+        await dedup.is_new("wamid.1")
+        self.assertTrue(await dedup.is_new("wamid.1"))
+
+    async def test_forgotten_id_is_new_again(self):
+        dedup = InMemoryDeduplicator()
+        await dedup.is_new("wamid.1")
+        await dedup.forget("wamid.1")
+        self.assertTrue(await dedup.is_new("wamid.1"))
+
+
+class TestPostgresDeduplicator(unittest.IsolatedAsyncioTestCase):
+    async def test_retry_is_detected_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repository = Repository(f"sqlite:///{os.path.join(tmp_dir, 'dedup.db')}")
+            await repository.connect()
+            try:
+                worker_a = PostgresDeduplicator(repository)
+                worker_b = PostgresDeduplicator(repository)
+                self.assertTrue(await worker_a.is_new("wamid.1"))
+                self.assertFalse(await worker_b.is_new("wamid.1"))
+
+                # el encolado falló: el reintento de Meta debe procesarse
+                await worker_a.forget("wamid.1")
+                self.assertTrue(await worker_b.is_new("wamid.1"))
+            finally:
+                await repository.disconnect()
+
+    async def test_failed_purge_is_logged(self):
+        class FailingRepository:
+            purges = 0
+
+            async def register_message_id(self, message_id):
+                return True
+
+            async def purge_message_ids(self, ttl):
+                self.purges += 1
+                raise RuntimeError("base de datos caída")
+
+        repository = FailingRepository()
+        dedup = PostgresDeduplicator(repository, ttl=0)  # type: ignore
+        with self.assertLogs("chatbot", level="ERROR") as logs:
+            await dedup.is_new("wamid.1")
+            # sigue en curso: no se lanza otra purga
+            await dedup.is_new("wamid.2")
+            await asyncio.wait([dedup._purge_task])  # type: ignore
+            await asyncio.sleep(0)
+
+        self.assertEqual(repository.purges, 1)
+        self.assertIn("base de datos caída", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+
+from chatbot.core.ai_agent.completions import ChatMemory
+from chatbot.core.expiry import ExpiryScheduler
+
+
+class TestExpiryScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.expired: list[str] = []
+        self.busy: set[str] = set()
+
+    async def handler(self, key):
+        if key in self.busy:
+            return False
+        self.expired.append(key)
+        return True
+
+    async def test_keys_expire_near_their_deadline(self):
+        expiry = ExpiryScheduler(0.05, self.handler)
+        await expiry.start()
+        try:
+            expiry.touch("a")
+            await asyncio.sleep(0.02)
+            expiry.touch("b")
+            await asyncio.sleep(0.04)
+            self.assertEqual(self.expired, ["a"])
+
+            await asyncio.sleep(0.03)
+            self.assertEqual(self.expired, ["a", "b"])
+            self.assertEqual(expiry.stats()["expired"], 2)
+            self.assertEqual(len(expiry), 0)
+        finally:
+            await expiry.stop()
+
+    async def test_first_touch_wakes_an_idle_timer(self):
+        expiry = ExpiryScheduler(0.05, self.handler)
+        await expiry.start()
+        try:
+            # el timer ya espera sin plazo sobre el heap vacío
+            await asyncio.sleep(0.01)
+            expiry.touch("a")
+            expiry.touch("b")
+            await asyncio.sleep(0.1)
+            self.assertEqual(self.expired, ["a", "b"])
+            self.assertEqual(len(expiry), 0)
+        finally:
+            await expiry.stop()
+
+    async def test_touch_postpones_and_discard_cancels(self):
+        expiry = ExpiryScheduler(0.05, self.handler)
+        await expiry.start()
+        try:
+            expiry.touch("a")
+            expiry.touch("b")
+            await asyncio.sleep(0.03)
+            expiry.touch("a")
+            expiry.discard("b")
+            await asyncio.sleep(0.03)
+            self.assertEqual(self.expired, [])
+
+            await asyncio.sleep(0.04)
+            self.assertEqual(self.expired, ["a"])
+        finally:
+            await expiry.stop()
+
+    async def test_busy_key_is_rescheduled(self):
+        expiry = ExpiryScheduler(0.02, self.handler)
+        self.busy.add("a")
+        await expiry.start()
+        try:
+            expiry.touch("a")
+            await asyncio.sleep(0.03)
+            self.assertEqual(self.expired, [])
+            self.assertIn("a", expiry)
+
+            self.busy.clear()
+            await asyncio.sleep(0.03)
+            self.assertEqual(self.expired, ["a"])
+            self.assertEqual(expiry.postponed, 1)
+        finally:
+            await expiry.stop()
+
+    async def test_stats_skip_stale_entries_and_hide_keys(self):
+        expiry = ExpiryScheduler(100, self.handler)
+        expiry.touch("a")
+        expiry.touch("b")
+        expiry.discard("a")
+
+        self.assertAlmostEqual(expiry.stats()["next_in_seconds"], 100, delta=1)
+        self.assertEqual(len(expiry._heap), 1)
+
+        expiry._recent.clear()
+        await expiry._expire("b")
+        self.assertEqual(list(expiry.stats()["recent"][0]), ["at"])
+
+    async def test_chat_memory_schedules_on_turn_end(self):
+        expiry = ExpiryScheduler(60, self.handler)
+        memory = ChatMemory(expiry=expiry)
+        memory.add_msg("hola", "user", "a")
+        memory.begin_turn("a")
+        self.assertNotIn("a", expiry)
+
+        memory.end_turn("a")
+        self.assertIn("a", expiry)
+
+        memory.delete_chat("a")
+        self.assertNotIn("a", expiry)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+
+from chatbot.core.inbox import UserInbox
+
+
+class TestUserInbox(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.turns: list[list[str]] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def handler(self, format_number, user_number, messages):
+        self.turns.append(messages)
+        await self.release.wait()
+
+    async def test_burst_is_coalesced_in_one_turn(self):
+        inbox = UserInbox(self.handler, debounce=0.05)
+        await asyncio.gather(
+            inbox.push("+53 1", "531", "hola"),
+            inbox.push("+53 1", "531", "quiero"),
+            inbox.push("+53 1", "531", "un taladro"),
+        )
+
+        self.assertEqual(self.turns, [["hola", "quiero", "un taladro"]])
+        self.assertEqual(inbox.coalesced, 2)
+
+    async def test_message_during_turn_goes_to_next_turn(self):
+        inbox = UserInbox(self.handler, debounce=0)
+        self.release.clear()
+        first = asyncio.create_task(inbox.push("+53 1", "531", "hola"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(inbox.push("+53 1", "531", "sigues ahí?"))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.turns, [["hola"]])
+
+        self.release.set()
+        await asyncio.gather(first, second)
+        self.assertEqual(self.turns, [["hola"], ["sigues ahí?"]])
+        self.assertFalse(inbox.is_busy("+53 1"))
+
+    async def test_handler_error_reaches_every_waiter(self):
+        async def failing_handler(format_number, user_number, messages):
+            raise RuntimeError("boom")
+
+        inbox = UserInbox(failing_handler, debounce=0.01)
+        results = await asyncio.gather(
+            inbox.push("+53 1", "531", "a"),
+            inbox.push("+53 1", "531", "b"),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from chatbot.core import notifications
+from chatbot.core.ai_agent.completions import ChatMemory, ToolRunner
+from chatbot.core.ai_agent.shortcuts import ShortcutEngine, selection_text
+from chatbot.core.ai_agent.tools import choices, odoo_tools
+from chatbot.core.ai_agent.tools.memo import ToolMemo
+from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+
+PARTNER = {"id": 7, "name": "Ana", "is_company": False, "parent_id": [3, "Orion SA"]}
+PRODUCTS = [
+    {"id": 1, "name": "Taladro percutor 800W con maletín", "default_code": "TAL2040", "list_price": 120.0},
+    {"id": 2, "name": "Taladro inalámbrico", "default_code": False, "list_price": 95.5},
+]
+ORDER = {
+    "id": 12,
+    "name": "S00012",
+    "partner_id": [3, "Orion SA"],
+    "date_order": "2025-03-12 10:00:00",
+    "state": "sale",
+    "amount_total": 1250.0,
+    "link": "https://odoo/my/orders/12",
+}
+
+
+class TestInteractiveMessages(unittest.TestCase):
+    def test_short_titles_use_buttons(self):
+        interactive = notifications.choices_interactive(
+            "Elige un pedido", "Ver pedidos", [{"id": "order:1", "title": "S00001"}, {"id": "order:2", "title": "S00002"}]
+        )
+
+        self.assertEqual(interactive["type"], "button")
+        self.assertEqual(interactive["action"]["buttons"][1]["reply"], {"id": "order:2", "title": "S00002"})
+
+    def test_long_titles_use_a_list_within_limits(self):
+        options = [choices.product_option(product) for product in PRODUCTS]
+        interactive = notifications.choices_interactive("Elige uno", "Ver productos", options)
+
+        self.assertEqual(interactive["type"], "list")
+        rows = interactive["action"]["sections"][0]["rows"]
+        self.assertEqual(rows[0]["id"], "sku:TAL2040")
+        self.assertEqual(rows[1]["id"], "product:2")
+        self.assertLessEqual(len(rows[0]["title"]), notifications.ROW_TITLE_CHARS)
+        self.assertEqual(rows[1]["description"], "$95.5")
+
+
+class TestToolsOfferChoices(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.send = AsyncMock(return_value=True)
+        self.patches = [
+            patch.object(notifications, "send_whatsapp_interactive", self.send),
+            patch.object(notifications, "send_whatsapp_message", AsyncMock(return_value=True)),
+            patch.object(odoo_orion, "get_product_by_name", AsyncMock(return_value=PRODUCTS)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_products_are_offered_as_a_list(self):
+        ans = await odoo_tools.get_product_by_name("taladro", "+53 1", None, twilio_number="5351")
+
+        self.assertIsInstance(ans, choices.Offer)
+        self.assertIn(choices.OFFERED_NOTE, ans)
+        self.assertEqual(ans.to, "5351")  # type: ignore
+        self.assertEqual(ans.interactive["type"], "list")  # type: ignore
+
+    async def test_memo_hits_send_the_list_again(self):
+        runner = ToolRunner(memo=ToolMemo(odoo_tools.tool_ttls, {}))
+        memory = ChatMemory()
+        memory.add_msg("busco taladros", "user", "+53 1")
+        tool = SimpleNamespace(
+            type="function_call",
+            name="get_product_by_name",
+            call_id="c1",
+            arguments='{"name": "taladro"}',
+        )
+
+        for _ in range(2):
+            await runner.run_tools([tool], "+53 1", memory, "5351", None)
+        await asyncio.sleep(0)
+
+        self.assertEqual(odoo_orion.get_product_by_name.await_count, 1)  # type: ignore
+        self.assertEqual(self.send.await_count, 2)
+        output = memory.get_messages("+53 1")[-1]["output"]
+        self.assertIs(type(output), str)
+        self.assertIn(choices.OFFERED_NOTE, output)
+
+    async def test_nothing_is_offered_without_whatsapp(self):
+        ans = await odoo_tools.get_product_by_name("taladro", "+53 1", None)
+        await asyncio.sleep(0)
+
+        self.assertNotIn(choices.OFFERED_NOTE, ans)
+        self.send.assert_not_awaited()
+
+
+class TestSelectionsResolveExactly(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = ShortcutEngine()
+        self.by_name = AsyncMock(return_value=PRODUCTS)
+        self.by_sku = AsyncMock(return_value=PRODUCTS[0])
+        self.patches = [
+            patch.object(odoo_orion, "get_product_by_name", self.by_name),
+            patch.object(odoo_orion, "get_product_by_sku", self.by_sku),
+            patch.object(odoo_orion, "get_partner_by_phone", AsyncMock(return_value=PARTNER)),
+            patch.object(odoo_orion, "get_sale_order_by_id", AsyncMock(return_value=ORDER)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_product_by_sku(self):
+        reply = await self.engine.answer(selection_text("sku:TAL2040", "Taladro percutor"), "+53 1")
+
+        self.by_sku.assert_awaited_once_with("TAL2040")
+        self.by_name.assert_not_awaited()
+        self.assertTrue(reply.startswith("Taladro percutor 800W con maletín (SKU TAL2040)"))  # type: ignore
+
+    async def test_order_of_the_partners_company(self):
+        reply = await self.engine.answer(selection_text("order:12", "S00012"), "+53 1")
+
+        self.assertIn("Pedido S00012 (2025-03-12)", reply)  # type: ignore
+        self.assertIn("Estado: Confirmado", reply)  # type: ignore
+
+    async def test_foreign_order_goes_to_the_model(self):
+        odoo_orion.get_sale_order_by_id.return_value = {**ORDER, "partner_id": [99, "Otro"]}  # type: ignore
+
+        self.assertIsNone(await self.engine.answer(selection_text("order:12", "S00012"), "+53 1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
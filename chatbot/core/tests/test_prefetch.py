@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from chatbot.core.ai_agent.tools import odoo_tools, prefetch
+from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+
+PARTNER = {"id": 7, "name": "Ana", "is_company": True, "parent_id": False}
+
+
+class TestFindSkus(unittest.TestCase):
+    def test_sku_like_tokens(self):
+        self.assertEqual(prefetch.find_skus("tienen el TAL2040?"), ["TAL2040"])
+        self.assertEqual(prefetch.find_skus("precio del sku 12345"), ["12345"])
+        self.assertEqual(prefetch.find_skus("quiero 2 taladros para 2024"), [])
+        self.assertEqual(prefetch.find_skus("el código de barras"), [])
+        self.assertEqual(prefetch.find_skus("ref: AB-123 y tal2040"), ["AB-123", "tal2040"])
+        # pedidos, correos y nombres de modelo no son SKUs
+        self.assertEqual(prefetch.find_skus("¿cómo va el S00012?"), [])
+        self.assertEqual(prefetch.find_skus("mi correo es ana2040@gmail.com"), [])
+        self.assertEqual(prefetch.find_skus("busco funda para iphone13 y galaxy s23"), [])
+        self.assertEqual(prefetch.find_skus("el sku S00012"), [])
+
+
+class TestTurnPrefetch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.get_partner = AsyncMock(return_value=PARTNER)
+        self.presupuestos = AsyncMock(return_value=[{"name": "S001"}])
+        self.get_product = AsyncMock(return_value={"id": 1, "default_code": "TAL2040"})
+        self.patches = [
+            patch.object(odoo_orion, "get_partner_by_phone", self.get_partner),
+            patch.object(odoo_orion, "presupuestos", self.presupuestos),
+            patch.object(odoo_orion, "get_product_by_sku", self.get_product),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_orders_are_read_before_the_tool_asks(self):
+        token = prefetch.start_turn("hola, ¿cómo van mis pedidos?", "+53 1", new_session=False)
+        try:
+            await asyncio.sleep(0)
+            self.presupuestos.assert_awaited_once_with(7)
+
+            ans = await odoo_tools.presupuestos("+53 1", background_tasks=None)
+            partner = await odoo_tools.get_partner("+53 1", background_tasks=None)
+        finally:
+            prefetch.end_turn(token)
+
+        self.assertIn("S001", ans)
+        self.assertIn("Ana", partner)
+        self.assertEqual(self.get_partner.await_count, 1)
+        self.assertEqual(self.presupuestos.await_count, 1)
+
+    async def test_sku_prefetch_and_unused_reads(self):
+        hits, unused = prefetch.stats["hits"], prefetch.stats["unused"]
+        token = prefetch.start_turn("¿hay stock del TAL2040?", "+53 1", new_session=True)
+        try:
+            await odoo_tools.get_product_by_sku("TAL2040", "+53 1", background_tasks=None)
+        finally:
+            prefetch.end_turn(token)
+
+        self.assertEqual(self.get_product.await_count, 1)
+        self.assertEqual(prefetch.stats["hits"] - hits, 1)
+        # el partner de la sesión nueva no lo pidió ninguna herramienta
+        self.assertEqual(prefetch.stats["unused"] - unused, 1)
+
+    async def test_created_partner_is_not_served_stale(self):
+        self.get_partner.return_value = None
+        token = prefetch.start_turn("hola", "+53 1", new_session=True)
+        try:
+            self.assertIsNone(await prefetch.get_partner_by_phone("+53 1"))
+            self.get_partner.return_value = PARTNER
+            prefetch.invalidate(prefetch.partner_key("+53 1"))
+            self.assertEqual(await prefetch.get_partner_by_phone("+53 1"), PARTNER)
+        finally:
+            prefetch.end_turn(token)
+
+    async def test_reads_outside_a_turn_go_to_odoo(self):
+        await prefetch.get_partner_by_phone("+53 1")
+        await prefetch.get_partner_by_phone("+53 1")
+        self.assertEqual(self.get_partner.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+
+from chatbot.core.ai_agent.completions import Agent, AIClient, prompt_cache_key
+from chatbot.core.tests.test_resilience import FakeResponsesServer
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def _async_gen_ai_output(self, params: dict):
+        self.calls.append({**params, "input": list(params["input"])})
+        return SimpleNamespace(
+            output=[SimpleNamespace(type="message", content=[SimpleNamespace(text="Hola")])]
+        )
+
+
+class TestPromptLayout(unittest.IsolatedAsyncioTestCase):
+    async def test_consecutive_turns_share_the_prefix(self):
+        bot = Agent("Test")
+        bot._ai_client = RecordingClient()  # type: ignore
+
+        await bot.async_process_msg("hola", "+53 1")
+        await bot.async_process_msg("¿tienen taladros?", "+53 1")
+        await bot.async_process_msg("hola", "+53 2")
+
+        first, second, other = bot._ai_client.calls  # type: ignore
+        self.assertIs(first["tools"], second["tools"])
+        self.assertEqual(second["input"][: len(first["input"])], first["input"])
+        self.assertEqual(first["prompt_cache_key"], second["prompt_cache_key"])
+        self.assertNotEqual(first["prompt_cache_key"], other["prompt_cache_key"])
+
+    def test_cache_key_does_not_leak_the_phone(self):
+        key = prompt_cache_key("+5355512345")
+        self.assertNotIn("5355512345", key)
+        self.assertEqual(key, prompt_cache_key("+5355512345"))
+
+
+class TestCacheTelemetry(unittest.IsolatedAsyncioTestCase):
+    async def test_hit_rate_per_model(self):
+        usage = {
+            "input_tokens": 2000,
+            "input_tokens_details": {"cached_tokens": 1536},
+            "output_tokens": 20,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": 2020,
+        }
+        fake = FakeResponsesServer([], usage=usage)
+        await fake.server.start_server()
+        self.addAsyncCleanup(fake.server.close)
+        client = AIClient("sk-test", base_url=fake.base_url)
+
+        for _ in range(2):
+            await client._async_gen_ai_output({"model": "gpt-5-mini", "input": "hola"})
+
+        self.assertEqual(
+            client.stats()["prompt_cache"]["gpt-5-mini"],
+            {"calls": 2, "input_tokens": 4000, "cached_tokens": 3072, "hit_rate": 0.768},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
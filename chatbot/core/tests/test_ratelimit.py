@@ -0,0 +1,111 @@
+import asyncio
+import time
+import unittest
+
+from chatbot.core.ai_agent.completions import AIClient
+from chatbot.core.ai_agent.ratelimit import AdaptiveLimiter, parse_reset
+from chatbot.core.tests.test_resilience import FakeResponsesServer
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+    def test_parse_reset(self):
+        self.assertEqual(parse_reset("20ms"), 0.02)
+        self.assertEqual(parse_reset("6m0s"), 360)
+        self.assertEqual(parse_reset("1h2m3.5s"), 3723.5)
+        self.assertEqual(parse_reset(None), 0)
+
+    async def test_calls_queue_in_arrival_order(self):
+        limiter = AdaptiveLimiter(initial_limit=2)
+        started = []
+
+        async def call(i: int):
+            await limiter.acquire(10)
+            started.append(i)
+            await asyncio.sleep(0.01)
+            limiter.release(10)
+
+        tasks = [asyncio.create_task(call(i)) for i in range(6)]
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.stats()["queue_depth"], 4)
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(started, list(range(6)))
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_aimd(self):
+        limiter = AdaptiveLimiter(initial_limit=8)
+        for _ in range(8):
+            await limiter.acquire(10)
+            limiter.release(10)
+        self.assertAlmostEqual(limiter.limit, 9, delta=0.1)
+
+        for _ in range(3):
+            await limiter.acquire(10)
+        for _ in range(3):
+            limiter.release(10, outcome="rate_limited")
+        # una ráfaga de 429 reduce el límite una sola vez
+        self.assertEqual(int(limiter.limit), 4)
+        self.assertEqual(limiter.counters["decreases"], 1)
+
+    async def test_token_budget_delays_calls(self):
+        limiter = AdaptiveLimiter(tpm=6000)  # 100 tokens por segundo
+        await limiter.acquire(6000)
+        limiter.release(6000)
+
+        start = time.monotonic()
+        await limiter.acquire(20)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        limiter.release(20)
+
+
+class TestRateLimitHeaders(unittest.IsolatedAsyncioTestCase):
+    async def test_client_follows_the_servers_rate_limits(self):
+        exhausted = {
+            "x-ratelimit-limit-tokens": "90000",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "200ms",
+        }
+        fake = FakeResponsesServer([(429, exhausted), (0, {"x-ratelimit-limit-tokens": "90000"})])
+        await fake.server.start_server()
+        self.addAsyncCleanup(fake.server.close)
+        client = AIClient(
+            "sk-test",
+            base_url=fake.base_url,
+            backoff_base=0.001,
+            limiter=AdaptiveLimiter(initial_limit=4),
+        )
+
+        start = time.monotonic()
+        ai_output = await client._async_gen_ai_output({"model": "gpt-5-nano", "input": "hola"})
+
+        # el reintento esperó al reset en el limitador en vez de fallar
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(ai_output.output_text, "respuesta 2")
+        stats = client.stats()["limiter"]
+        self.assertEqual(stats["rate_limited"], 1)
+        self.assertEqual(stats["limit"], 2)
+        self.assertEqual(stats["tpm"], 90000)
+        self.assertEqual(client.breaker.failures, 0)
+
+    async def test_slot_is_released_when_parsing_fails(self):
+        class BrokenRaw:
+            headers = {}
+
+            def parse(self):
+                raise ValueError("respuesta ilegible")
+
+        client = AIClient("sk-test", limiter=AdaptiveLimiter(initial_limit=1))
+
+        async def send(params, stream=False):
+            await client.limiter.acquire(1)
+            return 1, BrokenRaw()
+
+        client._send = send
+        with self.assertRaises(ValueError):
+            await client._create({"model": "gpt-5-nano", "input": "hola"})
+
+        self.assertEqual(client.limiter.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
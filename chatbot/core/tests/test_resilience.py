@@ -0,0 +1,152 @@
+import asyncio
+import time
+import unittest
+from typing import Optional
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from openai import BadRequestError
+
+from chatbot.core.ai_agent.completions import DEGRADED_MSG, Agent, AIClient
+from chatbot.core.ai_agent.resilience import AIUnavailableError, CircuitBreaker
+
+
+def response_body(text: str) -> dict:
+    return {
+        "id": "resp_1",
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-5-nano",
+        "status": "completed",
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_1",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+    }
+
+
+class FakeResponsesServer:
+    """Local /v1/responses that answers each request with the next scripted step.
+
+    A step is an HTTP status (error) or a number of seconds to wait before
+    answering 200, optionally paired with the headers of the response.
+    """
+
+    def __init__(self, steps: list, usage: Optional[dict] = None):
+        self.steps = list(steps)
+        self.usage = usage
+        self.requests = 0
+        app = web.Application()
+        app.router.add_post("/v1/responses", self.handle)
+        self.server = TestServer(app)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        step = self.steps.pop(0) if self.steps else 0
+        step, headers = step if isinstance(step, tuple) else (step, {})
+        if isinstance(step, int) and step >= 400:
+            return web.json_response(
+                {"error": {"message": "fallo simulado", "type": "server_error"}},
+                status=step,
+                headers=headers,
+            )
+        await asyncio.sleep(step)
+        body = response_body(f"respuesta {self.requests}")
+        if self.usage:
+            body["usage"] = self.usage
+        return web.json_response(body, headers=headers)
+
+    @property
+    def base_url(self) -> str:
+        return str(self.server.make_url("/v1"))
+
+
+class TestAIClient(unittest.IsolatedAsyncioTestCase):
+    async def start(self, steps: list, **kwargs) -> tuple[FakeResponsesServer, AIClient]:
+        fake = FakeResponsesServer(steps)
+        await fake.server.start_server()
+        self.addAsyncCleanup(fake.server.close)
+        kwargs.setdefault("backoff_base", 0.01)
+        return fake, AIClient("sk-test", base_url=fake.base_url, **kwargs)
+
+    async def test_transient_errors_are_retried(self):
+        fake, client = await self.start([500, 503])
+
+        ai_output = await client._async_gen_ai_output({"model": "gpt-5-nano", "input": "hola"})
+
+        self.assertEqual(ai_output.output_text, "respuesta 3")
+        self.assertEqual(client.counters["retries"], 2)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_bad_requests_are_not_retried(self):
+        fake, client = await self.start([400])
+
+        with self.assertRaises(BadRequestError):
+            await client._async_gen_ai_output({"model": "gpt-5-nano", "input": "hola"})
+
+        self.assertEqual(fake.requests, 1)
+        self.assertEqual(client.breaker.failures, 0)
+
+    async def test_circuit_opens_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        fake, client = await self.start([503, 503], max_retries=0, breaker=breaker)
+        params = {"model": "gpt-5-nano", "input": "hola"}
+
+        for _ in range(3):
+            with self.assertRaises(AIUnavailableError):
+                await client._async_gen_ai_output(params)
+
+        # la tercera llamada no llegó al servidor
+        self.assertEqual(fake.requests, 2)
+        self.assertEqual(client.counters["rejected"], 1)
+
+        await asyncio.sleep(0.06)
+        ai_output = await client._async_gen_ai_output(params)
+        self.assertEqual(ai_output.output_text, "respuesta 3")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_slow_request_is_hedged(self):
+        fake, client = await self.start([2], hedge=True, hedge_min_delay=0.05)
+        for _ in range(20):
+            client.latency.add(0.01)
+
+        start = time.monotonic()
+        ai_output = await client._async_gen_ai_output({"model": "gpt-5-nano", "input": "hola"})
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(ai_output.output_text, "respuesta 2")
+        self.assertEqual(client.counters["hedges"], 1)
+        self.assertEqual(client.counters["hedge_wins"], 1)
+
+
+class UnavailableClient:
+    def stats(self) -> dict:
+        return {}
+
+    async def _async_gen_ai_output(self, params: dict):
+        raise AIUnavailableError("Circuito de OpenAI abierto")
+
+
+class TestDegradedMode(unittest.IsolatedAsyncioTestCase):
+    async def test_chat_is_kept_when_openai_is_down(self):
+        bot = Agent("Test")
+        bot._ai_client = UnavailableClient()  # type: ignore
+
+        ai_msg = await bot.async_process_msg("hola", "+53 1")
+
+        self.assertEqual(ai_msg, DEGRADED_MSG)
+        self.assertEqual(bot.degraded_replies, 1)
+        roles = [msg.get("role") for msg in bot.chat_memory.get_messages("+53 1")]
+        self.assertEqual(roles[-2:], ["user", "assistant"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+from types import SimpleNamespace
+
+from chatbot.core.ai_agent.completions import Agent
+from chatbot.core.ai_agent.router import ModelRouter
+from chatbot.core.tests.helpers import (
+    FakeStreamClient,
+    call_events,
+    function_call,
+    output,
+    text_events,
+    text_output,
+)
+
+
+USAGE = SimpleNamespace(input_tokens=100, output_tokens=10)
+
+
+class ScriptedClient:
+    def __init__(self, outputs: dict):
+        self.outputs = outputs
+        self.models: list[str] = []
+
+    async def _async_gen_ai_output(self, params: dict):
+        self.models.append(params["model"])
+        return self.outputs[params["model"]]
+
+
+def make_router() -> ModelRouter:
+    return ModelRouter(
+        escalate_tools=["create_sale_order_by_product_id"],
+        escalate_keywords=["pedido", "cotización"],
+    )
+
+
+class TestModelRouter(unittest.TestCase):
+    def test_routes_by_message(self):
+        router = make_router()
+        self.assertEqual(router.route("¡Hola!"), "gpt-5-nano")
+        self.assertEqual(router.route("muchas gracias"), "gpt-5-nano")
+        self.assertEqual(router.route("¿Qué taladros tienen?"), "gpt-5-mini")
+        self.assertEqual(router.route("Quiero hacer un pedido"), "gpt-5")
+        self.assertEqual(router.route("Mándame una cotizacion"), "gpt-5")
+        self.assertEqual(router.escalations["keyword"], 2)
+
+    def test_large_model_output_is_never_escalated(self):
+        router = make_router()
+        self.assertIsNone(router.escalation(text_output(""), "gpt-5"))
+        self.assertEqual(router.escalation(text_output(""), "gpt-5-mini"), "low_confidence")
+
+
+class TestAgentRouting(unittest.IsolatedAsyncioTestCase):
+    async def test_small_talk_stays_on_small_model(self):
+        bot = Agent("Test", router=make_router())
+        bot._ai_client = ScriptedClient({"gpt-5-nano": text_output("¡Hola! ¿En qué te ayudo?", usage=USAGE)})  # type: ignore
+
+        ai_msg = await bot.async_process_msg("hola", "+53 1")
+
+        self.assertEqual(ai_msg, "¡Hola! ¿En qué te ayudo?")
+        self.assertEqual(bot._ai_client.models, ["gpt-5-nano"])  # type: ignore
+        stats = bot.router.stats()["routes"]["gpt-5-nano"]  # type: ignore
+        self.assertEqual((stats["turns"], stats["calls"], stats["input_tokens"]), (1, 1, 100))
+
+    async def test_escalation_tool_is_not_run_by_small_model(self):
+        bot = Agent("Test", router=make_router())
+        bot._ai_client = ScriptedClient(  # type: ignore
+            {
+                "gpt-5-mini": output(function_call("c1", "create_sale_order_by_product_id")),
+                "gpt-5": text_output("¿Confirmas el pedido de 2 taladros?"),
+            }
+        )
+
+        ai_msg = await bot.async_process_msg("quiero 2 taladros", "+53 1")
+
+        self.assertEqual(ai_msg, "¿Confirmas el pedido de 2 taladros?")
+        self.assertEqual(bot._ai_client.models, ["gpt-5-mini", "gpt-5"])  # type: ignore
+        self.assertEqual(bot.router.escalations["tool"], 1)  # type: ignore
+        self.assertEqual(len(bot.chat_memory.get_messages("+53 1")), 3)
+
+    async def test_low_confidence_answer_is_escalated(self):
+        bot = Agent("Test", router=make_router())
+        bot._ai_client = ScriptedClient(  # type: ignore
+            {
+                "gpt-5-mini": text_output("No estoy segura de qué modelo te conviene."),
+                "gpt-5": text_output("Te recomiendo el taladro X."),
+            }
+        )
+
+        ai_msg = await bot.async_process_msg("¿qué taladro me recomiendas?", "+53 1")
+
+        self.assertEqual(ai_msg, "Te recomiendo el taladro X.")
+        self.assertEqual(bot.router.escalations["low_confidence"], 1)  # type: ignore
+
+
+class TestStreamingEscalation(unittest.IsolatedAsyncioTestCase):
+    async def stream(self, rounds: list[list], message: str = "¿qué taladro me recomiendas?"):
+        bot = Agent("Test", router=make_router())
+        bot._ai_client = FakeStreamClient(rounds)  # type: ignore
+        sent: list[str] = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        ai_msg = await bot.async_stream_msg(message, "+53 1", send, max_chars=200)
+        return bot, ai_msg, sent
+
+    async def test_low_confidence_first_chunk_is_not_sent(self):
+        bot, ai_msg, sent = await self.stream(
+            [
+                text_events("No estoy segura de qué modelo te conviene. " * 3 + "\n\nLo siento."),
+                text_events("Te recomiendo el taladro X."),
+            ]
+        )
+
+        self.assertEqual(sent, ["Te recomiendo el taladro X."])
+        self.assertEqual(ai_msg, "Te recomiendo el taladro X.")
+        self.assertEqual(bot._ai_client.models, ["gpt-5-mini", "gpt-5"])  # type: ignore
+        self.assertEqual(bot.router.escalations["low_confidence"], 1)  # type: ignore
+
+    async def test_short_low_confidence_reply_is_checked_at_the_end(self):
+        bot, _, sent = await self.stream(
+            [text_events("No dispongo de ese dato."), text_events("El taladro X tiene 800W.")]
+        )
+
+        self.assertEqual(sent, ["El taladro X tiene 800W."])
+        self.assertEqual(bot.router.escalations["low_confidence"], 1)  # type: ignore
+
+    async def test_escalation_tool_is_not_run_by_small_model(self):
+        bot, ai_msg, sent = await self.stream(
+            [
+                call_events(function_call("c1", "create_sale_order_by_product_id")),
+                text_events("¿Confirmas el pedido de 2 taladros?"),
+            ],
+            message="quiero 2 taladros",
+        )
+
+        self.assertEqual(sent, ["¿Confirmas el pedido de 2 taladros?"])
+        self.assertEqual(bot._ai_client.models, ["gpt-5-mini", "gpt-5"])  # type: ignore
+        self.assertEqual(bot.router.escalations["tool"], 1)  # type: ignore
+
+    async def test_text_already_sent_keeps_the_turn_on_its_model(self):
+        first = "Tenemos el taladro percutor X de 800W a $120, con maletín y brocas, en stock hoy."
+        bot, _, sent = await self.stream([text_events(f"{first}\n\nNo estoy segura del color.")])
+
+        self.assertEqual(sent, [first, "No estoy segura del color."])
+        self.assertEqual(bot._ai_client.models, ["gpt-5-mini"])  # type: ignore
+        self.assertEqual(bot.router.escalations["low_confidence"], 0)  # type: ignore
+
+
+if __name__ == "__main__":
+    unittest.main()
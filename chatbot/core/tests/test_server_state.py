@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+
+import httpx
+from openai import BadRequestError
+
+from chatbot.core.ai_agent.completions import Agent
+from chatbot.core.ai_agent.tools.odoo_tools import odoo_tools
+from chatbot.core.tests.helpers import function_call, output, text_item
+
+
+class ChainClient:
+    """Stores responses like the Responses API; forgets them when told to."""
+
+    def __init__(self):
+        self.calls: list[dict] = []
+        self.stored: set[str] = set()
+
+    def stats(self) -> dict:
+        return {}
+
+    async def _async_gen_ai_output(self, params: dict):
+        self.calls.append({**params, "input": list(params["input"])})
+        previous = params.get("previous_response_id")
+        if previous and previous not in self.stored:
+            raise BadRequestError(
+                f"Previous response with id '{previous}' not found.",
+                response=httpx.Response(400, request=httpx.Request("POST", "http://test")),
+                body={"param": "previous_response_id"},
+            )
+
+        response_id = f"resp_{len(self.calls)}"
+        self.stored.add(response_id)
+        last = params["input"][-1]
+        if isinstance(last, dict) and last.get("role") == "user":
+            items = [function_call(f"c{len(self.calls)}")]
+        else:
+            items = [text_item("Hay 3 taladros")]
+        return output(*items, id=response_id)
+
+
+class TestServerState(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bot = Agent("Test", server_state=True)
+        self.bot._ai_client = ChainClient()  # type: ignore
+        self.patch = patch.dict(odoo_tools, {"fake_tool": self.fake_tool})
+        self.patch.start()
+
+    async def asyncTearDown(self):
+        self.patch.stop()
+
+    async def fake_tool(self, **kwargs):
+        return "3 taladros"
+
+    async def test_calls_send_only_new_items(self):
+        await self.bot.async_process_msg("hola", "+53 1")
+        await self.bot.async_process_msg("¿y brocas?", "+53 1")
+
+        first, tool_round, next_turn, _ = self.bot._ai_client.calls  # type: ignore
+        self.assertNotIn("previous_response_id", first)
+        self.assertEqual(first["input"][-1]["content"], "hola")
+
+        self.assertEqual(tool_round["previous_response_id"], "resp_1")
+        self.assertEqual(
+            [item["type"] for item in tool_round["input"]], ["function_call_output"]
+        )
+
+        self.assertEqual(next_turn["previous_response_id"], "resp_2")
+        self.assertEqual(next_turn["input"], [{"role": "user", "content": "¿y brocas?"}])
+        self.assertEqual(self.bot.stats()["server_state"]["chained"], 3)
+
+    async def test_expired_response_falls_back_to_local_history(self):
+        await self.bot.async_process_msg("hola", "+53 1")
+        self.bot._ai_client.stored.clear()  # type: ignore
+
+        ai_msg = await self.bot.async_process_msg("¿y brocas?", "+53 1")
+
+        retry = self.bot._ai_client.calls[3]  # type: ignore
+        self.assertNotIn("previous_response_id", retry)
+        self.assertEqual(retry["input"][0]["role"], "developer")
+        self.assertEqual(retry["input"][-1]["content"], "¿y brocas?")
+        self.assertEqual(ai_msg, "Hay 3 taladros")
+        self.assertEqual(self.bot.chain_stats["expired"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from types import SimpleNamespace
+
+from chatbot.core.ai_agent.completions import ChatMemory
+from chatbot.core.ai_agent.sessions import SessionStore
+from chatbot.core.ai_agent.tokens import estimate_size
+
+
+def chat(text: str) -> list:
+    return [{"role": "user", "content": text}]
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        evicted = []
+        store = SessionStore(max_sessions=2, max_bytes=10**9, on_evict=evicted.append)
+        store.put("a", chat("hola"))
+        store.put("b", chat("hola"))
+        store.get("a")
+        store.put("c", chat("hola"))
+
+        self.assertEqual(evicted, ["b"])
+        self.assertEqual(set(store), {"a", "c"})
+        self.assertEqual(store.evictions, 1)
+
+    def test_byte_cap_skips_active_sessions(self):
+        store = SessionStore(max_sessions=10, max_bytes=3 * estimate_size(chat("x")[0]))
+        store.put("a", chat("x")).active = True
+        store.put("b", chat("x"))
+        store.put("c", chat("x"))
+        store.grow(store.get("c"), chat("y"))  # type: ignore
+
+        self.assertIn("a", store)
+        self.assertNotIn("b", store)
+        self.assertLessEqual(store.total_bytes, store.max_bytes)
+
+    def test_accounting_follows_grow_and_recount(self):
+        store = SessionStore(max_sessions=10, max_bytes=10**9)
+        session = store.put("a", chat("hola"))
+        store.grow(session, chat("mundo"))
+        session.messages += chat("mundo")
+        store.grow(session, chat("mundo"), sign=-1)
+        store.recount(session)
+
+        self.assertEqual(store.total_bytes, sum(estimate_size(m) for m in session.messages))
+        largest = store.stats()["largest"][0]
+        self.assertEqual(largest["bytes"], store.total_bytes)
+        self.assertNotIn("phone", largest)
+
+
+class TestChatMemorySessions(unittest.TestCase):
+    def test_only_assistant_text_is_kept(self):
+        memory = ChatMemory()
+        memory.add_msg("hola", "user", "a")
+        message = SimpleNamespace(
+            type="message", role="assistant", content=[SimpleNamespace(text="¡Hola!")]
+        )
+        memory._set_ai_output(SimpleNamespace(output=[message]), "a")
+        memory._purge_tool_msgs("a")
+
+        self.assertEqual(memory._get_ai_msg("a"), "¡Hola!")
+        self.assertEqual(len(memory.get_messages("a")), 2)
+        self.assertEqual(memory.stats()["sessions"], 1)
+        self.assertEqual(
+            memory.stats()["bytes"],
+            sum(estimate_size(m) for m in memory.get_messages("a")),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
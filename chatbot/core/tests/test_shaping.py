@@ -0,0 +1,81 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from chatbot.core.ai_agent.tokens import CHARS_PER_TOKEN
+from chatbot.core.ai_agent.tools import shaping
+
+PRODUCT = {
+    "id": 1,
+    "default_code": "TAL2040",
+    "name": "Taladro | 20V",
+    "list_price": 120.0,
+    "qty_available": 3.0,
+    "categ_id": [4, "Herramientas"],
+    "description_sale": False,
+    "image_1920": "iVBORw0KGgo" * 50,
+    "website_url": "/shop/taladro-20v-1",
+}
+
+
+class TestShaping(unittest.TestCase):
+    def test_project_keeps_fields_and_flattens_many2one(self):
+        self.assertEqual(
+            shaping.project(PRODUCT, shaping.PRODUCT_DETAIL_FIELDS),
+            {
+                "id": 1,
+                "sku": "TAL2040",
+                "name": "Taladro | 20V",
+                "price": 120.0,
+                "stock": 3.0,
+                "categ_id": "Herramientas",
+            },
+        )
+
+    def test_table_has_one_header_and_one_row_per_record(self):
+        table = shaping.encode_table([PRODUCT, {"id": 2, "name": "Broca"}], shaping.PRODUCT_FIELDS)
+        self.assertEqual(
+            table.splitlines(),
+            [
+                "id|sku|name|price|stock|categ_id",
+                "1|TAL2040|Taladro / 20V|120|3|Herramientas",
+                "2||Broca|||",
+            ],
+        )
+
+    def test_long_lists_are_paged_with_a_cursor(self):
+        records = [{"id": i, "name": f"P{i}"} for i in range(shaping.PAGE_SIZE + 5)]
+
+        first = shaping.shape_list("test_list", records, ["id", "name"])
+        self.assertIn(f"cursor={shaping.PAGE_SIZE}", first)
+        self.assertNotIn(f"|P{shaping.PAGE_SIZE}\n", first)
+
+        last = shaping.shape_list("test_list", records, ["id", "name"], shaping.PAGE_SIZE)
+        self.assertEqual(len(last.splitlines()), 1 + 5 + 1)
+        self.assertNotIn("cursor=", last)
+        self.assertTrue(last.endswith(f"[{shaping.PAGE_SIZE + 1}-{len(records)} de {len(records)}]"))
+
+    def test_token_reduction_is_measured_per_tool(self):
+        shaping.stats.pop("test_record", None)
+        shaping.shape_record("test_record", PRODUCT, shaping.PRODUCT_DETAIL_FIELDS)
+
+        report = shaping.stats_report()["test_record"]
+        self.assertEqual(report["calls"], 1)
+        self.assertLess(report["shaped_tokens"], report["raw_tokens"])
+        self.assertGreater(report["reduction"], 0.5)
+
+    def test_list_size_is_estimated_from_a_sample(self):
+        shaping.stats.pop("test_sample", None)
+        records = [{"id": n, "name": f"Producto {n:04d}", "list_price": 10.0} for n in range(1000)]
+
+        with patch.object(shaping.json, "dumps", wraps=json.dumps) as dumps:
+            shaping.shape_list("test_sample", records, ["id", "name"])
+
+        self.assertEqual(len(dumps.call_args.args[0]), shaping.SIZE_SAMPLE)
+        estimated = shaping.stats["test_sample"]["raw_tokens"]
+        actual = len(json.dumps(records)) // CHARS_PER_TOKEN
+        self.assertAlmostEqual(estimated, actual, delta=actual * 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from chatbot.core.ai_agent.completions import Agent
+from chatbot.core.ai_agent.shortcuts import ShortcutEngine, parse_selection, selection_text
+from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+
+PARTNER = {"id": 7, "name": "Ana Pérez", "is_company": True, "parent_id": False}
+ORDERS = [
+    {"id": 12, "name": "S00012", "date_order": "2025-03-12 10:00:00", "state": "sale", "amount_total": 1250.0},
+    {"id": 9, "name": "S00009", "date_order": "2025-02-01 09:30:00", "state": "draft", "amount_total": 80.5},
+]
+
+
+class ModelNotCalled:
+    def stats(self) -> dict:
+        return {}
+
+    async def _async_gen_ai_output(self, params: dict):
+        raise AssertionError("el atajo no debía llamar al modelo")
+
+
+class TestShortcutEngine(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = ShortcutEngine()
+        self.get_partner = AsyncMock(return_value=PARTNER)
+        self.presupuestos = AsyncMock(return_value=ORDERS)
+        self.patches = [
+            patch.object(odoo_orion, "get_partner_by_phone", self.get_partner),
+            patch.object(odoo_orion, "presupuestos", self.presupuestos),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_only_whole_messages_match(self):
+        self.assertEqual(self.engine.match("¡Hola!")[0], "greeting")  # type: ignore
+        self.assertEqual(self.engine.match("Muchas gracias")[0], "thanks")  # type: ignore
+        self.assertEqual(self.engine.match("mis pedidos")[0], "orders")  # type: ignore
+        self.assertIsNone(self.engine.match("hola, ¿tienen taladros?"))
+        self.assertIsNone(self.engine.match("hola\nquiero ver el S00012"))
+
+    def test_selection_ids(self):
+        text = selection_text("sku:TAL2040", "Taladro 20V")
+        self.assertEqual(parse_selection(text), ("sku", "TAL2040", "Taladro 20V"))
+        self.assertEqual(self.engine.match(text)[0], "sku")  # type: ignore
+        self.assertEqual(self.engine.match(text)[2], "TAL2040")  # type: ignore
+        self.assertIsNone(self.engine.match(selection_text("unknown", "Otro")))
+
+    async def test_greeting_needs_a_known_partner(self):
+        reply = await self.engine.answer("hola", "+53 1", user_name="Ana Pérez")
+        self.assertEqual(reply, "¡Hola, Ana! ¿En qué puedo ayudarte hoy?")
+
+        self.assertIsNone(await self.engine.answer("hola", "+53 2"))
+        # el nombre sale de la sesión, no de Odoo
+        self.get_partner.assert_not_awaited()
+
+    async def test_orders_template(self):
+        reply = await self.engine.answer("Mis pedidos", "+53 1")
+
+        self.assertIn("• S00012 (2025-03-12): $1250 - Confirmado", reply)  # type: ignore
+        self.assertIn("• S00009 (2025-02-01): $80.5 - Presupuesto", reply)  # type: ignore
+        self.presupuestos.assert_awaited_once_with(7)
+
+    async def test_errors_fall_back_to_the_model(self):
+        self.presupuestos.side_effect = RuntimeError("Odoo caído")
+
+        self.assertIsNone(await self.engine.answer("mis pedidos", "+53 1"))
+        self.assertEqual(self.engine.counters["errors"], 1)
+
+
+class FakeExpiry:
+    def __init__(self):
+        self.touched: list[str] = []
+
+    def touch(self, key: str) -> None:
+        self.touched.append(key)
+
+
+class TestAgentShortcuts(unittest.IsolatedAsyncioTestCase):
+    async def test_reply_is_recorded_without_calling_the_model(self):
+        bot = Agent("Test", shortcuts=ShortcutEngine())
+        bot._ai_client = ModelNotCalled()  # type: ignore
+        bot.chat_memory.expiry = FakeExpiry()  # type: ignore
+
+        ai_msg = await bot.async_process_msg("gracias!", "+53 1")
+
+        messages = bot.chat_memory.get_messages("+53 1")
+        self.assertEqual(messages[-2], {"role": "user", "content": "gracias!"})
+        self.assertEqual(messages[-1], {"role": "assistant", "content": ai_msg})
+        self.assertEqual(bot.stats()["shortcuts"]["answered"], 1)
+        # renueva el plazo de inactividad como un turno del modelo
+        self.assertEqual(bot.chat_memory.expiry.touched, ["+53 1"])  # type: ignore
+
+    async def test_greeting_uses_the_name_kept_in_the_session(self):
+        bot = Agent("Test", shortcuts=ShortcutEngine())
+        bot._ai_client = ModelNotCalled()  # type: ignore
+        bot.chat_memory.add_msg("Datos del usuario", "developer", "+53 1")
+        bot.chat_memory.set_user_name("+53 1", "Ana Pérez")
+
+        with patch.object(odoo_orion, "get_partner_by_phone", AsyncMock()) as get_partner:
+            ai_msg = await bot.async_process_msg("Buenas tardes", "+53 1")
+
+        self.assertEqual(ai_msg, "¡Hola, Ana! ¿En qué puedo ayudarte hoy?")
+        get_partner.assert_not_awaited()
+
+    async def test_stream_sends_the_template(self):
+        bot = Agent("Test", shortcuts=ShortcutEngine())
+        bot._ai_client = ModelNotCalled()  # type: ignore
+        sent = []
+
+        async def send(chunk: str) -> None:
+            sent.append(chunk)
+
+        ai_msg = await bot.async_stream_msg("gracias", "+53 1", send, max_chars=1500)
+
+        self.assertEqual(sent, [ai_msg])
+
+
+if __name__ == "__main__":
+    unittest.main()
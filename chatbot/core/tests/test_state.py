@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from chatbot.core.database import Repository
+from chatbot.core.state import PostgresStateBackend, UserBusyError
+
+
+class TestPostgresStateBackend(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp_dir.name, "state.db")
+        self.repository = Repository(f"sqlite:///{db_path}")
+        await self.repository.connect()
+        self.worker_a = PostgresStateBackend(self.repository)
+        self.worker_b = PostgresStateBackend(self.repository)
+
+    async def asyncTearDown(self):
+        await self.repository.disconnect()
+        self.tmp_dir.cleanup()
+
+    async def test_user_lock_is_exclusive_between_workers(self):
+        phone = "+53 520 45 84 6"
+        self.assertTrue(await self.worker_a.acquire_user(phone))
+        self.assertFalse(await self.worker_b.acquire_user(phone))
+        self.assertTrue(await self.worker_b.is_in_process(phone))
+
+        with self.assertRaises(UserBusyError):
+            await self.worker_b.lock_user(phone, timeout=0.1, interval=0.05)
+
+        await self.worker_a.release_user(phone)
+        self.assertTrue(await self.worker_b.acquire_user(phone))
+        self.assertIsNotNone(await self.worker_a.get_last_activity(phone))
+
+    async def test_expired_lock_can_be_taken(self):
+        phone = "+53 520 45 84 6"
+        crashed = PostgresStateBackend(self.repository, lock_ttl=-1)
+        self.assertTrue(await crashed.acquire_user(phone))
+        self.assertTrue(await self.worker_a.acquire_user(phone))
+
+    async def test_chat_is_shared_between_workers(self):
+        phone = "+53 520 45 84 6"
+        chat = [
+            {"role": "developer", "content": "prompt"},
+            {"role": "user", "content": "hola"},
+        ]
+        await self.worker_a.save_chat(phone, chat)
+        self.assertEqual(await self.worker_b.load_chat(phone), chat)
+
+        await self.worker_b.delete_chat(phone)
+        self.assertIsNone(await self.worker_a.load_chat(phone))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from chatbot.core.ai_agent.completions import Agent
+from chatbot.core.ai_agent.streaming import SentenceChunker
+from chatbot.core.ai_agent.tools.odoo_tools import odoo_tools
+from chatbot.core.tests.helpers import FakeStreamClient, function_call, output, text_events
+
+
+class TestSentenceChunker(unittest.TestCase):
+    def test_paragraphs_are_released_when_complete(self):
+        chunker = SentenceChunker(max_chars=100, min_chars=5)
+        self.assertEqual(chunker.feed("Hola, Ana."), [])
+        self.assertEqual(chunker.feed("\n\nTenemos"), ["Hola, Ana."])
+        self.assertEqual(chunker.flush(), ["Tenemos"])
+
+    def test_long_text_is_cut_at_sentence_end(self):
+        chunker = SentenceChunker(max_chars=30, min_chars=5)
+        chunks = chunker.feed("Primera oración larga. Segunda oración que sigue")
+        chunks += chunker.flush()
+
+        self.assertEqual(chunks, ["Primera oración larga.", "Segunda oración que sigue"])
+        self.assertTrue(all(len(chunk) <= 30 for chunk in chunks))
+
+    def test_single_paragraph_is_released_by_sentences(self):
+        text = (
+            "El taladro percutor tiene 800W. Incluye maletín y brocas. "
+            "Tiene garantía de un año: cubre el motor. ¿Te preparo un presupuesto?"
+        )
+        chunker = SentenceChunker(max_chars=200, min_chars=5, sentence_chars=40)
+        chunks: list[str] = []
+        released_before_end = False
+        for i in range(0, len(text), 7):
+            chunks += chunker.feed(text[i : i + 7])
+            released_before_end = released_before_end or (bool(chunks) and i + 7 < len(text))
+        chunks += chunker.flush()
+
+        self.assertTrue(released_before_end)
+        self.assertEqual(
+            chunks,
+            [
+                "El taladro percutor tiene 800W. Incluye maletín y brocas.",
+                "Tiene garantía de un año: cubre el motor.",
+                "¿Te preparo un presupuesto?",
+            ],
+        )
+
+    def test_numbered_items_keep_their_number(self):
+        items = [
+            "1. Taladro percutor 800W con maletín, $120.",
+            "2. Taladro inalámbrico 18V con dos baterías, $95.",
+            "3. Rotomartillo SDS Plus 1500W, $210.",
+            "4. Taladro percutor compacto de 600W, $80.",
+        ]
+        text = "Estos son los taladros disponibles:\n" + "\n".join(items)
+        for size in (5, 40, len(text)):
+            with self.subTest(delta=size):
+                chunker = SentenceChunker(max_chars=120, min_chars=5, sentence_chars=60)
+                chunks: list[str] = []
+                for i in range(0, len(text), size):
+                    chunks += chunker.feed(text[i : i + size])
+                chunks += chunker.flush()
+
+                self.assertGreater(len(chunks), 1)
+                lines = [line for chunk in chunks for line in chunk.split("\n")]
+                self.assertEqual(lines, ["Estos son los taladros disponibles:", *items])
+
+    def test_short_lines_are_grouped(self):
+        chunker = SentenceChunker(max_chars=100, min_chars=40)
+        self.assertEqual(chunker.feed("- uno\n\n- dos\n\n"), [])
+        self.assertEqual(chunker.flush(), ["- uno\n\n- dos"])
+
+
+class TestAgentStreaming(unittest.IsolatedAsyncioTestCase):
+    async def test_first_paragraph_is_sent_before_the_reply_ends(self):
+        reply = "Hola, claro que sí te ayudo.\n\nTenemos taladros y sierras en stock."
+        bot = Agent("Test")
+        bot._ai_client = FakeStreamClient([text_events(reply)])  # type: ignore
+        sent: list[str] = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        with patch("chatbot.core.ai_agent.completions.SentenceChunker") as chunker:
+            chunker.side_effect = lambda max_chars: SentenceChunker(max_chars, min_chars=10)
+            ai_msg = await bot.async_stream_msg("hola", "+53 1", send, max_chars=200)
+
+        self.assertEqual(
+            sent,
+            ["Hola, claro que sí te ayudo.", "Tenemos taladros y sierras en stock."],
+        )
+        self.assertEqual(ai_msg, reply)
+        self.assertEqual(bot.chat_memory.get_messages("+53 1")[-1]["content"], reply)
+
+    async def test_tool_calls_start_mid_stream(self):
+        started = asyncio.Event()
+
+        async def fake_tool(**kwargs):
+            started.set()
+            return "3 taladros"
+
+        class Client(FakeStreamClient):
+            async def _async_stream_ai_output(self, params):
+                if len(self.rounds) == 2:
+                    self.rounds.pop(0)
+                    yield SimpleNamespace(
+                        type="response.output_item.done", item=function_call("c1")
+                    )
+                    # la herramienta ya corre antes de que termine el stream
+                    await asyncio.wait_for(started.wait(), 1)
+                    yield SimpleNamespace(
+                        type="response.completed",
+                        response=output(function_call("c1")),
+                    )
+                    return
+                async for event in super()._async_stream_ai_output(params):
+                    yield event
+
+        bot = Agent("Test")
+        bot._ai_client = Client([[], text_events("Hay 3 taladros.")])  # type: ignore
+        sent: list[str] = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        with patch.dict(odoo_tools, {"fake_tool": fake_tool}):
+            await bot.async_stream_msg("taladros?", "+53 1", send, max_chars=200)
+
+        self.assertTrue(started.is_set())
+        self.assertEqual(sent, ["Hay 3 taladros."])
+        self.assertEqual(bot.chat_memory.get_tool_msgs("+53 1"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
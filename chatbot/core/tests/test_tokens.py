@@ -0,0 +1,41 @@
+import unittest
+
+from chatbot.core.ai_agent.tokens import estimate_tokens, trim_to_budget
+
+
+def msg(role, content):
+    return {"role": role, "content": content}
+
+
+class TestTrimToBudget(unittest.TestCase):
+    def setUp(self):
+        self.pinned = [msg("developer", "prompt"), msg("developer", "Datos del usuario")]
+        self.turns = []
+        for n in range(50):
+            self.turns += [msg("user", f"pregunta {n} " * 20), msg("assistant", f"respuesta {n} " * 20)]
+
+    def test_short_chat_is_untouched(self):
+        messages = self.pinned + self.turns[:4]
+        self.assertIs(trim_to_budget(messages, 10_000), messages)
+
+    def test_pinned_messages_are_kept_and_old_turns_dropped(self):
+        messages = self.pinned + self.turns
+        window = trim_to_budget(messages, 500)
+
+        self.assertEqual(window[:2], self.pinned)
+        self.assertEqual(window[-1], self.turns[-1])
+        self.assertEqual(window[2]["role"], "user")
+        self.assertLessEqual(sum(estimate_tokens(m) for m in window), 500)
+
+    def test_current_turn_with_tool_items_is_never_split(self):
+        tool_items = [
+            {"type": "function_call_output", "call_id": "1", "output": "x" * 10_000}
+        ]
+        messages = self.pinned + self.turns + [msg("user", "mis pedidos")] + tool_items
+        window = trim_to_budget(messages, 100)
+
+        self.assertEqual(window, self.pinned + [msg("user", "mis pedidos")] + tool_items)
+
+
+if __name__ == "__main__":
+    unittest.main()
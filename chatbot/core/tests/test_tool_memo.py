@@ -0,0 +1,124 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from chatbot.core import notifications
+from chatbot.core.ai_agent.completions import ChatMemory, ToolRunner
+from chatbot.core.ai_agent.tools import utils
+from chatbot.core.ai_agent.tools.memo import Failure, ToolMemo, normalize_args
+from chatbot.core.ai_agent.tools.odoo_manager import odoo_orion
+from chatbot.core.ai_agent.tools.odoo_tools import odoo_tools, tool_ttls
+
+
+class TestToolMemo(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.memo = ToolMemo(
+            ttls={"get_partner": 60, "get_product_by_sku": 60},
+            invalidations={"create_partner": ["get_partner"]},
+        )
+
+    async def test_same_call_hits_and_other_user_misses(self):
+        run = AsyncMock(return_value="Partner encontrado")
+        args = {"user_number": "+53 1", "background_tasks": None}
+
+        await self.memo.call("get_partner", args, "+53 1", run)
+        await self.memo.call("get_partner", dict(args), "+53 1", run)
+        await self.memo.call("get_partner", args, "+53 2", run)
+
+        self.assertEqual(run.await_count, 2)
+        self.assertEqual(
+            self.memo.stats()["tools"]["get_partner"],
+            {"hits": 1, "misses": 2, "invalidations": 0, "failures": 0},
+        )
+
+    async def test_args_are_normalized(self):
+        self.assertEqual(
+            normalize_args({"sku": 123, "twilio_number": "531"}),
+            normalize_args({"sku": "123"}),
+        )
+        self.assertEqual(
+            normalize_args({"name": " taladro  azul"}), normalize_args({"name": "taladro azul"})
+        )
+
+    async def test_write_invalidates_the_users_reads(self):
+        run = AsyncMock(return_value="ok")
+        await self.memo.call("get_partner", {}, "+53 1", run)
+        await self.memo.call("get_partner", {}, "+53 2", run)
+        await self.memo.call("get_product_by_sku", {"sku": "1"}, "+53 1", run)
+
+        await self.memo.call("create_partner", {"name": "Ana"}, "+53 1", run)
+        await self.memo.call("create_partner", {"name": "Ana"}, "+53 1", run)
+
+        self.assertEqual(len(self.memo), 2)
+        self.assertEqual(self.memo.stats()["tools"]["create_partner"]["invalidations"], 1)
+
+    async def test_failures_are_not_cached(self):
+        run = AsyncMock(side_effect=[Failure("Falló la consulta"), "Taladro TAL2040"])
+        args = {"sku": "TAL2040"}
+
+        first = await self.memo.call("get_product_by_sku", args, "+53 1", run)
+        second = await self.memo.call("get_product_by_sku", args, "+53 1", run)
+        third = await self.memo.call("get_product_by_sku", args, "+53 1", run)
+
+        self.assertEqual(first, "Falló la consulta")
+        self.assertEqual((second, third), ("Taladro TAL2040", "Taladro TAL2040"))
+        self.assertEqual(run.await_count, 2)
+        self.assertEqual(self.memo.stats()["tools"]["get_product_by_sku"]["failures"], 1)
+
+    async def test_expired_entries_are_refreshed(self):
+        memo = ToolMemo(ttls={"get_partner": 1e-9}, invalidations={})
+        run = AsyncMock(return_value="ok")
+        await memo.call("get_partner", {}, "+53 1", run)
+        await memo.call("get_partner", {}, "+53 1", run)
+        self.assertEqual(run.await_count, 2)
+
+
+class TestToolRunnerMemo(unittest.IsolatedAsyncioTestCase):
+    async def test_repeated_tool_call_is_not_executed_twice(self):
+        runner = ToolRunner(memo=ToolMemo({"get_product_by_sku": 60}, {}))
+        memory = ChatMemory()
+        memory.add_msg("hola", "user", "+53 1")
+        tool = SimpleNamespace(
+            type="function_call",
+            name="get_product_by_sku",
+            call_id="c1",
+            arguments='{"sku": "TAL2040"}',
+        )
+        fake = AsyncMock(return_value='{"id": 1}')
+
+        with patch.dict(odoo_tools, {"get_product_by_sku": fake}):
+            for _ in range(2):
+                await runner.run_tools([tool], "+53 1", memory, None, None)
+
+        self.assertEqual(fake.await_count, 1)
+        self.assertEqual(len(memory.get_tool_msgs("+53 1")), 2)
+        self.assertEqual(memory.get_messages("+53 1")[-1]["output"], '{"id": 1}')
+
+    async def test_order_lookups_send_the_report_every_time(self):
+        runner = ToolRunner(memo=ToolMemo(tool_ttls, {}))
+        memory = ChatMemory()
+        memory.add_msg("hola", "user", "+53 1")
+        tool = SimpleNamespace(
+            type="function_call",
+            name="get_sale_order_by_id",
+            call_id="c1",
+            arguments='{"id": 12}',
+        )
+        partner = {"id": 7, "name": "Ana", "is_company": True, "parent_id": False}
+        order = {"id": 12, "name": "S00012", "partner_id": [7, "Ana"], "state": "sale"}
+        send_report = AsyncMock(return_value=True)
+
+        with (
+            patch.object(odoo_orion, "get_partner_by_phone", AsyncMock(return_value=partner)),
+            patch.object(odoo_orion, "get_sale_order_by_id", AsyncMock(return_value=order)),
+            patch.object(utils, "send_report", send_report),
+            patch.object(notifications, "send_whatsapp_message", AsyncMock(return_value=True)),
+        ):
+            for _ in range(2):
+                await runner.run_tools([tool], "+53 1", memory, "5351", None)
+
+        self.assertEqual(send_report.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
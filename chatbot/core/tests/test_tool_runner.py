@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from chatbot.core.ai_agent.completions import Agent, ChatMemory, ToolRunner
+from chatbot.core.ai_agent.tools.odoo_tools import odoo_tools
+from chatbot.core.tests.helpers import custom_call, function_call, output, text_output
+
+
+class TestToolRunner(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.memory = ChatMemory()
+        self.memory.add_msg("hola", "user", "+53 1")
+        self.started = 0
+
+    async def slow_tool(self, **kwargs):
+        self.started += 1
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def test_all_calls_of_a_response_run_together(self):
+        runner = ToolRunner()
+        tools = [function_call("c1"), custom_call("c2"), function_call("c3")]
+
+        with patch.dict(odoo_tools, {"fake_tool": self.slow_tool}):
+            await runner.run_tools(tools, "+53 1", self.memory, None, None)
+
+        self.assertEqual(runner.peak, 3)
+        self.assertEqual(runner.running, 0)
+        outputs = [msg["output"] for msg in self.memory.get_tool_msgs("+53 1")]
+        self.assertEqual(outputs, ["ok", "ok", "ok"])
+
+    async def test_concurrency_is_bounded_across_turns(self):
+        runner = ToolRunner(max_concurrency=2)
+        other = ChatMemory()
+        other.add_msg("hola", "user", "+53 2")
+
+        with patch.dict(odoo_tools, {"fake_tool": self.slow_tool}):
+            await asyncio.gather(
+                runner.run_tools(
+                    [function_call(f"a{i}") for i in range(3)], "+53 1", self.memory, None, None
+                ),
+                runner.run_tools(
+                    [function_call(f"b{i}") for i in range(3)], "+53 2", other, None, None
+                ),
+            )
+
+        self.assertEqual(self.started, 6)
+        self.assertEqual(runner.peak, 2)
+        self.assertEqual(runner.waits, 4)
+
+    async def test_bad_call_does_not_stop_the_others(self):
+        runner = ToolRunner()
+        tools = [function_call("c1", arguments="{no json"), function_call("c2")]
+
+        with patch.dict(odoo_tools, {"fake_tool": self.slow_tool}):
+            await runner.run_tools(tools, "+53 1", self.memory, None, None)
+
+        outputs = [msg["output"] for msg in self.memory.get_tool_msgs("+53 1")]
+        self.assertEqual(outputs, [runner.ERROR_MSG, "ok"])
+
+
+class FakeClient:
+    def stats(self) -> dict:
+        return {}
+
+    async def _async_gen_ai_output(self, params: dict):
+        last = params["input"][-1]
+        if isinstance(last, dict) and last.get("type") == "function_call_output":
+            return text_output("Listo")
+        return output(function_call("c1"), function_call("c2"))
+
+
+class TestAgentTools(unittest.IsolatedAsyncioTestCase):
+    async def test_calls_of_a_turn_share_the_scheduler(self):
+        bot = Agent("Test")
+        bot._ai_client = FakeClient()  # type: ignore
+
+        async def tool(**kwargs):
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        with patch.dict(odoo_tools, {"fake_tool": tool}):
+            self.assertEqual(await bot.async_process_msg("hola", "+53 1"), "Listo")
+            self.assertEqual(await bot.async_process_msg("otra vez", "+53 1"), "Listo")
+
+        self.assertEqual(bot.stats()["tools"]["peak"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from chatbot.core.ai_agent.completions import Agent
+from chatbot.core.ai_agent.tool_selection import REQUEST_TOOLS, ToolSelector, detect_intents
+from chatbot.core.ai_agent.tools_json import odoo_tools_json, tools_json
+from chatbot.core.tests.helpers import function_call, output, text_output
+
+
+def names(tools: list) -> list[str]:
+    return [tool["name"] for tool in tools]
+
+
+class TestToolSelector(unittest.TestCase):
+    def setUp(self):
+        self.selector = ToolSelector()
+
+    def test_intents(self):
+        self.assertEqual(detect_intents("¿Tienen fotos del taladro?"), {"catalog", "images"})
+        self.assertEqual(detect_intents("¿Cómo va mi pedido S00012?"), {"orders"})
+        self.assertEqual(detect_intents("precio del TAL2040"), {"catalog"})
+        self.assertEqual(detect_intents("gracias"), set())
+
+    def test_tiers_keep_order_and_end_with_the_meta_tool(self):
+        browse = self.selector.select("¿Tienen fotos del taladro?", "+53 1")
+        self.assertEqual(names(browse)[:2], ["get_partner", "create_partner"])
+        self.assertEqual(names(browse)[-1], REQUEST_TOOLS)
+        self.assertNotIn("presupuestos", names(browse))
+
+        orders = self.selector.select("¿Cómo va mi pedido S00012?", "+53 1")
+        self.assertEqual(
+            names(orders)[2:5],
+            ["presupuestos", "get_sale_order_by_name", "get_sale_order_by_id"],
+        )
+        self.assertTrue(set(names(browse)) < set(names(orders)))
+        self.assertLess(len(orders), len(odoo_tools_json))
+
+    def test_tools_block_is_stable_and_only_grows(self):
+        first = self.selector.select("hola", "+53 1")
+        self.assertIs(self.selector.select("¿tienen taladros?", "+53 1"), first)
+
+        orders = self.selector.select("mi pedido S00012", "+53 1")
+        # el seguimiento no vuelve al conjunto menor
+        self.assertIs(self.selector.select("gracias", "+53 1"), orders)
+
+        self.assertIs(self.selector.select("quiero comprar 2 taladros", "+53 1"), tools_json)
+        self.assertIs(self.selector.select("sí, por favor", "+53 1"), tools_json)
+        # otro chat empieza en el nivel más bajo
+        self.assertIs(self.selector.select("hola", "+53 2"), first)
+        self.assertEqual(self.selector.stats()["tiers"], {"browse": 3, "orders": 2, "full": 2})
+
+    def test_expansion_keeps_the_full_set(self):
+        self.selector.select("hola", "+53 1")
+        self.selector.record_expansion("+53 1")
+        self.assertIs(self.selector.select("ok", "+53 1"), tools_json)
+
+
+class ExpandingClient:
+    """Asks for the rest of the tools first, then answers."""
+
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def _async_gen_ai_output(self, params: dict):
+        self.calls.append(params)
+        if len(self.calls) == 1:
+            return output(function_call("c1", REQUEST_TOOLS))
+        return text_output("Listo")
+
+
+class TestToolExpansion(unittest.IsolatedAsyncioTestCase):
+    async def test_model_can_ask_for_every_tool(self):
+        bot = Agent("Test", tool_selector=ToolSelector())
+        bot._ai_client = ExpandingClient()  # type: ignore
+
+        ai_msg = await bot.async_process_msg("gracias", "+53 1")
+
+        first, second = bot._ai_client.calls  # type: ignore
+        self.assertIn(REQUEST_TOOLS, names(first["tools"]))
+        self.assertIs(second["tools"], tools_json)
+        self.assertEqual(ai_msg, "Listo")
+        self.assertEqual(bot.tool_selector.counters["expansions"], 1)  # type: ignore
+        # la llamada a request_more_tools no queda en el chat
+        self.assertFalse(
+            any(getattr(m, "name", None) == REQUEST_TOOLS for m in bot.chat_memory.get_messages("+53 1"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from chatbot.core.ai_agent.completions import TURN_CUT_MSG, TURN_LIMIT_MSG, Agent
+from chatbot.core.ai_agent.tools.odoo_tools import odoo_tools
+from chatbot.core.tests.helpers import (
+    FakeStreamClient,
+    call_events,
+    function_call,
+    output,
+    text_events,
+    text_output,
+)
+
+
+class FakeClient:
+    """Keeps calling tools with the main model; answers with the fallback."""
+
+    def __init__(self, fallback_delay: float = 0):
+        self.calls: list[dict] = []
+        self.fallback_delay = fallback_delay
+
+    async def _async_gen_ai_output(self, params: dict):
+        # la ventana puede ser la misma lista del chat, que se purga al final
+        self.calls.append({**params, "input": list(params["input"])})
+        if params.get("tool_choice") == "none":
+            await asyncio.sleep(self.fallback_delay)
+            return text_output("Respuesta de respaldo")
+        return output(function_call(f"c{len(self.calls)}"))
+
+
+class TestTurnLimits(unittest.IsolatedAsyncioTestCase):
+    async def fast_tool(self, **kwargs):
+        return "ok"
+
+    async def slow_tool(self, **kwargs):
+        await asyncio.sleep(10)
+        return "tarde"
+
+    async def test_max_tool_rounds_falls_back_to_cheaper_model(self):
+        bot = Agent("Test", max_tool_rounds=3, fallback_model="gpt-5-nano")
+        bot._ai_client = FakeClient()  # type: ignore
+
+        with patch.dict(odoo_tools, {"fake_tool": self.fast_tool}):
+            ai_msg = await bot.async_process_msg("hola", "+53 1")
+
+        self.assertEqual(ai_msg, "Respuesta de respaldo")
+        self.assertEqual(len(bot._ai_client.calls), 4)  # type: ignore
+        self.assertEqual(bot._ai_client.calls[-1]["model"], "gpt-5-nano")  # type: ignore
+        self.assertEqual(bot.limit_hits["max_tool_rounds"], 1)
+        self.assertEqual(bot.chat_memory.get_tool_msgs("+53 1"), [])
+
+    async def test_deadline_cancels_tools_and_closes_calls(self):
+        bot = Agent("Test", turn_deadline=0.05)
+        bot._ai_client = FakeClient()  # type: ignore
+        cancelled = asyncio.Event()
+
+        async def slow_tool(**kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with patch.dict(odoo_tools, {"fake_tool": slow_tool}):
+            ai_msg = await bot.async_process_msg("hola", "+53 1")
+
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(ai_msg, "Respuesta de respaldo")
+        self.assertEqual(bot.limit_hits["deadline"], 1)
+        # la llamada cancelada recibió una salida antes de ir al fallback
+        fallback_input = bot._ai_client.calls[-1]["input"]  # type: ignore
+        outputs = [m for m in fallback_input if isinstance(m, dict) and "call_id" in m]
+        self.assertEqual([m["call_id"] for m in outputs], ["c1"])
+
+    async def test_best_effort_answer_when_fallback_fails(self):
+        bot = Agent("Test", turn_deadline=0.05, fallback_timeout=0.01)
+        bot._ai_client = FakeClient(fallback_delay=1)  # type: ignore
+
+        with patch.dict(odoo_tools, {"fake_tool": self.slow_tool}):
+            ai_msg = await bot.async_process_msg("hola", "+53 1")
+
+        self.assertEqual(ai_msg, TURN_LIMIT_MSG)
+        self.assertEqual(bot.fallback_errors, 1)
+
+
+class TestStreamedTurnLimits(unittest.IsolatedAsyncioTestCase):
+    async def test_deadline_after_a_sent_chunk_does_not_resend_the_reply(self):
+        first = "Claro, déjame revisar el inventario de taladros percutores y en un momento te digo qué hay en stock."
+        # el primer párrafo se envía, luego la herramienta agota el plazo
+        events = text_events(f"{first}\n\n")[:-2] + call_events(function_call("c1"))
+        bot = Agent("Test", turn_deadline=0.1)
+        bot._ai_client = FakeStreamClient([events])  # type: ignore
+        sent: list[str] = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        async def slow_tool(**kwargs):
+            await asyncio.sleep(10)
+
+        with patch.dict(odoo_tools, {"fake_tool": slow_tool}):
+            ai_msg = await bot.async_stream_msg("¿tienen taladros?", "+53 1", send, max_chars=200)
+
+        self.assertEqual(sent, [first, TURN_CUT_MSG])
+        self.assertEqual(ai_msg, f"{first}\n\n{TURN_CUT_MSG}")
+        self.assertEqual(bot.limit_hits["deadline"], 1)
+        # sin llamada al modelo de respaldo
+        self.assertEqual(bot.fallback_errors, 0)
+        self.assertEqual(bot.chat_memory.get_messages("+53 1")[-1]["content"], ai_msg)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from chatbot.core.database import Repository
+from chatbot.core.turn_queue import RetryLater, TurnQueue
+
+
+class TestTurnQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmp_dir.name, "queue.db")
+        self.repository = Repository(f"sqlite:///{db_path}")
+        await self.repository.connect()
+        self.handled: list[dict] = []
+
+    async def asyncTearDown(self):
+        await self.repository.disconnect()
+        self.tmp_dir.cleanup()
+
+    async def handler(self, payload: dict):
+        self.handled.append(payload)
+
+    async def test_put_is_processed_by_workers(self):
+        queue = TurnQueue(self.repository, self.handler, workers=2)
+        await queue.start()
+        await queue.put({"user_number": "5350000000", "message": "hola"})
+        await asyncio.wait_for(queue._ids.join(), timeout=5)
+        await queue.stop()
+
+        self.assertEqual(self.handled, [{"user_number": "5350000000", "message": "hola"}])
+        self.assertEqual(await self.repository.get_pending_event_ids(), [])
+
+    async def test_pending_events_survive_restart(self):
+        await self.repository.enqueue_event({"message": "antes de reiniciar"})
+
+        queue = TurnQueue(self.repository, self.handler, workers=1)
+        await queue.start()
+        await asyncio.wait_for(queue._ids.join(), timeout=5)
+        await queue.stop()
+
+        self.assertEqual(self.handled, [{"message": "antes de reiniciar"}])
+
+    async def test_failed_event_is_retried_until_max_attempts(self):
+        async def failing_handler(payload):
+            raise RuntimeError("boom")
+
+        event_id = await self.repository.enqueue_event({"message": "x"})
+        queue = TurnQueue(self.repository, failing_handler, workers=1, max_attempts=1)
+        await queue.start()
+        await asyncio.wait_for(queue._ids.join(), timeout=5)
+        await queue.stop()
+
+        self.assertEqual(queue.failed, 1)
+        self.assertIsNone(await self.repository.claim_event(event_id))
+
+    async def test_event_claimed_before_a_quick_restart_is_requeued(self):
+        # reclamado por el proceso que se cayó, aún no caducado al arrancar
+        event_id = await self.repository.enqueue_event({"message": "durante la caída"})
+        self.assertIsNotNone(await self.repository.claim_event(event_id))
+
+        queue = TurnQueue(
+            self.repository, self.handler, workers=1, poll_interval=0.05, stale_after=0.3
+        )
+        await queue.start()
+        self.assertEqual(self.handled, [])
+
+        for _ in range(40):
+            if self.handled:
+                break
+            await asyncio.sleep(0.05)
+        await queue.stop()
+
+        self.assertEqual(self.handled, [{"message": "durante la caída"}])
+
+
+    async def test_busy_user_is_retried_later_without_spending_attempts(self):
+        calls: list[float] = []
+
+        async def busy_once(payload):
+            calls.append(asyncio.get_running_loop().time())
+            if len(calls) == 1:
+                raise RetryLater(0.2)
+            self.handled.append(payload)
+
+        await self.repository.enqueue_event({"message": "ocupado"})
+        queue = TurnQueue(
+            self.repository, busy_once, workers=1, poll_interval=0.05, max_attempts=1
+        )
+        await queue.start()
+        for _ in range(40):
+            if self.handled:
+                break
+            await asyncio.sleep(0.05)
+        await queue.stop()
+
+        self.assertEqual(self.handled, [{"message": "ocupado"}])
+        # el poll no lo adelanta y el reintento no agota max_attempts
+        self.assertGreaterEqual(calls[1] - calls[0], 0.2)
+        self.assertEqual((queue.retried, queue.failed), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
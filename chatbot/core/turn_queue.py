@@ -0,0 +1,160 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from chatbot.core.database import Repository
+from chatbot.logging_conf import logger
+
+
+class RetryLater(Exception):
+    """Raised by the handler when the event cannot be processed yet.
+
+    The event goes back to pending without counting the attempt and is
+    scheduled again after delay seconds.
+    """
+
+    def __init__(self, delay: float):
+        super().__init__(f"reintentar en {delay}s")
+        self.delay = delay
+
+
+class TurnQueue:
+    """Durable queue of inbound turns drained by a pool of async workers.
+
+    Events are persisted through the Repository before the webhook answers,
+    so pending turns survive a process restart and are picked up again on
+    startup or by the periodic poll. The poll also requeues events left in
+    "processing" for longer than stale_after (claimed by a process that
+    crashed), every stale_after / 2 seconds.
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        handler: Callable[[dict], Awaitable[None]],
+        workers: int = 4,
+        poll_interval: float = 5.0,
+        max_attempts: int = 3,
+        stale_after: float = 600,
+    ):
+        self._repository = repository
+        self._handler = handler
+        self._workers_count = workers
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._stale_after = stale_after
+        self._ids: asyncio.Queue[int] = asyncio.Queue()
+        self._queued: set[int] = set()
+        self._tasks: list[asyncio.Task] = []
+        self._requeued_at = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self) -> None:
+        await self._requeue_stale()
+        await self._load_pending()
+
+        for n in range(self._workers_count):
+            self._tasks.append(asyncio.create_task(self._worker(n)))
+        self._tasks.append(asyncio.create_task(self._poll()))
+        logger.info(f"Turn queue started with {self._workers_count} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def put(self, payload: dict) -> int:
+        """Persist an event and schedule it for processing.
+
+        Args:
+            payload: JSON-serializable event data
+
+        Returns:
+            int: Id of the persisted event
+        """
+        event_id = await self._repository.enqueue_event(payload)
+        self._schedule(event_id)
+        return event_id
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._ids.qsize(),
+            "workers": self._workers_count,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    def _schedule(self, event_id: int) -> None:
+        if event_id in self._queued:
+            return
+        self._queued.add(event_id)
+        self._ids.put_nowait(event_id)
+
+    def _reschedule(self, event_id: int) -> None:
+        self._queued.discard(event_id)
+        self._schedule(event_id)
+
+    async def _requeue_stale(self) -> None:
+        self._requeued_at = time.monotonic()
+        await self._repository.requeue_stale_events(self._stale_after)
+
+    async def _load_pending(self) -> None:
+        for event_id in await self._repository.get_pending_event_ids():
+            self._schedule(event_id)
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            event_id = await self._ids.get()
+            delayed = False
+            try:
+                event = await self._repository.claim_event(event_id)
+                if not event:
+                    # procesado por otro worker o proceso
+                    continue
+
+                try:
+                    await self._handler(event["payload"])
+                except RetryLater as exc:
+                    await self._repository.release_event(event_id)
+                    self.retried += 1
+                    # sigue en _queued hasta entonces, así el poll no lo adelanta
+                    delayed = True
+                    asyncio.get_running_loop().call_later(
+                        exc.delay, self._reschedule, event_id
+                    )
+                    continue
+                except Exception as exc:
+                    logger.error(f"Worker {n}: error procesando evento {event_id}: {exc}")
+                    self.failed += 1
+                    await self._repository.fail_event(
+                        event_id, event["attempts"], self._max_attempts
+                    )
+                    continue
+
+                await self._repository.complete_event(event_id)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Worker {n}: error en la cola de turnos: {exc}")
+            finally:
+                if not delayed:
+                    self._queued.discard(event_id)
+                self._ids.task_done()
+
+    async def _poll(self) -> None:
+        """Pick up events left pending by retries, by other processes or by a crash."""
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                # un reinicio rápido deja eventos aún no caducados al arrancar
+                if time.monotonic() - self._requeued_at >= self._stale_after / 2:
+                    await self._requeue_stale()
+                if self._ids.empty():
+                    await self._load_pending()
+            except Exception as exc:
+                logger.error(f"Error consultando eventos pendientes: {exc}")
@@ -0,0 +1,70 @@
+"""
+Microbenchmark de ChatMemory._purge_tool_msgs.
+
+Mide el costo de purgar los items de herramientas de un turno para historiales
+de distinto tamaño. El tiempo por purga debe mantenerse plano aunque el
+historial crezca.
+
+Uso:
+    python scripts/bench_purge_tool_msgs.py
+    python scripts/bench_purge_tool_msgs.py --sizes 100 1000 10000 --tools 6
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from chatbot.core.ai_agent.completions import ChatMemory
+from chatbot.logging_conf import logger
+
+PHONE = "bench"
+
+
+def build_memory(history_size: int) -> ChatMemory:
+    memory = ChatMemory()
+    for n in range(history_size // 2):
+        memory.add_msg(f"pregunta {n}", "user", PHONE)
+        memory.add_msg(f"respuesta {n}", "assistant", PHONE)
+    return memory
+
+
+def run_turn(memory: ChatMemory, tools: int) -> None:
+    calls = [
+        SimpleNamespace(type="function_call", call_id=str(n), name="get_partner")
+        for n in range(tools)
+    ]
+    memory._set_ai_output(SimpleNamespace(output=calls), PHONE)
+    for n in range(tools):
+        memory._set_tool_output(str(n), "Partner encontrado", PHONE)
+
+
+def bench(history_size: int, tools: int, rounds: int) -> float:
+    memory = build_memory(history_size)
+    elapsed = 0.0
+    for _ in range(rounds):
+        run_turn(memory, tools)
+        start = time.perf_counter()
+        memory._purge_tool_msgs(PHONE)
+        elapsed += time.perf_counter() - start
+
+    assert len(memory.get_messages(PHONE)) == history_size + 1
+    return elapsed / rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de purga de tool msgs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--tools", type=int, default=6, help="Tool items por turno")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    print(f"{'historial':>10} | {'µs por purga':>12}")
+    for size in args.sizes:
+        per_purge = bench(size, args.tools, args.rounds)
+        print(f"{size:>10} | {per_purge * 1e6:>12.2f}")